@@ -854,4 +854,51 @@ def __starburst_stateframe(sf_dict, xml, mk_xml):
         xml.write('</Cluster>')
     # ======================================================================    
     
-    return fmt, buf
\ No newline at end of file
+    return fmt, buf
+
+
+"""
+Class: FieldRecorder extends dict
+    Description:
+        Empty dictionary that records every key looked up through get().
+        Used by starburst_fields to find which monitor data items the 
+        stateframe packs.
+"""
+class FieldRecorder(dict):
+    def __init__(self):
+        super(FieldRecorder, self).__init__()
+        self.keys_used = set()
+        self.children = {}
+        
+    """
+    Method: get(key, default)
+        Description:
+            Records key and returns default, or the FieldRecorder of key
+            when default is a dictionary (a nested cluster).
+    """
+    def get(self, key, default=None):
+        self.keys_used.add(key)
+        if isinstance(default, dict):
+            return self.children.setdefault(key, FieldRecorder())
+        return default
+
+
+"""
+Method: starburst_fields()
+    Description:
+        Derives the monitor data items that gen_starburst_sf packs into the
+        stateframe for each Starburst LabJack, by running it on a dictionary
+        that records the keys it looks up. Passing the result to 
+        OVROStarburst.getMonitorData(fields=...) makes the producer read 
+        only the registers that end up in the frame.
+    Returns:
+        fields: dictionary keyed by device ("LONOISE", "A" and "B") of the
+            sorted lists of items read from that device.
+"""
+def starburst_fields():
+    sf_dict = FieldRecorder()
+    gen_starburst_sf(sf_dict)
+    
+    devices = sf_dict.children.get("starburst", FieldRecorder()).children
+    return dict((key, sorted(recorder.keys_used)) 
+                for key, recorder in devices.items())
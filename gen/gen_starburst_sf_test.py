@@ -467,9 +467,44 @@ class TestGenerateOVROBinary(unittest.TestCase):
                 self.assertEqual(val1, val2)
         
         
+"""
+TestStarburstFields Test Group Description:
+    This group of tests makes sure that the monitor data items packed into
+    the stateframe can be derived from gen_starburst_sf.
+    
+    Test Count: 1
+"""
+class TestStarburstFields(unittest.TestCase):
+    
+    """
+    Test - test_fieldsMatchStateframe:
+        Given the current stateframe layout,
+        Then the fields of each device are exactly the items packed for 
+            it, and changing any of them changes the packed buffer.
+    """
+    def test_fieldsMatchStateframe(self):
+        fields = go.starburst_fields()
+        
+        self.assertEqual(sorted(fields.keys()), ["A", "B", "LONOISE"])
+        self.assertEqual(len(fields["LONOISE"]), go.Nelements_lonoise)
+        self.assertEqual(len(fields["A"]), go.Nelements_antenna)
+        self.assertTrue("LOFREQ" in fields["LONOISE"])
+        self.assertTrue("VQATTEN" in fields["B"])
+        
+        fmt, empty, xmlFile = go.gen_starburst_sf({})
+        for key, names in fields.items():
+            for name in names:
+                value = "X" if name == "NAME" else 1
+                if name == "LOFREQ":
+                    value = ("LO_7_5GHZ", 1)
+                fmt, buf, xmlFile = go.gen_starburst_sf(
+                    {"starburst": {key: {name: value}}})
+                self.assertNotEqual(buf, empty)
+        
+        
 # Main Method
 if __name__ == '__main__':
-    testGroups = [TestGenerateOVROBinary]
+    testGroups = [TestGenerateOVROBinary, TestStarburstFields]
     for tG in testGroups:
         print "\nTesting: " + str(tG.__name__)
         suite = unittest.TestLoader().loadTestsFromTestCase(
@@ -0,0 +1,210 @@
+"""
+    STARBURST OVRO Stateframe Producer
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import collections
+import socket
+import threading
+import time
+import gen_starburst_sf
+import sbtime
+
+# Seconds from the LabVIEW epoch (1904/01/01) to the Unix epoch, for the
+# stateframe timestamp.
+labview_epoch = 2082844800.0
+
+"""
+Method: monotonic()
+    Description:
+        Monotonic clock in seconds used for the schedule. (The clock of
+        sbtime.py in sblj/, which has to be on the path, shared with
+        sbio.monotonic.)
+"""
+monotonic = sbtime.monotonic
+
+"""
+Method: pack_starburst(data, timestamp)
+    Description:
+        Packs monitor data into the stateframe buffer.
+    Arguments:
+        data: dictionary of monitor data keyed by device (as returned by
+            OVROStarburst.getMonitorData).
+        timestamp: wall clock time of the data (Unix seconds).
+    Returns:
+        buf: binary data buffer (refer to gen_starburst_sf).
+"""
+def pack_starburst(data, timestamp):
+    sf_dict = {"timestamp": timestamp + labview_epoch, "starburst": data}
+    fmt, buf, xmlFile = gen_starburst_sf.gen_starburst_sf(sf_dict)
+    return buf
+
+"""
+Class: CycleTiming extends namedtuple
+    Description:
+        Timing of one cycle of a StateframeProducer. Times are monotonic
+        seconds.
+    Fields:
+        cycle: number of the cycle (counting skipped slots, so that due is
+            always start + cycle * period).
+        due: time the cycle was scheduled to start.
+        start: time acquisition started.
+        acquired: time acquisition finished.
+        packed: time packing finished.
+        sent: time sending finished (None when a stage failed).
+        missed: whether the cycle did not send by the next due time.
+        skipped: number of following slots skipped to get back on
+            schedule.
+        error: exception of the stage that failed, or None.
+"""
+CycleTiming = collections.namedtuple("CycleTiming", [
+    "cycle", "due", "start", "acquired", "packed", "sent", "missed",
+    "skipped", "error"])
+
+"""
+Class: StateframeProducer extends object
+    Description:
+        Background thread producing the Starburst stateframe on a fixed
+        schedule: every period seconds it acquires the monitor data, packs
+        it and sends the buffer to the destination. Cycles are due at
+        start + n * period on the monotonic clock, whatever the stages
+        take, so the cadence never drifts. A cycle that is still running
+        at the next due time is counted as missed, and the slots it
+        overran are skipped (instead of sending a burst of late frames).
+        A failing stage is counted as an error and the schedule carries
+        on.
+    Arguments:
+        acquire: callable taking no arguments and returning the
+            dictionary of monitor data keyed by device (e.g. an
+            OVROStarburst getMonitorData with the fields of
+            gen_starburst_sf.starburst_fields(), with a device timeout
+            set so that a hung LabJack is sent as stale instead of
+            holding up the frames).
+        destination: (host, port) pair the frames are sent to.
+        rate: frames per second.
+        protocol: "udp" (one datagram per frame) or "tcp" (frames written
+            to a connection, opened again after a failure).
+        pack: callable taking the monitor data and its wall clock time and
+            returning the buffer to send (pack_starburst by default).
+        history: number of CycleTiming entries kept.
+    Attributes:
+        cycles: number of frames sent.
+        misses: number of cycles that missed their deadline.
+        skipped: number of slots skipped.
+        errors: number of cycles whose acquire, pack or send failed.
+        lastError: exception of the last failed cycle.
+        timings: latest CycleTiming entries, oldest first.
+    Raises:
+        ValueError: occurs when the protocol is neither "udp" nor "tcp".
+"""
+class StateframeProducer(object):
+    def __init__(self, acquire, destination, rate=1.0, protocol="udp",
+                 pack=pack_starburst, history=1000, name="sf-producer"):
+        if protocol not in ["udp", "tcp"]:
+            raise ValueError("Unknown protocol " + str(protocol) + ".")
+        self.acquire = acquire
+        self.destination = destination
+        self.period = 1.0 / rate
+        self.protocol = protocol
+        self.pack = pack
+        self.name = name
+        self.socket = None
+        self.cycles = 0
+        self.misses = 0
+        self.skipped = 0
+        self.errors = 0
+        self.lastError = None
+        self.timings = collections.deque(maxlen=history)
+        self.thread = None
+        self.stopping = threading.Event()
+
+    # Private helper methods
+
+    def __send(self, buf):
+        if self.protocol == "udp":
+            if self.socket is None:
+                self.socket = socket.socket(socket.AF_INET,
+                                            socket.SOCK_DGRAM)
+            self.socket.sendto(buf, self.destination)
+            return
+        if self.socket is None:
+            self.socket = socket.create_connection(self.destination,
+                                                   self.period)
+        try:
+            self.socket.sendall(buf)
+        except socket.error:
+            self.__close()
+            raise
+
+    def __close(self):
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+    def __cycle(self):
+        start = monotonic()
+        acquired = packed = sent = None
+        error = None
+        try:
+            data = self.acquire()
+            acquired = monotonic()
+            buf = self.pack(data, time.time())
+            packed = monotonic()
+            self.__send(buf)
+            sent = monotonic()
+            self.cycles += 1
+        except Exception as e:
+            self.errors += 1
+            self.lastError = error = e
+        return start, acquired, packed, sent, error
+
+    def __run(self):
+        start = monotonic()
+        cycle = 0
+        while not self.stopping.is_set():
+            due = start + cycle * self.period
+            begun, acquired, packed, sent, error = self.__cycle()
+
+            # Slots that went by while the cycle ran are skipped.
+            now = monotonic()
+            late = int((now - due) / self.period)
+            if late:
+                self.misses += 1
+                self.skipped += late
+            self.timings.append(CycleTiming(
+                cycle, due, begun, acquired, packed, sent, late > 0, late,
+                error))
+
+            cycle += late + 1
+            self.stopping.wait(start + cycle * self.period - now)
+        self.__close()
+
+    """
+    Method: start()
+        Description:
+            Starts producing. Does nothing if the producer is already
+            running.
+    """
+    def start(self):
+        if self.running():
+            return
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.__run, name=self.name)
+        self.thread.daemon = True
+        self.thread.start()
+
+    """
+    Method: stop(timeout)
+        Description:
+            Stops producing and waits up to timeout seconds for the cycle
+            in progress to finish.
+    """
+    def stop(self, timeout=None):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
@@ -0,0 +1,153 @@
+"""
+    STARBURST OVRO Stateframe Producer Test Suite
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import unittest
+import socket
+import struct
+import time
+import gen_starburst_sf as go
+import sf_producer
+
+"""
+TestStateframeProducer Test Group Description:
+    This group of tests makes sure that the producer sends a packed frame
+    every period on a schedule that does not drift, and that slow or
+    failing cycles are recorded without moving the schedule.
+
+    Test Count: 3
+"""
+class TestStateframeProducer(unittest.TestCase):
+
+    def setUp(self):
+        self.receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.receiver.bind(("127.0.0.1", 0))
+        self.receiver.settimeout(2.0)
+        self.data = {"A": {"NAME": "AntennaA", "VQPOW": 1.5},
+                     "LONOISE": {"NAME": "LONoise", "LOFREQ": ("LO_7_5GHZ",
+                                                               1)}}
+        self.acquired = []
+
+    def tearDown(self):
+        self.receiver.close()
+
+    def acquire(self):
+        self.acquired.append(sf_producer.monotonic())
+        return self.data
+
+    def checkSchedule(self, producer):
+        period = producer.period
+        start = producer.timings[0].due
+        for timing in producer.timings:
+            self.assertAlmostEqual(timing.due, start + timing.cycle * period,
+                                   places=9)
+            self.assertTrue(timing.start >= timing.due)
+
+    """
+    Test - test_framesSent:
+        Given a producer at 20Hz sending over UDP,
+        Then every frame received is the packed monitor data with the
+            stateframe timestamp, one per cycle, and cycles start on the
+            schedule.
+    """
+    def test_framesSent(self):
+        producer = sf_producer.StateframeProducer(
+            self.acquire, self.receiver.getsockname(), 20)
+        producer.start()
+        frames = [self.receiver.recv(65536) for i in range(6)]
+        producer.stop()
+
+        fmt, buf, xmlFile = go.gen_starburst_sf({})
+        for frame in frames:
+            self.assertEqual(len(frame), len(buf))
+            timestamp = struct.unpack("<d", frame[:8])[0]
+            self.assertTrue(abs(timestamp - sf_producer.labview_epoch -
+                                time.time()) < 10)
+        fmt, buf, xmlFile = go.gen_starburst_sf({"starburst": self.data})
+        self.assertEqual(frames[0][8:], buf[8:])
+
+        self.assertTrue(producer.cycles >= 6)
+        self.assertEqual(producer.errors, 0)
+        self.assertEqual([timing.cycle for timing in producer.timings],
+                         list(range(len(producer.timings))))
+        self.checkSchedule(producer)
+        for timing in producer.timings:
+            self.assertTrue(timing.start <= timing.acquired <=
+                            timing.packed <= timing.sent)
+
+    """
+    Test - test_slowCycleSkipped:
+        Given a producer at 20Hz whose third acquisition takes 2.5
+            periods,
+        Then that cycle is recorded as missed with two slots skipped, and
+            the following cycles start on the original schedule.
+    """
+    def test_slowCycleSkipped(self):
+        def acquire():
+            if len(self.acquired) == 2:
+                time.sleep(0.125)
+            return self.acquire()
+
+        producer = sf_producer.StateframeProducer(
+            acquire, self.receiver.getsockname(), 20)
+        producer.start()
+        time.sleep(0.5)
+        producer.stop()
+
+        timings = list(producer.timings)
+        self.assertEqual([timing.cycle for timing in timings[:4]],
+                         [0, 1, 2, 5])
+        self.assertTrue(timings[2].missed)
+        self.assertEqual(timings[2].skipped, 2)
+        self.assertEqual(producer.misses, 1)
+        self.assertEqual(producer.skipped, 2)
+        self.checkSchedule(producer)
+
+    """
+    Test - test_failuresRecorded:
+        Given a producer sending over TCP to a port nobody listens on,
+            and then a listener,
+        Then the cycles meanwhile fail without stopping the producer, and
+            frames reach the listener once it is up.
+    """
+    def test_failuresRecorded(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(("127.0.0.1", 0))
+        address = listener.getsockname()
+        producer = sf_producer.StateframeProducer(
+            self.acquire, address, 20, "tcp")
+        try:
+            producer.start()
+            time.sleep(0.2)
+            self.assertTrue(producer.errors > 0)
+            self.assertTrue(isinstance(producer.lastError, socket.error))
+            self.assertEqual(producer.cycles, 0)
+
+            listener.listen(1)
+            listener.settimeout(2.0)
+            connection, peer = listener.accept()
+            connection.settimeout(2.0)
+            fmt, buf, xmlFile = go.gen_starburst_sf({})
+            received = b""
+            while len(received) < 2 * len(buf):
+                received += connection.recv(65536)
+            connection.close()
+        finally:
+            producer.stop()
+            listener.close()
+        self.assertTrue(producer.cycles >= 2)
+        self.checkSchedule(producer)
+        self.assertRaises(ValueError, sf_producer.StateframeProducer,
+                          self.acquire, address, 20, "serial")
+
+
+# Main Method
+if __name__ == '__main__':
+    testGroups = [TestStateframeProducer]
+    for tG in testGroups:
+        print "\nTesting: " + str(tG.__name__)
+        suite = unittest.TestLoader().loadTestsFromTestCase(
+            tG)
+        unittest.TextTestRunner(verbosity=2).run(suite)
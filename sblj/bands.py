@@ -4,7 +4,7 @@
     Email: lkkung@caltech.edu
 """
 
-import pickle
+import sbbands
 import subprocess as sp
 from sblj import LOFreqConstants
 
@@ -13,6 +13,11 @@ SEPARATOR = "=================================================="
 LOFREQS = {value: name for name, value in vars(LOFreqConstants).items() 
            if name.isupper()}
 
+# Band file of the working directory. Running control processes reload it
+# within a second of every change saved here.
+
+store = sbbands.BandStore()
+
 """
 Method: clrScreen()
     Description: 
@@ -39,21 +44,20 @@ def welcomeScreen():
 """
 Method: listBands()
     Description:
-        Method that lists all existing band settings in the .bands file.
+        Method that lists all existing band settings in the .bands.json file.
 """
 def listBands():
-    with open(".bands", "r") as file:
-        dict = pickle.load(file)
-        for key, val in dict.items():
-            print SEPARATOR
-            print "Band " + str(key) + ": " + val["DESCR"]
-            print "LO Frequency: " + LOFREQS[val["LOFREQ"]]
-            print "VQ Attenuation: " + str(val["ATTEN"]["VQ"])
-            print "VI Attenuation: " + str(val["ATTEN"]["VI"])
-            print "HQ Attenuation: " + str(val["ATTEN"]["HQ"])
-            print "HI Attenuation: " + str(val["ATTEN"]["HI"])
+    dict = store.load()
+    for key, val in sorted(dict.items()):
         print SEPARATOR
-        optionScreen()
+        print "Band " + str(key) + ": " + val["DESCR"]
+        print "LO Frequency: " + LOFREQS[val["LOFREQ"]]
+        print "VQ Attenuation: " + str(val["ATTEN"]["VQ"])
+        print "VI Attenuation: " + str(val["ATTEN"]["VI"])
+        print "HQ Attenuation: " + str(val["ATTEN"]["HQ"])
+        print "HI Attenuation: " + str(val["ATTEN"]["HI"])
+    print SEPARATOR
+    optionScreen()
 
 """
 Method: addBand()
@@ -62,71 +66,68 @@ Method: addBand()
         existing band setting or to create a new one. 
 """
 def addBand():
-    dict = None
-    with open(".bands", "r") as file:
-        dict = pickle.load(file)
-        clrScreen()
-        print SEPARATOR
-        print "Follow the instructions below to add or modify"
-        print "a band."
-        print SEPARATOR
+    dict = store.load()
+    clrScreen()
+    print SEPARATOR
+    print "Follow the instructions below to add or modify"
+    print "a band."
+    print SEPARATOR
         
-        band = None
-        while band is None:
-            band = raw_input("Please enter a valid band number: ")
-            try:
-                band = int(band)
-            except:
-                band = None
+    band = None
+    while band is None:
+        band = raw_input("Please enter a valid band number: ")
+        try:
+            band = int(band)
+        except:
+            band = None
             
-            if band in dict.keys():
-                overwriteFlag = None
-                while overwriteFlag is None:
-                    overwriteFlag = raw_input("Band number already in use, " +
-                                               "overwrite? (y/n) ")
-                    if overwriteFlag == "n":
-                        band = None
-                    elif overwriteFlag != "y":
-                        overwriteFlag = None
-                    else:
-                        pass
+        if band in dict.keys():
+            overwriteFlag = None
+            while overwriteFlag is None:
+                overwriteFlag = raw_input("Band number already in use, " +
+                                           "overwrite? (y/n) ")
+                if overwriteFlag == "n":
+                    band = None
+                elif overwriteFlag != "y":
+                    overwriteFlag = None
+                else:
+                    pass
         
-        bandDescr = raw_input("Give a description for this band.\n")
+    bandDescr = raw_input("Give a description for this band.\n")
         
-        loFreq = None
-        print SEPARATOR
-        print "Select a LO frequency by typing the corresponding"
-        print "number:"
-        print "(0) 3.4GHz"
-        print "(1) 7.5GHz"
-        print "(2) 11.5GHz"
-        print "(3) 15.5GHz"
+    loFreq = None
+    print SEPARATOR
+    print "Select a LO frequency by typing the corresponding"
+    print "number:"
+    print "(0) 3.4GHz"
+    print "(1) 7.5GHz"
+    print "(2) 11.5GHz"
+    print "(3) 15.5GHz"
         
-        while loFreq is None:
-            loFreq = raw_input("Please choose a LO frequency: ")
-            try:
-                loFreq = int(loFreq)
-            except:
-                loFreq = None
-                print "Please pick one of the given LO frequencies."
+    while loFreq is None:
+        loFreq = raw_input("Please choose a LO frequency: ")
+        try:
+            loFreq = int(loFreq)
+        except:
+            loFreq = None
+            print "Please pick one of the given LO frequencies."
             
-            if loFreq < 0 or loFreq > 3:
-                loFreq = None
-                print "Please pick one of the given LO frequencies."
+        if loFreq < 0 or loFreq > 3:
+            loFreq = None
+            print "Please pick one of the given LO frequencies."
         
-        print SEPARATOR
-        vq = getDouble("VQ")
-        print SEPARATOR
-        vi = getDouble("VI")
-        print SEPARATOR
-        hq = getDouble("HQ")
-        print SEPARATOR
-        hi = getDouble("HI")
+    print SEPARATOR
+    vq = getDouble("VQ")
+    print SEPARATOR
+    vi = getDouble("VI")
+    print SEPARATOR
+    hq = getDouble("HQ")
+    print SEPARATOR
+    hi = getDouble("HI")
         
-        dict[band] = formatData(bandDescr, loFreq, vq, vi, hq, hi)
+    dict[band] = formatData(bandDescr, loFreq, vq, vi, hq, hi)
         
-    with open(".bands", "w") as file:
-        pickle.dump(dict, file)
+    store.save(dict)
         
     done = None
     while done is None:
@@ -147,25 +148,23 @@ Method: removeBand()
         only occur if meant to be.
 """
 def removeBand():
-    dict = None
-    with open(".bands", "r") as file:
-        dict = pickle.load(file)
-        clrScreen()
-        print SEPARATOR
-        print "Follow the instructions below to remove a band."
-        print SEPARATOR
+    dict = store.load()
+    clrScreen()
+    print SEPARATOR
+    print "Follow the instructions below to remove a band."
+    print SEPARATOR
         
-        band = None
-        while band is None:
-            band = raw_input("Please enter a valid band number: ")
-            try:
-                band = int(band)
-            except:
-                band = None
-                print "The given band number does not exist."
-            if band not in dict.keys():
-                band = None
-                print "The given band number does not exist."
+    band = None
+    while band is None:
+        band = raw_input("Please enter a valid band number: ")
+        try:
+            band = int(band)
+        except:
+            band = None
+            print "The given band number does not exist."
+        if band not in dict.keys():
+            band = None
+            print "The given band number does not exist."
         
     confirm = None
     while confirm is None:
@@ -173,8 +172,7 @@ def removeBand():
                             str(band) + "? (y/n) ")
         if confirm == "y":  
             del dict[band]
-            with open(".bands", "w") as file:
-                pickle.dump(dict, file)
+            store.save(dict)
             
             done = None
             while done is None:
@@ -223,8 +221,8 @@ def getDouble(polarComp):
 Method: formatData()
     Description:
         Helper method to format all the data that is collected in addBand()
-        into the standard dictionary format to add into the .bands setting 
-        file.
+        into the standard dictionary format to add into the .bands.json 
+        setting file.
 """            
 def formatData(bandDescr, loFreq, vq, vi, hq, hi):
     dict = {"LOFREQ": loFreq,
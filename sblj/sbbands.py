@@ -0,0 +1,112 @@
+"""
+    STARBURST Band Store
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import sbio
+import os
+import json
+import pickle
+
+# Default dictionary for band levels.
+
+DEFAULT_BANDS = {1: {"LOFREQ": 0,
+                     "ATTEN": {"VQ": 10, "VI": 10, "HQ": 12, "HI": 12},
+                     "DESCR": "Default band"}}
+
+"""
+Class: BandStore extends object
+    Description:
+        Band table kept as JSON (keyed by band, as edited with bands.py).
+        Unlike the pickled .bands file it replaces, loading it cannot run
+        code. Processes holding a store call changed() before using the
+        table: it stats the file at most once every checkInterval seconds
+        and reports whether it was replaced or modified since the last
+        load, so that edits are picked up without restarting.
+    Arguments:
+        path: path of the JSON band file. Relative paths are resolved
+            against the working directory when the store is created.
+        legacyPath: pickled band file of earlier versions, converted once
+            when path does not exist yet.
+        checkInterval: seconds between two looks at the file.
+"""
+class BandStore(object):
+    def __init__(self, path=".bands.json", legacyPath=".bands",
+                 checkInterval=0.5):
+        self.path = os.path.abspath(path)
+        self.legacyPath = os.path.abspath(legacyPath)
+        self.checkInterval = checkInterval
+        self.signature = None
+        self.checked = None
+
+    # Private helper methods
+
+    def __signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime, stat.st_size, stat.st_ino)
+
+    def __create(self):
+        bands = DEFAULT_BANDS
+        try:
+            with open(self.legacyPath, "rb") as file:
+                bands = pickle.load(file)
+        except IOError:
+            pass
+        self.save(bands)
+
+    """
+    Method: load()
+        Description:
+            Reads the band table, creating the file with the default
+            table (or the contents of the legacy pickled file) when it
+            does not exist.
+        Returns:
+            bands: dictionary of band settings keyed by integer band.
+        Raises:
+            ValueError: occurs when the file is not valid JSON.
+    """
+    def load(self):
+        if not os.path.exists(self.path):
+            self.__create()
+
+        signature = self.__signature()
+        with open(self.path, "r") as file:
+            bands = json.load(file)
+        self.signature = signature
+        self.checked = sbio.monotonic()
+        return dict((int(band), ref) for band, ref in bands.items())
+
+    """
+    Method: save(bands)
+        Description:
+            Writes the band table. The file is replaced in one rename, so
+            processes reloading it never see it half written.
+    """
+    def save(self, bands):
+        scratch = self.path + ".tmp"
+        with open(scratch, "w") as file:
+            json.dump(dict((str(band), ref) for band, ref in bands.items()),
+                      file, indent=2, sort_keys=True)
+        if os.name == "nt" and os.path.exists(self.path):
+            os.remove(self.path)
+        os.rename(scratch, self.path)
+
+    """
+    Method: changed()
+        Description:
+            Returns True when the file differs from the one last loaded.
+            Only looks at the file once every checkInterval seconds and
+            returns False in between, and while the file is missing.
+    """
+    def changed(self):
+        now = sbio.monotonic()
+        if self.checked is not None and \
+                now - self.checked < self.checkInterval:
+            return False
+        self.checked = now
+        signature = self.__signature()
+        return signature is not None and signature != self.signature
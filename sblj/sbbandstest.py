@@ -0,0 +1,79 @@
+"""
+    STARBURST Band Store Test Suite
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import unittest
+import os
+import pickle
+import shutil
+import tempfile
+import sbbands
+
+"""
+TestBandStore Test Group Description:
+    This group of tests makes sure that band tables survive the round trip
+    through JSON, that pickled band files are converted, and that changes
+    to the file are noticed no more often than asked for.
+
+    Test Count: 2
+"""
+class TestBandStore(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "bands.json")
+        self.legacyPath = os.path.join(self.dir, "bands")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    """
+    Test - test_convertsLegacyFile:
+        Given a pickled band file and no JSON band file,
+        Then the JSON file is created with its bands, keyed by integer
+            band.
+    """
+    def test_convertsLegacyFile(self):
+        bands = {3: {"LOFREQ": 1, "DESCR": "Old band",
+                     "ATTEN": {"VQ": 1.5, "VI": 2, "HQ": 3, "HI": 4}}}
+        with open(self.legacyPath, "wb") as file:
+            pickle.dump(bands, file)
+
+        store = sbbands.BandStore(self.path, self.legacyPath)
+        self.assertEqual(store.load(), bands)
+        self.assertTrue(os.path.exists(self.path))
+
+        os.remove(self.legacyPath)
+        self.assertEqual(sbbands.BandStore(self.path).load(), bands)
+
+    """
+    Test - test_changedThrottled:
+        Given a loaded band file that is then replaced,
+        Then changed() reports it only once checkInterval has passed, and
+            no longer once it was loaded again.
+    """
+    def test_changedThrottled(self):
+        store = sbbands.BandStore(self.path, self.legacyPath, 60)
+        self.assertEqual(store.load(), sbbands.DEFAULT_BANDS)
+        self.assertFalse(store.changed())
+
+        store.save({2: {"LOFREQ": 0, "DESCR": "New band",
+                        "ATTEN": {"VQ": 0, "VI": 0, "HQ": 0, "HI": 0}}})
+        self.assertFalse(store.changed())
+
+        store.checkInterval = 0
+        self.assertTrue(store.changed())
+        self.assertEqual(list(store.load().keys()), [2])
+        self.assertFalse(store.changed())
+
+
+# Main Method
+if __name__ == '__main__':
+    testGroups = [TestBandStore]
+    for tG in testGroups:
+        print "\nTesting: " + str(tG.__name__)
+        suite = unittest.TestLoader().loadTestsFromTestCase(
+            tG)
+        unittest.TextTestRunner(verbosity=2).run(suite)
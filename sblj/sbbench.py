@@ -0,0 +1,308 @@
+"""
+    STARBURST Device I/O Benchmark Suite
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import sblj
+import sbovro
+import sbsim
+import sbio
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+
+"""
+Method: measure(func, repeat, backend)
+    Description:
+        Runs func repeatedly against a simulated backend and measures the
+        round trips, wall time and allocations of a single call.
+    Arguments:
+        func: the operation to measure (called without arguments).
+        repeat: number of measured calls.
+        backend: the SimulatedLJM serving the devices.
+    Returns:
+        result: dictionary with the per call round trips ("roundTrips",
+            with a breakdown by LJM call under "calls"), register frames
+            ("frames"), wall time in seconds ("mean", "min", "max",
+            "median") and net gc tracked objects ("objects").
+"""
+def measure(func, repeat, backend):
+    func()
+
+    before = dict((op, list(count)) for op, count in backend.stats.items())
+    times = []
+    gc.collect()
+    objects = len(gc.get_objects())
+    for i in range(repeat):
+        start = sbio.monotonic()
+        func()
+        times.append(sbio.monotonic() - start)
+    objects = (len(gc.get_objects()) - objects) / float(repeat)
+
+    calls = {}
+    frames = 0
+    for op, count in backend.stats.items():
+        old = before.get(op, [0, 0])
+        if count[0] > old[0]:
+            calls[op] = (count[0] - old[0]) / float(repeat)
+            frames += count[1] - old[1]
+
+    times.sort()
+    return {"roundTrips": sum(calls.values()), "calls": calls,
+            "frames": frames / float(repeat),
+            "mean": sum(times) / repeat, "min": times[0],
+            "max": times[-1], "median": times[len(times) // 2],
+            "objects": objects}
+
+"""
+Method: operations(generic, lo, ant, ovro)
+    Description:
+        Public operations of StarburstLJ, LONoiseLJ, AntennaLJ and
+        OVROStarburst that are benchmarked, keyed by a stable name.
+"""
+def operations(generic, lo, ant, ovro):
+    return [
+        ("StarburstLJ.getParams", generic.getParams),
+        ("StarburstLJ.setLJName", lambda: generic.setLJName("Bench")),
+        ("StarburstLJ.reboot", generic.reboot),
+        ("LONoiseLJ.getParams", lo.getParams),
+        ("LONoiseLJ.setLOFreq",
+         lambda: lo.setLOFreq(sblj.LOFreqConstants.LO_15_5GHZ)),
+        ("LONoiseLJ.setNoiseSourceOn", lo.setNoiseSourceOn),
+        ("LONoiseLJ.setNoiseSourceOff", lo.setNoiseSourceOff),
+        ("AntennaLJ.getParams", ant.getParams),
+        ("AntennaLJ.setAttenuator", lambda: ant.setAttenuator(10.5)),
+        ("AntennaLJ.deltaAttenuator", lambda: ant.deltaAttenuator(0)),
+        ("AntennaLJ.selectNoiseSource", ant.selectNoiseSource),
+        ("AntennaLJ.selectRFSource", ant.selectRFSource),
+        ("OVROStarburst.getMonitorData", ovro.getMonitorData),
+        ("OVROStarburst.selectNoiseSource", ovro.selectNoiseSource),
+        ("OVROStarburst.selectRFSource", ovro.selectRFSource),
+        ("OVROStarburst.setToBand", lambda: ovro.setToBand(1)),
+        ("OVROStarburst.alterAntByDelta", lambda: ovro.alterAntByDelta(0)),
+    ]
+
+"""
+Method: makeOVRO(count)
+    Description:
+        Builds an OVROStarburst with count simulated antennas (keyed "A",
+        "B", then "ANT03", "ANT04", ...). The band file is created in a
+        scratch directory so that the benchmark does not touch the .bands
+        file of the working directory.
+"""
+def makeOVRO(count=2):
+    antennas = [("ANT%02d" % i, "BenchAnt%02d" % i)
+                for i in range(3, count + 1)]
+    cwd = os.getcwd()
+    scratch = tempfile.mkdtemp()
+    try:
+        os.chdir(scratch)
+        return sbovro.OVROStarburst("BenchLONoise", "BenchA", "BenchB",
+                                    "ETHERNET", "SIM", antennas)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(scratch)
+
+"""
+Method: runBenchmarks(latency, repeat, match)
+    Description:
+        Benchmarks every public device operation against the default
+        simulated backend.
+    Arguments:
+        latency: sbsim.LatencyModel used for every call.
+        repeat: number of measured calls per operation.
+        match: optional substring selecting the operations to run.
+    Returns:
+        results: dictionary with the run description under "meta" and
+            the measure() result of every operation under "results".
+"""
+def runBenchmarks(latency=None, repeat=20, match=None):
+    backend = sbsim.backend
+    backend.reset()
+    backend.latency = latency if latency is not None else \
+        sbsim.LatencyModel()
+
+    generic = sblj.StarburstLJ("BenchGeneric", "ETHERNET", "SIM")
+    lo = sblj.LONoiseLJ("BenchLO", "ETHERNET", "SIM")
+    ant = sblj.AntennaLJ("BenchAntenna", "ETHERNET", "SIM")
+    ovro = makeOVRO()
+
+    results = {}
+    for name, func in operations(generic, lo, ant, ovro):
+        if match is None or match in name:
+            results[name] = measure(func, repeat, backend)
+
+    meta = {"time": time.time(), "python": platform.python_version(),
+            "host": platform.node(), "repeat": repeat,
+            "latency": {"base": backend.latency.base,
+                        "perFrame": backend.latency.perFrame,
+                        "jitter": backend.latency.jitter}}
+    return {"meta": meta, "results": results}
+
+"""
+Method: runScaling(counts, latency, repeat)
+    Description:
+        Benchmarks the monitor and band set operations of OVROStarburst
+        systems with increasing numbers of simulated antennas.
+    Arguments:
+        counts: numbers of antennas to benchmark.
+        latency: sbsim.LatencyModel used for every call.
+        repeat: number of measured calls per operation.
+    Returns:
+        results: dictionary with the run description under "meta" and
+            the measure() result of getMonitorData and setToBand keyed by
+            number of antennas under "scaling".
+"""
+def runScaling(counts=(2, 8, 32), latency=None, repeat=10):
+    backend = sbsim.backend
+    backend.reset()
+    backend.latency = latency if latency is not None else \
+        sbsim.LatencyModel()
+
+    scaling = {}
+    for count in counts:
+        ovro = makeOVRO(count)
+        scaling[count] = {
+            "getMonitorData": measure(ovro.getMonitorData, repeat, backend),
+            "setToBand": measure(lambda: ovro.setToBand(1), repeat,
+                                 backend)}
+        ovro.endConnection()
+
+    meta = {"time": time.time(), "python": platform.python_version(),
+            "host": platform.node(), "repeat": repeat,
+            "latency": {"base": backend.latency.base,
+                        "perFrame": backend.latency.perFrame,
+                        "jitter": backend.latency.jitter}}
+    return {"meta": meta, "scaling": scaling}
+
+"""
+Method: formatScaling(results)
+    Description:
+        Formats the output of runScaling as a text table with the median
+        time and operations per second for every number of antennas.
+"""
+def formatScaling(results):
+    lines = ["%-9s %-16s %8s %10s %10s" % ("antennas", "operation",
+                                           "trips", "median ms", "ops/s")]
+    for count in sorted(results["scaling"]):
+        for name, result in sorted(results["scaling"][count].items()):
+            rate = 0
+            if result["median"] > 0:
+                rate = 1 / result["median"]
+            lines.append("%-9d %-16s %8.1f %10.3f %10.1f" % (
+                count, name, result["roundTrips"], result["median"] * 1e3,
+                rate))
+    return "\n".join(lines)
+
+"""
+Method: saveResults(results, path)
+    Description:
+        Saves the output of runBenchmarks as JSON.
+"""
+def saveResults(results, path):
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+
+"""
+Method: loadResults(path)
+    Description:
+        Loads results saved by saveResults.
+"""
+def loadResults(path):
+    with open(path, "r") as file:
+        return json.load(file)
+
+"""
+Method: compareResults(old, new)
+    Description:
+        Compares two benchmark runs operation by operation.
+    Returns:
+        comparison: dictionary keyed by operation with the round trips
+            and median wall time of both runs and the ratio new/old of
+            the median times.
+"""
+def compareResults(old, new):
+    comparison = {}
+    for name, result in new["results"].items():
+        if name not in old["results"]:
+            continue
+        before = old["results"][name]
+        ratio = None
+        if before["median"] > 0:
+            ratio = result["median"] / before["median"]
+        comparison[name] = {"roundTrips": (before["roundTrips"],
+                                           result["roundTrips"]),
+                            "median": (before["median"], result["median"]),
+                            "ratio": ratio}
+    return comparison
+
+"""
+Method: formatResults(results, comparison)
+    Description:
+        Formats a benchmark run (and optionally its comparison with an
+        older run) as a text table.
+"""
+def formatResults(results, comparison=None):
+    lines = ["%-34s %8s %8s %10s %10s %9s" % ("operation", "trips",
+                                              "frames", "median ms",
+                                              "max ms", "objects")]
+    for name in sorted(results["results"]):
+        result = results["results"][name]
+        line = "%-34s %8.1f %8.1f %10.3f %10.3f %9.1f" % (
+            name, result["roundTrips"], result["frames"],
+            result["median"] * 1e3, result["max"] * 1e3, result["objects"])
+        if comparison is not None and name in comparison and \
+                comparison[name]["ratio"] is not None:
+            line += "  x%.2f" % comparison[name]["ratio"]
+        lines.append(line)
+    return "\n".join(lines)
+
+"""
+Main Method
+"""
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks the Starburst "
+                                     "LabJack I/O paths against simulated "
+                                     "devices.")
+    parser.add_argument("--latency", type=float, default=2.0,
+                        help="base latency per LJM call in ms")
+    parser.add_argument("--per-frame", type=float, default=20.0,
+                        help="latency per register frame in us")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="standard deviation of the jitter in ms")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--match", default=None,
+                        help="only run operations containing this text")
+    parser.add_argument("--output", default=None,
+                        help="save the results as JSON to this file")
+    parser.add_argument("--compare", default=None,
+                        help="JSON results of an earlier run to compare to")
+    parser.add_argument("--antennas", default=None,
+                        help="comma separated numbers of antennas to run "
+                        "the monitor/band set scaling benchmark with "
+                        "(e.g. 2,8,32)")
+    args = parser.parse_args()
+
+    latency = sbsim.LatencyModel(args.latency * 1e-3, args.per_frame * 1e-6,
+                                 args.jitter * 1e-3, seed=0)
+    if args.antennas is not None:
+        counts = [int(count) for count in args.antennas.split(",")]
+        results = runScaling(counts, latency, args.repeat)
+        print(formatScaling(results))
+        if args.output is not None:
+            saveResults(results, args.output)
+        raise SystemExit(0)
+
+    results = runBenchmarks(latency, args.repeat, args.match)
+    comparison = None
+    if args.compare is not None:
+        comparison = compareResults(loadResults(args.compare), results)
+    print(formatResults(results, comparison))
+    if args.output is not None:
+        saveResults(results, args.output)
@@ -0,0 +1,89 @@
+"""
+    STARBURST Device I/O Benchmark Suite Test Suite
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+import sbbench
+
+"""
+TestBenchmarkHarness Test Group Description:
+    This group of tests makes sure that the benchmark harness counts the
+    round trips of each operation and that results can be saved and
+    compared.
+
+    Test Count: 3
+"""
+class TestBenchmarkHarness(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    """
+    Test - test_roundTripsPerOperation:
+        Given a benchmark run against simulated LabJacks,
+        Then every public operation is reported with the number of LJM
+            calls it makes.
+    """
+    def test_roundTripsPerOperation(self):
+        results = sbbench.runBenchmarks(repeat=2)["results"]
+
+        self.assertEqual(len(results), 17)
+        self.assertEqual(results["LONoiseLJ.setLOFreq"]["roundTrips"], 1)
+        self.assertEqual(results["AntennaLJ.setAttenuator"]["calls"],
+                         {"eWriteNames": 1})
+        self.assertEqual(results["AntennaLJ.setAttenuator"]["frames"], 14)
+        for result in results.values():
+            self.assertTrue(result["roundTrips"] > 0)
+            self.assertTrue(result["median"] >= 0)
+
+    """
+    Test - test_saveAndCompare:
+        Given two saved benchmark runs,
+        Then they can be loaded back and compared per operation.
+    """
+    def test_saveAndCompare(self):
+        path = os.path.join(self.dir, "bench.json")
+        old = sbbench.runBenchmarks(repeat=2, match="LONoiseLJ")
+        sbbench.saveResults(old, path)
+
+        new = sbbench.runBenchmarks(repeat=2, match="LONoiseLJ")
+        comparison = sbbench.compareResults(sbbench.loadResults(path), new)
+
+        self.assertEqual(sorted(comparison.keys()),
+                         sorted(new["results"].keys()))
+        self.assertEqual(comparison["LONoiseLJ.getParams"]["roundTrips"],
+                         (1, 1))
+
+    """
+    Test - test_scaling:
+        Given OVRO systems with 2 and 6 simulated antennas,
+        Then the monitor and band set operations make one LJM call per
+            device and are reported per number of antennas.
+    """
+    def test_scaling(self):
+        results = sbbench.runScaling([2, 6], repeat=2)
+
+        self.assertEqual(sorted(results["scaling"].keys()), [2, 6])
+        for count in [2, 6]:
+            for name in ["getMonitorData", "setToBand"]:
+                self.assertEqual(
+                    results["scaling"][count][name]["roundTrips"], count + 1)
+        self.assertTrue("setToBand" in sbbench.formatScaling(results))
+
+
+# Main Method
+if __name__ == '__main__':
+    testGroups = [TestBenchmarkHarness]
+    for tG in testGroups:
+        print "\nTesting: " + str(tG.__name__)
+        suite = unittest.TestLoader().loadTestsFromTestCase(
+            tG)
+        unittest.TextTestRunner(verbosity=2).run(suite)
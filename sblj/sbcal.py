@@ -0,0 +1,218 @@
+"""
+    STARBURST Noise Calibration Cycle
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import sbio
+import time
+import collections
+
+# Signal path states of a calibration cycle. In NOISE_ON and NOISE_OFF
+# the antennas are switched to the noise source path (off-sky) with the
+# noise source on or off, in RF they are back on the sky.
+
+NOISE_ON = "NOISE_ON"
+NOISE_OFF = "NOISE_OFF"
+RF = "RF"
+
+# Settings of the noise source (on the LO/Noise LabJack) and of the
+# antenna input selection in every state.
+
+STATES = {NOISE_ON: (True, True), NOISE_OFF: (False, True),
+          RF: (False, False)}
+
+# Antenna parameters measured by default.
+
+POWER_FIELDS = ["VQPOW", "VIPOW", "HQPOW", "HIPOW"]
+
+"""
+Class: CalibrationStep extends namedtuple
+    Description:
+        One state of a calibration schedule.
+    Fields:
+        state: NOISE_ON, NOISE_OFF or RF.
+        settle: seconds waited after the switch to state has been written
+            to every LabJack before measuring (not waited when the
+            previous step already was in state).
+        samples: number of measurements made in state.
+"""
+CalibrationStep = collections.namedtuple("CalibrationStep",
+                                         ["state", "settle", "samples"])
+
+# Default schedule: noise source on, then off, both on the noise source
+# path, after which the antennas are switched back to the sky.
+
+DEFAULT_SCHEDULE = [CalibrationStep(NOISE_ON, 0.05, 1),
+                    CalibrationStep(NOISE_OFF, 0.05, 1)]
+
+"""
+Class: PowerSet extends namedtuple
+    Description:
+        One measurement of a calibration cycle.
+    Fields:
+        state: state the measurement was made in.
+        monotonic: sbio.monotonic() time half way through the reads.
+        timestamp: wall clock time half way through the reads.
+        duration: seconds the reads took.
+        data: dictionary of dictionaries of the parameters read keyed by
+            antenna (as returned by getMonitorData).
+"""
+PowerSet = collections.namedtuple("PowerSet", [
+    "state", "monotonic", "timestamp", "duration", "data"])
+
+"""
+Class: CalibrationResult extends object
+    Description:
+        Measurements and switch times of one calibration cycle.
+    Attributes:
+        sets: list of PowerSet in the order they were measured.
+        switches: list of (state, sent, done) tuples with the
+            sbio.monotonic() times a switch was sent and written to every
+            LabJack.
+        offSky: seconds spent off the sky, from every switch off the sky
+            being sent to the switch back to the sky being written.
+"""
+class CalibrationResult(object):
+    def __init__(self):
+        self.sets = []
+        self.switches = []
+        self.offSky = 0.0
+
+    def select(self, state):
+        return [powers for powers in self.sets if powers.state == state]
+
+    def on(self):
+        return self.select(NOISE_ON)
+
+    def off(self):
+        return self.select(NOISE_OFF)
+
+"""
+Class: CalibrationCycle extends object
+    Description:
+        Runs a fixed schedule of signal path states, settle delays and
+        measurements on an OVROStarburst system. Every switch writes only
+        the LabJacks whose setting changes, all of them concurrently, and
+        every measurement is one batched read per antenna, all antennas
+        concurrently, waiting for every antenna also when a device
+        timeout is set (refer to OVROStarburst.setDeviceTimeout). The
+        antennas are always switched back to the sky at
+        the end of the cycle, also when it fails, and right after the
+        last off-sky measurement. Measurements wait for the last band
+        switch to settle (refer to OVROStarburst.setToBand).
+    Arguments:
+        ovro: OVROStarburst system.
+        schedule: list of CalibrationStep.
+        antennas: list of keys to antennas to calibrate (all antennas
+            when omitted).
+        fields: list of antenna parameters measured.
+"""
+class CalibrationCycle(object):
+    def __init__(self, ovro, schedule=None, antennas=None,
+                 fields=POWER_FIELDS):
+        self.ovro = ovro
+        self.schedule = DEFAULT_SCHEDULE if schedule is None else schedule
+        for step in self.schedule:
+            if step.state not in STATES:
+                raise ValueError("Unknown calibration state " +
+                                 str(step.state) + ".")
+        self.antennas = (list(ovro.ljAntennas.keys()) if antennas is None
+                         else list(antennas))
+        for key in self.antennas:
+            ovro.ljAntennas[key]
+        self.fields = dict((key, list(fields)) for key in self.antennas)
+
+    # Private helper methods
+
+    def __switch(self, state, current, result):
+        noise, selected = STATES[state]
+        calls = {}
+        if current is None or STATES[current][0] != noise:
+            lo = self.ovro.ljLONoise
+            calls["LONOISE"] = (lo.setNoiseSourceOn if noise
+                                else lo.setNoiseSourceOff)
+        if current is None or STATES[current][1] != selected:
+            for key in self.antennas:
+                lj = self.ovro.ljAntennas[key]
+                calls[key] = (lj.selectNoiseSource if selected
+                              else lj.selectRFSource)
+
+        sent = sbio.monotonic()
+        self.ovro.workers.fanOut(calls)
+        done = sbio.monotonic()
+        result.switches.append((state, sent, done))
+        return sent, done
+
+    def __enter(self, state, result):
+        # The state is unknown (and every LabJack written on the next
+        # switch) until a switch succeeds.
+        current = self.current
+        self.current = None
+        sent, done = self.__switch(state, current, result)
+        self.current = state
+
+        if state != RF and self.leftSky is None:
+            self.leftSky = sent
+        elif state == RF and self.leftSky is not None:
+            result.offSky += done - self.leftSky
+            self.leftSky = None
+        return done
+
+    def __backToSky(self, result):
+        # Best effort after a failure. (Kept in its own method so that the
+        # error handled here does not replace the one re-raised by the
+        # caller under Python 2.)
+        try:
+            self.__enter(RF, result)
+        except Exception:
+            pass
+
+    def __measure(self, state, result):
+        # A band switch that has not settled yet delays the measurement.
+        self.ovro.waitForBand()
+        # The antennas are read directly rather than through
+        # getMonitorData, whose device timeout would hand back the values
+        # of an earlier state for an antenna that is late.
+        calls = dict((key, lambda lj=self.ovro.ljAntennas[key],
+                      names=names: lj.getParams(list(names)))
+                     for key, names in self.fields.items())
+        start = sbio.monotonic()
+        data = dict(self.ovro.workers.fanOut(calls))
+        end = sbio.monotonic()
+        middle = (start + end) / 2.0
+        result.sets.append(PowerSet(state, middle,
+                                    time.time() - (end - middle),
+                                    end - start, data))
+
+    """
+    Method: run()
+        Description:
+            Runs the schedule once.
+        Returns:
+            result: CalibrationResult.
+        Raises:
+            sbpool.MultiDeviceError: occurs when at least one of the
+                LabJack units fails. The switch back to the sky is still
+                attempted on all of them.
+    """
+    def run(self):
+        result = CalibrationResult()
+        self.current = None
+        self.leftSky = None
+        try:
+            for step in self.schedule:
+                if step.state != self.current:
+                    done = self.__enter(step.state, result)
+                    wait = done + step.settle - sbio.monotonic()
+                    if wait > 0:
+                        time.sleep(wait)
+                for i in range(step.samples):
+                    self.__measure(step.state, result)
+        except Exception:
+            if self.schedule:
+                self.__backToSky(result)
+            raise
+        if self.current != RF and self.schedule:
+            self.__enter(RF, result)
+        return result
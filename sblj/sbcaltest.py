@@ -0,0 +1,111 @@
+"""
+    STARBURST Noise Calibration Cycle Test Suite
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import unittest
+import sbovro
+import sbcal
+import sbio
+import sbsim
+
+"""
+TestCalibrationCycle Test Group Description:
+    This group of tests makes sure that calibration cycles switch and
+    measure every LabJack concurrently, write only what changes, and
+    always leave the antennas on the sky.
+
+    Test Count: 3
+"""
+class TestCalibrationCycle(unittest.TestCase):
+
+    def setUp(self):
+        sbsim.backend.reset()
+        sbsim.backend.latency = sbsim.LatencyModel(0.002)
+        self.ovroObj = sbovro.OVROStarburst(
+            "LONoise", "AntennaA", "AntennaB", "ETHERNET", "SIM",
+            [("C", "AntennaC")])
+
+    def tearDown(self):
+        self.ovroObj.endConnection()
+        sbsim.backend.latency = sbsim.LatencyModel()
+
+    """
+    Test - test_onOffPowerSets:
+        Given the default schedule on three antennas with 2ms latency,
+        Then the noise source raises the measured powers, only the LO is
+            written between the on and off sets, the time off the sky is
+            about the two settle delays, and the antennas end on the sky.
+    """
+    def test_onOffPowerSets(self):
+        devices = sbsim.backend.devices
+        with sbio.measureIO(self.ovroObj.devices()) as cost:
+            result = self.ovroObj.calibrate()
+
+        on, off = result.on(), result.off()
+        self.assertEqual((len(on), len(off)), (1, 1))
+        for key in ["A", "B", "C"]:
+            self.assertNotEqual(on[0].data[key]["VQPOW"],
+                                off[0].data[key]["VQPOW"])
+            self.assertEqual(sorted(on[0].data[key].keys()),
+                             sorted(sbcal.POWER_FIELDS + ["TIMESTAMP"]))
+        self.assertTrue(on[0].monotonic < off[0].monotonic)
+
+        self.assertEqual([switch[0] for switch in result.switches],
+                         [sbcal.NOISE_ON, sbcal.NOISE_OFF, sbcal.RF])
+        self.assertEqual(cost["LONOISE"].calls, 2)
+        self.assertEqual(cost["A"].calls, 4)
+        self.assertTrue(0.1 <= result.offSky < 0.2)
+
+        for key in ["AntennaA", "AntennaB", "AntennaC"]:
+            self.assertEqual(devices[key].registers["EIO1"], 0)
+            self.assertEqual(devices[key].registers["EIO2"], 0)
+        self.assertEqual(devices["LONoise"].registers["EIO0"], 0)
+
+    """
+    Test - test_backOnSkyAfterFailure:
+        Given that antenna C loses its connection,
+        Then the cycle raises a MultiDeviceError and the other antennas
+            are back on the sky with the noise source off.
+    """
+    def test_backOnSkyAfterFailure(self):
+        devices = sbsim.backend.devices
+        self.ovroObj.ljAntennas["C"].handle = None
+        schedule = [sbcal.CalibrationStep(sbcal.NOISE_ON, 0, 2)]
+
+        self.assertRaises(sbovro.sbpool.MultiDeviceError,
+                          self.ovroObj.calibrate, schedule)
+        for key in ["AntennaA", "AntennaB"]:
+            self.assertEqual(devices[key].registers["EIO1"], 0)
+        self.assertEqual(devices["LONoise"].registers["EIO0"], 0)
+        self.assertRaises(ValueError, sbcal.CalibrationCycle, self.ovroObj,
+                          [sbcal.CalibrationStep("SKY", 0, 1)])
+
+    """
+    Test - test_slowAntennaMeasured:
+        Given a 20ms device timeout and antenna C answering in 60ms,
+        Then every power set holds values read in its own state, with
+            none of them stale.
+    """
+    def test_slowAntennaMeasured(self):
+        self.ovroObj.setDeviceTimeout(0.02)
+        sbsim.backend.devices["AntennaC"].latency = sbsim.LatencyModel(0.06)
+        result = self.ovroObj.calibrate()
+
+        on, off = result.on(), result.off()
+        for key in ["A", "B", "C"]:
+            self.assertFalse("STALE" in on[0].data[key])
+            self.assertFalse("STALE" in off[0].data[key])
+            self.assertNotEqual(on[0].data[key]["VQPOW"],
+                                off[0].data[key]["VQPOW"])
+
+
+# Main Method
+if __name__ == '__main__':
+    testGroups = [TestCalibrationCycle]
+    for tG in testGroups:
+        print "\nTesting: " + str(tG.__name__)
+        suite = unittest.TestLoader().loadTestsFromTestCase(
+            tG)
+        unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,131 @@
+"""
+    STARBURST Read Timing and Device Clock Model
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import sbio
+import time
+import collections
+
+"""
+Class: ReadTiming extends namedtuple
+    Description:
+        Timing of one batched read of a LabJack.
+    Fields:
+        start: sbio.monotonic() time right before the read was sent.
+        end: sbio.monotonic() time right after it returned.
+        sample: sbio.monotonic() estimate of when the registers were
+            sampled (the midpoint of start and end, or the time given by
+            the clock model of the device when CORE_TIMER was read).
+        timestamp: wall clock time of sample.
+        ticks: CORE_TIMER value read in the same batch (None when it was
+            not read).
+"""
+ReadTiming = collections.namedtuple("ReadTiming", [
+    "start", "end", "sample", "timestamp", "ticks"])
+
+"""
+Method: wallTime(monotonic)
+    Description:
+        Wall clock time of an sbio.monotonic() time.
+"""
+def wallTime(monotonic):
+    now = sbio.monotonic()
+    return time.time() - (now - monotonic)
+
+"""
+Class: ClockModel extends object
+    Description:
+        Maps the CORE_TIMER of a LabJack onto the sbio.monotonic() clock
+        of the host. Every read of CORE_TIMER gives a point known to lie
+        between the start and the end of its read. The timer is unwrapped
+        (it rolls over every 2**32 ticks), the ratio of the host clock to
+        the device clock is fitted over the last window points (the
+        nominal rate is used until they span minSpan seconds), and the
+        offset is taken from the point with the shortest read, which
+        bounds it the most tightly.
+    Arguments:
+        rate: nominal CORE_TIMER frequency in Hz (40MHz on the T7).
+        window: number of points kept.
+        minSpan: seconds the points must span before the rate is fitted.
+    Attributes:
+        uncertainty: half the duration of the read the offset is taken
+            from, in seconds (None before the first point).
+"""
+class ClockModel(object):
+    wrap = 2 ** 32
+
+    def __init__(self, rate=40e6, window=64, minSpan=1.0):
+        self.rate = float(rate)
+        self.window = window
+        self.minSpan = minSpan
+        self.points = collections.deque(maxlen=window)
+        self.last = None
+        self.period = 1.0 / self.rate
+        self.offset = None
+        self.uncertainty = None
+
+    # Private helper methods
+
+    def __unwrap(self, ticks):
+        if self.last is None:
+            return ticks
+        delta = (ticks - self.last) % ClockModel.wrap
+        if delta >= ClockModel.wrap // 2:
+            delta -= ClockModel.wrap
+        return self.last + delta
+
+    def __fit(self):
+        points = self.points
+        first, last = points[0], points[-1]
+        if (last[1] + last[2]) / 2.0 - (first[1] + first[2]) / 2.0 >= \
+                self.minSpan:
+            n = float(len(points))
+            meanTicks = sum(point[0] for point in points) / n
+            meanTime = sum((point[1] + point[2]) / 2.0
+                           for point in points) / n
+            covariance = sum((point[0] - meanTicks) *
+                             ((point[1] + point[2]) / 2.0 - meanTime)
+                             for point in points)
+            variance = sum((point[0] - meanTicks) ** 2 for point in points)
+            if variance > 0:
+                self.period = covariance / variance
+
+        best = min(points, key=lambda point: point[2] - point[1])
+        self.offset = (best[1] + best[2]) / 2.0 - best[0] * self.period
+        self.uncertainty = (best[2] - best[1]) / 2.0
+
+    """
+    Method: update(ticks, start, end)
+        Description:
+            Adds a CORE_TIMER value read between the sbio.monotonic()
+            times start and end, and refits the model.
+        Returns:
+            sample: sbio.monotonic() time of ticks under the new model.
+    """
+    def update(self, ticks, start, end):
+        ticks = self.__unwrap(int(ticks))
+        self.last = ticks
+        self.points.append((ticks, start, end))
+        self.__fit()
+        return self.offset + ticks * self.period
+
+    """
+    Method: toHost(ticks)
+        Description:
+            sbio.monotonic() time of a CORE_TIMER value (unwrapped next to
+            the last value given to update).
+    """
+    def toHost(self, ticks):
+        return self.offset + self.__unwrap(int(ticks)) * self.period
+
+    """
+    Method: toDevice(monotonic)
+        Description:
+            CORE_TIMER value (wrapped to 32 bits) at an sbio.monotonic()
+            time.
+    """
+    def toDevice(self, monotonic):
+        ticks = int(round((monotonic - self.offset) / self.period))
+        return ticks % ClockModel.wrap
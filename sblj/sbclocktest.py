@@ -0,0 +1,112 @@
+"""
+    STARBURST Read Timing and Device Clock Model Test Suite
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import unittest
+import sblj
+import sbclock
+import sbio
+import sbsim
+
+"""
+TestClockModel Test Group Description:
+    This group of tests makes sure that batched reads are stamped with
+    their monotonic start, end and sample times, and that the model of
+    the device clock follows CORE_TIMER through roll overs.
+
+    Test Count: 3
+"""
+class TestClockModel(unittest.TestCase):
+
+    def setUp(self):
+        sbsim.backend.reset()
+        sbsim.backend.latency = sbsim.LatencyModel(0.002, jitter=0.001,
+                                                   seed=1)
+        self.lj = sblj.AntennaLJ("AntennaA", "ETHERNET", "SIM")
+
+    def tearDown(self):
+        self.lj.disconnect()
+        sbsim.backend.latency = sbsim.LatencyModel()
+
+    """
+    Test - test_readTiming:
+        Given a read of the antenna parameters,
+        Then its start and end enclose the read, TIMESTAMP is the wall
+            clock time of the middle of it, and no CORE_TIMER is read.
+    """
+    def test_readTiming(self):
+        before = sbio.monotonic()
+        dump = self.lj.getParams()
+        after = sbio.monotonic()
+
+        read = self.lj.lastRead
+        self.assertTrue(before <= read.start < read.end <= after)
+        self.assertEqual(read.sample, (read.start + read.end) / 2.0)
+        self.assertEqual(dump["TIMESTAMP"], read.timestamp)
+        self.assertTrue(abs(read.timestamp -
+                            sbclock.wallTime(read.sample)) < 0.001)
+        self.assertEqual(read.ticks, None)
+
+    """
+    Test - test_coreTimer:
+        Given CORE_TIMER read along with 20 reads with jittery latency,
+        Then the reads stay one LJM call each, and the model maps the
+            ticks to the time they were sampled within its uncertainty,
+            which is at most half the shortest read.
+    """
+    def test_coreTimer(self):
+        device = sbsim.backend.devices["AntennaA"]
+        clock = self.lj.setCoreTimer()
+        with sbio.measureIO({"A": self.lj}) as cost:
+            for i in range(20):
+                self.lj.getParams(["VQPOW"])
+        self.assertEqual(cost["A"].calls, 20)
+
+        read = self.lj.lastRead
+        self.assertTrue(read.ticks is not None)
+        self.assertTrue(read.start <= read.sample <= read.end + 0.001)
+        truth = device.boot + read.ticks / 40e6
+        self.assertTrue(abs(clock.toHost(read.ticks) - truth) <=
+                        clock.uncertainty + 0.0001)
+        self.assertTrue(clock.uncertainty <= (read.end - read.start) / 2.0)
+        self.assertEqual(clock.toDevice(clock.toHost(read.ticks)),
+                         read.ticks)
+
+        self.assertEqual(self.lj.setCoreTimer(False), None)
+        self.lj.getParams(["VQPOW"])
+        self.assertEqual(self.lj.lastRead.ticks, None)
+
+    """
+    Test - test_rollOver:
+        Given a 1MHz timer read every 0.5s by exact reads across the 32
+            bit roll over, on a clock running 100ppm fast,
+        Then the ticks are unwrapped, the fitted period follows the
+            drift, and times map back to the wrapped ticks.
+    """
+    def test_rollOver(self):
+        clock = sbclock.ClockModel(1e6, minSpan=1.0)
+        start = 2 ** 32 - 1200000
+        for i in range(6):
+            ticks = (start + int(i * 0.5e6 * 1.0001)) % 2 ** 32
+            clock.update(ticks, 100 + i * 0.5, 100 + i * 0.5)
+
+        self.assertTrue(abs(clock.period * 1e6 - 1 / 1.0001) < 1e-7)
+        self.assertTrue(abs(clock.toHost(ticks) - 102.5) < 1e-6)
+        self.assertTrue(abs(clock.toHost(100) -
+                            (102.5 + (2 ** 32 - start + 100 -
+                                      2.5e6 * 1.0001) * clock.period))
+                        < 1e-5)
+        self.assertEqual(clock.toDevice(101.0),
+                         (start + int(0.5e6 * 1.0001) * 2) % 2 ** 32)
+
+
+# Main Method
+if __name__ == '__main__':
+    testGroups = [TestClockModel]
+    for tG in testGroups:
+        print "\nTesting: " + str(tG.__name__)
+        suite = unittest.TestLoader().loadTestsFromTestCase(
+            tG)
+        unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,271 @@
+"""
+    STARBURST LJM Latency Histograms
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import sbio
+import array
+import json
+import signal
+import threading
+
+"""
+Class: LatencyHistogram extends object
+    Description:
+        Fixed memory log-linear (HDR style) histogram of latencies in
+        microseconds. Values below 2**subBits microseconds get a bucket
+        each, larger values are kept with subBits significant bits (under
+        1.6% relative error for the default of 7). Values above
+        2**maxBits microseconds (about 67s by default) are clamped into
+        the last bucket.
+    Arguments:
+        subBits: significant bits kept for each value.
+        maxBits: bits of the largest value that is resolved.
+"""
+class LatencyHistogram(object):
+    def __init__(self, subBits=7, maxBits=26):
+        self.subBits = subBits
+        self.subCount = 1 << subBits
+        self.halfCount = self.subCount // 2
+        self.maxValue = (1 << maxBits) - 1
+        self.counts = array.array("L", [0]) * (
+            self.subCount + (maxBits - subBits) * self.halfCount)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def __index(self, value):
+        if value < self.subCount:
+            return value
+        shift = value.bit_length() - self.subBits
+        return (self.subCount + (shift - 1) * self.halfCount +
+                (value >> shift) - self.halfCount)
+
+    def __lowest(self, index):
+        if index < self.subCount:
+            return index
+        shift = (index - self.subCount) // self.halfCount + 1
+        top = (index - self.subCount) % self.halfCount + self.halfCount
+        return top << shift
+
+    """
+    Method: record(seconds)
+        Description:
+            Adds a latency given in seconds.
+    """
+    def record(self, seconds):
+        value = min(max(int(seconds * 1e6 + 0.5), 0), self.maxValue)
+        self.counts[self.__index(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    """
+    Method: percentile(q)
+        Description:
+            Latency in seconds below which q percent of the recorded
+            latencies fall (the lower edge of the bucket holding it).
+    """
+    def percentile(self, q):
+        if self.count == 0:
+            return None
+        rank = max(int(round(q / 100.0 * self.count)), 1)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return max(self.__lowest(index), self.min) * 1e-6
+        return self.max * 1e-6
+
+    """
+    Method: summary()
+        Description:
+            Count, mean, minimum, maximum and the 50th, 90th, 99th and
+            99.9th percentiles in seconds.
+    """
+    def summary(self):
+        if self.count == 0:
+            return {"count": 0}
+        return {"count": self.count,
+                "mean": self.total * 1e-6 / self.count,
+                "min": self.min * 1e-6, "max": self.max * 1e-6,
+                "p50": self.percentile(50), "p90": self.percentile(90),
+                "p99": self.percentile(99), "p999": self.percentile(99.9)}
+
+"""
+Class: LatencyRecorder extends object
+    Description:
+        Latency histograms of one device: for all of its LJM calls
+        ("total"), per LJM call type ("ops") and per register
+        ("registers"). A batched call is recorded under every register it
+        touches.
+    Arguments:
+        device: identifier of the device.
+"""
+class LatencyRecorder(object):
+    def __init__(self, device):
+        self.device = device
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.total = LatencyHistogram()
+            self.ops = {}
+            self.registers = {}
+
+    def record(self, op, registers, seconds):
+        with self.lock:
+            self.total.record(seconds)
+            histogram = self.ops.get(op)
+            if histogram is None:
+                histogram = self.ops[op] = LatencyHistogram()
+            histogram.record(seconds)
+            for register in registers:
+                histogram = self.registers.get(register)
+                if histogram is None:
+                    histogram = self.registers[register] = \
+                        LatencyHistogram()
+                histogram.record(seconds)
+
+    def summary(self):
+        with self.lock:
+            return {"total": self.total.summary(),
+                    "ops": dict((op, histogram.summary()) for op, histogram
+                                in self.ops.items()),
+                    "registers": dict((register, histogram.summary())
+                                      for register, histogram
+                                      in self.registers.items())}
+
+# Recorders of every device timed in this process, keyed by identifier.
+
+recorders = {}
+recordersLock = threading.Lock()
+
+"""
+Method: recorderFor(device)
+    Description:
+        Returns the LatencyRecorder of a device, creating it on first use.
+        Devices opened more than once with the same identifier share a
+        recorder.
+"""
+def recorderFor(device):
+    with recordersLock:
+        recorder = recorders.get(device)
+        if recorder is None:
+            recorder = recorders[device] = LatencyRecorder(device)
+        return recorder
+
+"""
+Class: TimingLJM extends sbio.LJMProxy
+    Description:
+        Layer installed on every StarburstLJ that times each LJM call on
+        the monotonic clock and records it in the LatencyRecorder of the
+        device. Costs two clock reads and a few dictionary lookups per
+        call, so it is left on in production.
+    Arguments:
+        device: identifier of the device.
+"""
+class TimingLJM(sbio.LJMProxy):
+    def __init__(self, device, backend=None):
+        super(TimingLJM, self).__init__(backend)
+        self.recorder = recorderFor(device)
+
+    def invoke(self, op, func, args):
+        start = sbio.monotonic()
+        try:
+            return func(*args)
+        finally:
+            self.recorder.record(op, sbio.callFrames(op, args),
+                                 sbio.monotonic() - start)
+
+"""
+Method: snapshot()
+    Description:
+        Summaries of all histograms keyed by device. Safe to call while
+        devices are in use.
+"""
+def snapshot():
+    with recordersLock:
+        devices = list(recorders.items())
+    return dict((device, recorder.summary()) for device, recorder
+                in devices)
+
+"""
+Method: report(device, minCount)
+    Description:
+        Text table of the per register and per call latencies of every
+        device (or only of device), slowest 99th percentile first.
+"""
+def report(device=None, minCount=1):
+    lines = ["%-12s %-22s %8s %9s %9s %9s %9s" % ("device", "register/op",
+                                                  "count", "p50 ms",
+                                                  "p99 ms", "max ms",
+                                                  "mean ms")]
+    rows = []
+    for name, summary in snapshot().items():
+        if device is not None and name != device:
+            continue
+        entries = [("*" + op, value) for op, value in summary["ops"].items()]
+        entries += list(summary["registers"].items())
+        for key, value in entries:
+            if value["count"] >= minCount:
+                rows.append((value["p99"], name, key, value))
+    for p99, name, key, value in sorted(rows, reverse=True):
+        lines.append("%-12s %-22s %8d %9.3f %9.3f %9.3f %9.3f" % (
+            name, key, value["count"], value["p50"] * 1e3, p99 * 1e3,
+            value["max"] * 1e3, value["mean"] * 1e3))
+    return "\n".join(lines)
+
+"""
+Method: dump(path)
+    Description:
+        Writes snapshot() as JSON to path.
+"""
+def dump(path):
+    summary = snapshot()
+    with open(path, "w") as file:
+        json.dump(summary, file, indent=2, sort_keys=True)
+
+"""
+Method: dumpOnSignal(path, signum)
+    Description:
+        Dumps the histograms to path whenever the process receives signum
+        (SIGUSR1 by default), so that a running control process can be
+        inspected with "kill -USR1 <pid>". Must be called from the main
+        thread. The handler only wakes a background thread that writes
+        the dump, since the signal may arrive while the main thread holds
+        the lock of a recorder.
+"""
+def dumpOnSignal(path, signum=signal.SIGUSR1):
+    requested = threading.Event()
+
+    def dumper():
+        while True:
+            requested.wait()
+            requested.clear()
+            try:
+                dump(path)
+            except Exception:
+                pass
+
+    thread = threading.Thread(target=dumper, name="sbhist-dump")
+    thread.daemon = True
+    thread.start()
+    signal.signal(signum, lambda received, frame: requested.set())
+
+"""
+Method: reset()
+    Description:
+        Clears the histograms of every device.
+"""
+def reset():
+    with recordersLock:
+        devices = list(recorders.values())
+    for recorder in devices:
+        recorder.reset()
@@ -0,0 +1,336 @@
+"""
+    STARBURST Monitor Historian
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import os
+import json
+import numbers
+import threading
+import numpy as np
+
+"""
+Class: DeviceHistory extends object
+    Description:
+        Columnar history of the monitor data of one device. Rows are
+        stored in chunks of chunkRows rows, each chunk a directory with
+        one memory mapped .npy file (float64, preallocated) per column.
+        TIME holds the wall clock time of every row and the other columns
+        the numeric parameters of the device (NaN where a row lacks a
+        parameter). A parameter first seen after the first row gets a
+        column from the chunk being filled on (NaN for the rows before
+        it). The time index (index.json) keeps the first and last time,
+        the number of rows and the number of columns of every chunk, so
+        that range queries only map the chunks they need and find the
+        rows by binary search, without parsing anything.
+    Arguments:
+        path: directory of the device.
+        chunkRows: rows per chunk (taken from the index when it exists).
+"""
+class DeviceHistory(object):
+    def __init__(self, path, chunkRows=65536):
+        self.path = path
+        self.chunkRows = chunkRows
+        self.columns = None
+        self.chunks = []
+        self.writing = None
+        if os.path.exists(self.__indexPath()):
+            with open(self.__indexPath(), "r") as file:
+                index = json.load(file)
+            self.columns = index["columns"]
+            self.chunkRows = index["chunkRows"]
+            self.chunks = index["chunks"]
+            for chunk in self.chunks:
+                if len(chunk) == 3:
+                    chunk.append(len(self.columns))
+
+    # Private helper methods
+
+    def __indexPath(self):
+        return os.path.join(self.path, "index.json")
+
+    def __chunkPath(self, chunk, column):
+        return os.path.join(self.path, "%06d" % chunk, column + ".npy")
+
+    def __saveIndex(self):
+        scratch = self.__indexPath() + ".tmp"
+        with open(scratch, "w") as file:
+            json.dump({"columns": self.columns, "chunkRows": self.chunkRows,
+                       "chunks": self.chunks}, file)
+        if os.name == "nt" and os.path.exists(self.__indexPath()):
+            os.remove(self.__indexPath())
+        os.rename(scratch, self.__indexPath())
+
+    def __open(self, chunk, mode, columns=None):
+        stored = ["TIME"] + self.columns[:self.chunks[chunk][3]]
+        if columns is None:
+            columns = stored
+        arrays = {}
+        for column in columns:
+            if column in stored:
+                arrays[column] = np.load(self.__chunkPath(chunk, column),
+                                         mmap_mode=mode)
+            else:
+                # Column added after the chunk was filled.
+                arrays[column] = np.full(self.chunkRows, np.nan)
+        return arrays
+
+    def __create(self, chunk, columns):
+        arrays = {}
+        for column in columns:
+            arrays[column] = np.lib.format.open_memmap(
+                self.__chunkPath(chunk, column), mode="w+",
+                dtype=np.float64, shape=(self.chunkRows,))
+            arrays[column][:] = np.nan
+        return arrays
+
+    def __last(self):
+        if self.writing is None:
+            self.writing = self.__open(len(self.chunks) - 1, "r+")
+        return self.writing
+
+    def __writable(self):
+        if self.chunks and self.chunks[-1][2] < self.chunkRows:
+            return self.__last()
+        self.flush()
+        chunk = len(self.chunks)
+        os.makedirs(os.path.dirname(self.__chunkPath(chunk, "TIME")))
+        self.writing = self.__create(chunk, ["TIME"] + self.columns)
+        self.chunks.append([None, None, 0, len(self.columns)])
+        return self.writing
+
+    def __added(self, values):
+        added = sorted(name for name, value in values.items()
+                       if name != "TIMESTAMP" and
+                       isinstance(value, numbers.Number) and
+                       name not in (self.columns or []))
+        if self.columns is None:
+            self.columns = added
+            return []
+        return added
+
+    def __store(self, arrays, added, row, values):
+        # Columns first seen in values are added to the last chunk.
+        if added:
+            self.columns.extend(added)
+            arrays.update(self.__create(len(self.chunks) - 1, added))
+            self.chunks[-1][3] = len(self.columns)
+        for column in self.columns:
+            value = values.get(column)
+            arrays[column][row] = (value if isinstance(value, numbers.Number)
+                                   else np.nan)
+
+    """
+    Method: append(values, timestamp)
+        Description:
+            Appends one row of monitor data.
+        Arguments:
+            values: dictionary of the parameters of the device (as in the
+                data returned by getMonitorData). Parameters that are not
+                numbers (e.g. NAME) are not stored.
+            timestamp: wall clock time of the row (TIMESTAMP of values
+                when omitted).
+        Raises:
+            ValueError: occurs when the row is older than the last one.
+    """
+    def append(self, values, timestamp=None):
+        if timestamp is None:
+            timestamp = values["TIMESTAMP"]
+        if self.chunks and self.chunks[-1][1] is not None and \
+                timestamp < self.chunks[-1][1]:
+            raise ValueError("Rows must be appended in time order.")
+        added = self.__added(values)
+
+        arrays = self.__writable()
+        chunk = self.chunks[-1]
+        row = chunk[2]
+        arrays["TIME"][row] = timestamp
+        self.__store(arrays, added, row, values)
+        if chunk[0] is None:
+            chunk[0] = timestamp
+        chunk[1] = timestamp
+        chunk[2] = row + 1
+        self.__saveIndex()
+
+    """
+    Method: replaceLast(values)
+        Description:
+            Overwrites the parameters of the last row, keeping its time
+            (e.g. for a row aggregating samples as they arrive).
+        Raises:
+            IndexError: occurs when there are no rows.
+    """
+    def replaceLast(self, values):
+        if not self.rows():
+            raise IndexError("There is no row to replace.")
+        added = self.__added(values)
+        self.__store(self.__last(), added, self.chunks[-1][2] - 1, values)
+        if added:
+            self.__saveIndex()
+
+    """
+    Method: last()
+        Description:
+            Dictionary of the columns of the last row (with TIME), or
+            None when there are no rows.
+    """
+    def last(self):
+        if not self.rows():
+            return None
+        arrays = self.__last()
+        row = self.chunks[-1][2] - 1
+        return dict((column, float(array[row]))
+                    for column, array in arrays.items())
+
+    """
+    Method: query(start, end, columns)
+        Description:
+            Rows with start <= TIME <= end.
+        Arguments:
+            start, end: wall clock times (None for no bound).
+            columns: list of columns returned (all when omitted).
+        Returns:
+            data: dictionary of NumPy arrays keyed by column, with TIME.
+        Raises:
+            KeyError: occurs when a column does not exist.
+    """
+    def query(self, start=None, end=None, columns=None):
+        if columns is None:
+            columns = self.columns or []
+        columns = ["TIME"] + [column for column in columns
+                              if column != "TIME"]
+        for column in columns:
+            if column != "TIME" and column not in (self.columns or []):
+                raise KeyError(column)
+
+        parts = dict((column, []) for column in columns)
+        for chunk, (first, last, rows, count) in enumerate(self.chunks):
+            if not rows or (start is not None and last < start) or \
+                    (end is not None and first > end):
+                continue
+            if chunk == len(self.chunks) - 1 and self.writing is not None:
+                arrays = self.writing
+            else:
+                arrays = self.__open(chunk, "r", columns)
+            times = arrays["TIME"][:rows]
+            low = 0 if start is None else np.searchsorted(times, start,
+                                                          "left")
+            high = rows if end is None else np.searchsorted(times, end,
+                                                            "right")
+            for column in columns:
+                parts[column].append(np.array(arrays[column][low:high]))
+
+        return dict((column, np.concatenate(arrays) if arrays
+                     else np.empty(0))
+                    for column, arrays in parts.items())
+
+    def rows(self):
+        return sum(chunk[2] for chunk in self.chunks)
+
+    """
+    Method: flush()
+        Description:
+            Writes the rows of the chunk being filled to disk.
+    """
+    def flush(self):
+        if self.writing is not None:
+            for array in self.writing.values():
+                array.flush()
+
+    def close(self):
+        self.flush()
+        self.writing = None
+
+"""
+Class: Historian extends object
+    Description:
+        Columnar on-disk history of monitor snapshots, with one
+        DeviceHistory per device (LONOISE, A, B, ...) in a directory of
+        its own under root. Reopening a historian continues its files.
+        Safe to use from several threads (appends are made one at a
+        time).
+    Arguments:
+        root: directory of the historian (created when missing).
+        chunkRows: rows per chunk file of new devices.
+"""
+class Historian(object):
+    def __init__(self, root, chunkRows=65536):
+        self.root = os.path.abspath(root)
+        self.chunkRows = chunkRows
+        self.devices = {}
+        self.lock = threading.RLock()
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root)
+        for name in os.listdir(self.root):
+            if os.path.isdir(os.path.join(self.root, name)):
+                self.device(name)
+
+    """
+    Method: device(key)
+        Description:
+            DeviceHistory of a device, created when missing.
+    """
+    def device(self, key):
+        key = str(key)
+        with self.lock:
+            history = self.devices.get(key)
+            if history is None:
+                history = DeviceHistory(os.path.join(self.root, key),
+                                        self.chunkRows)
+                self.devices[key] = history
+            return history
+
+    """
+    Method: append(data, timestamp)
+        Description:
+            Appends a snapshot, one row per device. Devices flagged STALE
+            (values repeated by a device timeout, refer to
+            OVROStarburst.setDeviceTimeout) are left out, as they were
+            already appended when they were read.
+        Arguments:
+            data: dictionary of dictionaries of monitor data keyed by
+                device (as returned by getMonitorData).
+            timestamp: wall clock time used for devices without a
+                TIMESTAMP.
+    """
+    def append(self, data, timestamp=None):
+        with self.lock:
+            for key, values in data.items():
+                if not values.get("STALE"):
+                    self.appendDevice(key, values, values.get("TIMESTAMP",
+                                                              timestamp))
+
+    """
+    Method: appendDevice(key, values, timestamp)
+        Description:
+            Appends one row of monitor data of a device. (Refer to
+            DeviceHistory.append.)
+    """
+    def appendDevice(self, key, values, timestamp):
+        with self.lock:
+            self.device(key).append(values, timestamp)
+
+    """
+    Method: query(key, start, end, columns)
+        Description:
+            Rows of a device between the wall clock times start and end.
+            (Refer to DeviceHistory.query.)
+        Raises:
+            KeyError: occurs when the device or a column does not exist.
+    """
+    def query(self, key, start=None, end=None, columns=None):
+        with self.lock:
+            if str(key) not in self.devices:
+                raise KeyError(key)
+            return self.devices[str(key)].query(start, end, columns)
+
+    def flush(self):
+        with self.lock:
+            for history in self.devices.values():
+                history.flush()
+
+    def close(self):
+        with self.lock:
+            for history in self.devices.values():
+                history.close()
@@ -0,0 +1,193 @@
+"""
+    STARBURST Monitor Historian Test Suite
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+import numpy as np
+import sbovro
+import sbsim
+import sbhistorian
+
+"""
+TestHistorian Test Group Description:
+    This group of tests makes sure that snapshots are stored in chunked
+    columnar files, that range queries return the right rows across
+    chunks, and that reopened historians continue their files.
+
+    Test Count: 5
+"""
+class TestHistorian(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def snapshot(self, i):
+        return {"A": {"TIMESTAMP": 1000.0 + i, "VQPOW": -float(i),
+                      "NAME": "AntennaA", "STALE": False},
+                "LONOISE": {"TIMESTAMP": 1000.5 + i, "LOFREQ": i % 4}}
+
+    """
+    Test - test_rangeQuery:
+        Given 25 snapshots in chunks of 10 rows, reopened after 12,
+        Then numeric parameters get a column each, a range query spanning
+            three chunks returns exactly the rows in range, and rows out
+            of time order are refused.
+    """
+    def test_rangeQuery(self):
+        historian = sbhistorian.Historian(self.root, chunkRows=10)
+        for i in range(12):
+            historian.append(self.snapshot(i))
+        historian.close()
+
+        historian = sbhistorian.Historian(self.root, chunkRows=50)
+        for i in range(12, 25):
+            historian.append(self.snapshot(i))
+        history = historian.device("A")
+        self.assertEqual(history.columns, ["STALE", "VQPOW"])
+        self.assertEqual(history.rows(), 25)
+        self.assertEqual(len(history.chunks), 3)
+        self.assertTrue(os.path.exists(os.path.join(
+            self.root, "A", "000002", "VQPOW.npy")))
+
+        data = historian.query("A", 1005, 1021.5, ["VQPOW"])
+        self.assertEqual(sorted(data.keys()), ["TIME", "VQPOW"])
+        self.assertTrue(np.array_equal(data["TIME"],
+                                       1000.0 + np.arange(5, 22)))
+        self.assertTrue(np.array_equal(data["VQPOW"], -np.arange(5, 22.0)))
+        data = historian.query("LONOISE", 1023)
+        self.assertEqual(list(data["LOFREQ"]), [3, 0])
+        self.assertEqual(len(historian.query("A", 2000)["TIME"]), 0)
+
+        self.assertRaises(KeyError, historian.query, "A", columns=["NAME"])
+        self.assertRaises(KeyError, historian.query, "C")
+        self.assertRaises(ValueError, historian.append, self.snapshot(3))
+
+    """
+    Test - test_columnsAdded:
+        Given a device first appended without any numeric values, then
+            with them, across chunks and a reopen,
+        Then the parameters get columns from then on, with NaN for the
+            rows before.
+    """
+    def test_columnsAdded(self):
+        historian = sbhistorian.Historian(self.root, chunkRows=4)
+        historian.append({"A": {"NAME": "AntennaA"}}, 1000.0)
+        for i in range(1, 6):
+            historian.append(self.snapshot(i))
+        historian.close()
+
+        historian = sbhistorian.Historian(self.root)
+        historian.append({"A": {"TIMESTAMP": 1006.0, "VQPOW": -6.0,
+                                "LJTEMP": 300.0}})
+        history = historian.device("A")
+        self.assertEqual(history.columns, ["STALE", "VQPOW", "LJTEMP"])
+        data = historian.query("A")
+        self.assertTrue(np.array_equal(data["TIME"], 1000.0 + np.arange(7)))
+        self.assertTrue(np.isnan(data["VQPOW"][0]))
+        self.assertTrue(np.array_equal(data["VQPOW"][1:], -np.arange(1, 7.0)))
+        self.assertTrue(np.isnan(data["LJTEMP"][:6]).all())
+        self.assertEqual(data["LJTEMP"][6], 300.0)
+        self.assertEqual(len(historian.query("A", 1001, 1003,
+                                             ["LJTEMP"])["LJTEMP"]), 3)
+        historian.close()
+
+    """
+    Test - test_staleRowsSkipped:
+        Given a device that misses the deadline of its first sweep, and
+            then of a later one (repeating its last values),
+        Then only the rows read in time are appended.
+    """
+    def test_staleRowsSkipped(self):
+        historian = sbhistorian.Historian(self.root)
+        historian.append({"A": {"STALE": True, "AGE": None}}, 999.0)
+        historian.append(self.snapshot(0))
+        stale = self.snapshot(0)
+        stale["A"]["STALE"] = True
+        historian.append(stale, 1001.0)
+        historian.append(self.snapshot(2))
+
+        self.assertTrue(np.array_equal(historian.query("A")["TIME"],
+                                       [1000.0, 1002.0]))
+        self.assertEqual(historian.device("LONOISE").rows(), 3)
+        historian.close()
+
+    """
+    Test - test_monitorSweeps:
+        Given a historian set on a simulated system,
+        Then every full sweep adds a row per device and subsets do not.
+    """
+    def test_monitorSweeps(self):
+        sbsim.backend.reset()
+        ovroObj = sbovro.OVROStarburst("LONoise", "AntennaA", "AntennaB",
+                                       "ETHERNET", "SIM")
+        try:
+            historian = sbhistorian.Historian(self.root)
+            ovroObj.setHistorian(historian)
+            for i in range(3):
+                ovroObj.getMonitorData()
+            ovroObj.getMonitorData(fields={"A": ["VQPOW"]})
+
+            data = historian.query("B")
+            self.assertEqual(len(data["TIME"]), 3)
+            self.assertTrue((np.diff(data["TIME"]) > 0).all())
+            self.assertTrue("POW_24V" in data and "VQPOW" in data)
+            self.assertEqual(historian.device("LONOISE").rows(), 3)
+        finally:
+            ovroObj.endConnection()
+
+    """
+    Test - test_concurrentSweeps:
+        Given four threads sweeping a simulated system with a historian
+            set,
+        Then no sweep fails, and the rows recorded for every device are
+            in time order.
+    """
+    def test_concurrentSweeps(self):
+        sbsim.backend.reset()
+        ovroObj = sbovro.OVROStarburst("LONoise", "AntennaA", "AntennaB",
+                                       "ETHERNET", "SIM")
+        errors = []
+
+        def sweep():
+            try:
+                for i in range(50):
+                    ovroObj.getMonitorData()
+            except Exception as e:
+                errors.append(e)
+
+        try:
+            historian = sbhistorian.Historian(self.root, chunkRows=16)
+            ovroObj.setHistorian(historian)
+            threads = [threading.Thread(target=sweep) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(errors, [])
+            rows = historian.device("A").rows()
+            self.assertTrue(0 < rows <= 200)
+            for key in ["LONOISE", "A", "B"]:
+                times = historian.query(key)["TIME"]
+                self.assertTrue((np.diff(times) >= 0).all())
+        finally:
+            ovroObj.endConnection()
+
+
+# Main Method
+if __name__ == '__main__':
+    testGroups = [TestHistorian]
+    for tG in testGroups:
+        print "\nTesting: " + str(tG.__name__)
+        suite = unittest.TestLoader().loadTestsFromTestCase(
+            tG)
+        unittest.TextTestRunner(verbosity=2).run(suite)
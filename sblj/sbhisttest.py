@@ -0,0 +1,155 @@
+"""
+    STARBURST LJM Latency Histograms Test Suite
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import unittest
+import json
+import os
+import shutil
+import signal
+import tempfile
+import time
+import sblj
+import sbhist
+import sbsim
+
+"""
+TestLatencyHistogram Test Group Description:
+    This group of tests makes sure that the fixed memory histograms keep
+    percentiles within their resolution.
+
+    Test Count: 2
+"""
+class TestLatencyHistogram(unittest.TestCase):
+
+    """
+    Test - test_percentilesWithinResolution:
+        Given latencies spread evenly from 1us to 100ms,
+        Then every reported percentile is within 1.6% of the exact one.
+    """
+    def test_percentilesWithinResolution(self):
+        histogram = sbhist.LatencyHistogram()
+        values = [i * 1e-6 for i in range(1, 100001)]
+        for value in values:
+            histogram.record(value)
+
+        for q in [1, 50, 90, 99, 99.9]:
+            exact = values[int(q / 100.0 * len(values)) - 1]
+            self.assertTrue(abs(histogram.percentile(q) - exact) <=
+                            0.016 * exact + 1e-6)
+        self.assertEqual(histogram.summary()["count"], 100000)
+        self.assertAlmostEqual(histogram.summary()["max"], 0.1)
+
+    """
+    Test - test_fixedMemory:
+        Given latencies far above the resolved range,
+        Then they are clamped into the last bucket and the histogram
+            does not grow.
+    """
+    def test_fixedMemory(self):
+        histogram = sbhist.LatencyHistogram()
+        size = len(histogram.counts)
+        histogram.record(1e6)
+        histogram.record(-1)
+
+        self.assertEqual(len(histogram.counts), size)
+        self.assertEqual(histogram.counts[-1], 1)
+        self.assertEqual(histogram.counts[0], 1)
+
+"""
+TestDeviceLatencies Test Group Description:
+    This group of tests makes sure that every StarburstLJ records its LJM
+    call latencies per device, per call type and per register.
+
+    Test Count: 3
+"""
+class TestDeviceLatencies(unittest.TestCase):
+
+    def setUp(self):
+        sbsim.backend.reset()
+        sbsim.backend.latency = sbsim.LatencyModel()
+        sbhist.reset()
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    """
+    Test - test_slowDeviceAndRegister:
+        Given a device with 5ms of latency per call,
+        Then its histograms show the latency for the registers read and
+            the other device stays fast.
+    """
+    def test_slowDeviceAndRegister(self):
+        sbsim.backend.addDevice("Slow", latency=sbsim.LatencyModel(0.005))
+        slow = sblj.StarburstLJ("Slow", "ETHERNET", "SIM")
+        fast = sblj.StarburstLJ("Fast", "ETHERNET", "SIM")
+        for lj in [slow, fast]:
+            lj.getParams(["LJTEMP", "POW_24V"])
+        slow.ljm.eReadNames(slow.handle, 2, ["AIN4", "AIN5"])
+
+        summary = sbhist.snapshot()
+        self.assertEqual(summary["Slow"]["registers"]["AIN4"]["count"], 2)
+        self.assertEqual(summary["Slow"]["ops"]["eReadNames"]["count"], 2)
+        self.assertTrue(summary["Slow"]["registers"]["AIN5"]["p50"] >=
+                        0.0049)
+        self.assertTrue(summary["Fast"]["total"]["max"] < 0.005)
+        self.assertTrue("AIN4" in sbhist.report("Slow"))
+
+    """
+    Test - test_dump:
+        Given recorded latencies,
+        Then dump writes them as JSON keyed by device.
+    """
+    def test_dump(self):
+        lj = sblj.StarburstLJ("Generic", "ETHERNET", "SIM")
+        lj.getParams(["LJTEMP"])
+        path = os.path.join(self.dir, "latency.json")
+        sbhist.dump(path)
+
+        with open(path, "r") as file:
+            summary = json.load(file)
+        self.assertEqual(summary["Generic"]["registers"]
+                         ["TEMPERATURE_DEVICE_K"]["count"], 1)
+
+    """
+    Test - test_dumpOnSignal:
+        Given the signal arriving while the main thread holds the lock of
+            a recorder,
+        Then the handler returns at once and the dump is written once
+            the lock is released.
+    """
+    def test_dumpOnSignal(self):
+        lj = sblj.StarburstLJ("Generic", "ETHERNET", "SIM")
+        lj.getParams(["LJTEMP"])
+        path = os.path.join(self.dir, "latency.json")
+        previous = signal.getsignal(signal.SIGUSR1)
+        sbhist.dumpOnSignal(path)
+        try:
+            with sbhist.recorderFor("Generic").lock:
+                os.kill(os.getpid(), signal.SIGUSR1)
+                time.sleep(0.05)
+                self.assertFalse(os.path.exists(path))
+            summary = None
+            for i in range(200):
+                try:
+                    with open(path, "r") as file:
+                        summary = json.load(file)
+                    break
+                except (IOError, ValueError):
+                    time.sleep(0.01)
+        finally:
+            signal.signal(signal.SIGUSR1, previous)
+        self.assertTrue("Generic" in summary)
+
+
+# Main Method
+if __name__ == '__main__':
+    testGroups = [TestLatencyHistogram, TestDeviceLatencies]
+    for tG in testGroups:
+        print "\nTesting: " + str(tG.__name__)
+        suite = unittest.TestLoader().loadTestsFromTestCase(
+            tG)
+        unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,400 @@
+"""
+    STARBURST LabJack I/O Access Layer
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+from labjack import ljm
+import sbtime
+import copy
+import collections
+import contextlib
+import functools
+import threading
+
+"""
+Method: monotonic()
+    Description:
+        Monotonic clock in seconds used for all interval timing in the
+        Starburst libraries. (Refer to sbtime.py.)
+"""
+monotonic = sbtime.monotonic
+
+# Registered backends keyed by the deviceType or connectionType string
+# that selects them. Backends expose the same calls as the LJM library
+# (openS, close, eReadName, eWriteName, ...).
+
+backends = {}
+
+# Backends that are provided by a module of this package and registered
+# when that module is first imported.
+
+lazyBackends = {"SIM": "sbsim"}
+
+"""
+Method: registerBackend(name, backend)
+    Description:
+        Registers an LJM compatible backend so that StarburstLJ objects
+        created with name as their deviceType or connectionType use it
+        instead of the LJM library.
+    Arguments:
+        name: deviceType/connectionType string that selects the backend.
+        backend: object exposing the LJM calls used by sblj.
+"""
+def registerBackend(name, backend):
+    backends[name] = backend
+
+"""
+Method: getBackend(deviceType, connectionType)
+    Description:
+        Looks up the backend for a device description. The deviceType is
+        checked before the connectionType. Falls back to the LJM library.
+    Returns:
+        backend: the registered backend or the ljm module itself.
+"""
+def getBackend(deviceType, connectionType):
+    for key in (deviceType, connectionType):
+        if key not in backends and key in lazyBackends:
+            __import__(lazyBackends[key])
+        if key in backends:
+            return backends[key]
+    return ljm
+
+# Factories applied to every StarburstLJ when it is created. Each factory
+# takes the StarburstLJ object and returns an LJMProxy layer (or None).
+
+layerFactories = []
+
+"""
+Method: baseBackend(backend)
+    Description:
+        Follows a stack of LJMProxy layers down to the backend serving it.
+"""
+def baseBackend(backend):
+    while isinstance(backend, LJMProxy):
+        backend = backend.backend
+    return backend
+
+"""
+Class: LJMProxy extends object
+    Description:
+        Base class for layers stacked between a StarburstLJ object and its
+        backend. Every LJM call that reaches the device goes through
+        invoke(), which subclasses override to observe or replace the
+        call. Anything else is delegated to the wrapped backend.
+    Arguments:
+        backend: the wrapped backend (set by StarburstLJ.addLayer when
+            None).
+"""
+class LJMProxy(object):
+
+    ioCalls = ("openS", "close", "eReadName", "eReadNames",
+               "eReadNameString", "eWriteName", "eWriteNames",
+               "eWriteNameString", "eStreamStart", "eStreamRead",
+               "eStreamStop")
+
+    def __init__(self, backend=None):
+        self.backend = backend
+
+    def __getattr__(self, name):
+        if name == "backend":
+            raise AttributeError(name)
+        attr = getattr(self.backend, name)
+        if name in LJMProxy.ioCalls:
+            return lambda *args: self.invoke(name, attr, args)
+        return attr
+
+    """
+    Method: invoke(op, func, args)
+        Description:
+            Performs an LJM call through the layer.
+        Arguments:
+            op: name of the LJM call (e.g. "eReadName").
+            func: the call on the wrapped backend.
+            args: positional arguments of the call.
+    """
+    def invoke(self, op, func, args):
+        return func(*args)
+
+# Estimated Modbus TCP traffic of LJM calls: every call costs a request
+# and a response header, every register frame its address and count, and
+# every register its value (strings are read and written whole).
+
+CALL_BYTES = 24
+FRAME_BYTES = 4
+VALUE_BYTES = 4
+STRING_BYTES = 50
+
+stringOps = ("eReadNameString", "eWriteNameString")
+
+"""
+Method: callFrames(op, args)
+    Description:
+        Register names touched by an LJM call (empty for calls that do
+        not address registers by name).
+"""
+def callFrames(op, args):
+    if op in ("eReadNames", "eWriteNames"):
+        return args[2][:args[1]]
+    elif op in ("eReadName", "eWriteName", "eReadNameString",
+                "eWriteNameString"):
+        return [args[1]]
+    return []
+
+"""
+Method: callBytes(op, args, frames)
+    Description:
+        Estimated bytes on the wire for an LJM call.
+"""
+def callBytes(op, args, frames):
+    size = STRING_BYTES if op in stringOps else VALUE_BYTES
+    if op == "eStreamRead":
+        return CALL_BYTES
+    return CALL_BYTES + len(frames) * (FRAME_BYTES + size)
+
+"""
+Class: IOCost extends object
+    Description:
+        Accumulated I/O cost of a set of LJM calls: number of calls
+        ("calls", i.e. round trips), registers touched ("registers"),
+        estimated bytes on the wire ("bytes"), calls per LJM call type 
+        ("byOp") and how many times the operation ran ("invocations").
+"""
+class IOCost(object):
+    def __init__(self):
+        self.calls = 0
+        self.registers = 0
+        self.bytes = 0
+        self.invocations = 0
+        self.byOp = {}
+
+    def add(self, op, registers, size):
+        self.calls += 1
+        self.registers += registers
+        self.bytes += size
+        self.byOp[op] = self.byOp.get(op, 0) + 1
+
+    def copy(self):
+        cost = IOCost()
+        cost.merge(self)
+        cost.invocations = self.invocations
+        return cost
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.registers += other.registers
+        self.bytes += other.bytes
+        for op, count in other.byOp.items():
+            self.byOp[op] = self.byOp.get(op, 0) + count
+
+    def minus(self, other):
+        cost = IOCost()
+        cost.calls = self.calls - other.calls
+        cost.registers = self.registers - other.registers
+        cost.bytes = self.bytes - other.bytes
+        cost.invocations = self.invocations - other.invocations
+        for op, count in self.byOp.items():
+            if count != other.byOp.get(op, 0):
+                cost.byOp[op] = count - other.byOp.get(op, 0)
+        return cost
+
+    def toDict(self):
+        return {"calls": self.calls, "registers": self.registers,
+                "bytes": self.bytes, "invocations": self.invocations,
+                "byOp": dict(self.byOp)}
+
+    def __repr__(self):
+        return "IOCost(" + repr(self.toDict()) + ")"
+
+"""
+Class: IOCounter extends LJMProxy
+    Description:
+        Layer installed on every StarburstLJ (as lj.io) that accounts for
+        all LJM calls that reach the backend. Totals are kept in total
+        and, for calls made inside a public method marked with
+        operation(), per method name in operations.
+"""
+class IOCounter(LJMProxy):
+    def __init__(self, backend=None):
+        super(IOCounter, self).__init__(backend)
+        self.total = IOCost()
+        self.operations = {}
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def invoke(self, op, func, args):
+        frames = callFrames(op, args)
+        size = callBytes(op, args, frames)
+        current = getattr(self.local, "operation", None)
+        with self.lock:
+            self.total.add(op, len(frames), size)
+            if current is not None:
+                current.add(op, len(frames), size)
+        return func(*args)
+
+    """
+    Method: begin(name) / end()
+        Description:
+            Marks the start and end of a public operation. Nested 
+            operations are accounted to the outermost one.
+        Returns:
+            outermost: whether begin() started a new operation.
+    """
+    def begin(self, name):
+        if getattr(self.local, "operation", None) is not None:
+            return False
+        with self.lock:
+            cost = self.operations.setdefault(name, IOCost())
+            cost.invocations += 1
+        self.local.operation = cost
+        return True
+
+    def end(self):
+        self.local.operation = None
+
+    """
+    Method: reset()
+        Description:
+            Clears all accumulated costs.
+    """
+    def reset(self):
+        with self.lock:
+            self.total = IOCost()
+            self.operations = {}
+
+"""
+Method: operation(method)
+    Description:
+        Decorator for the public methods of StarburstLJ classes so that
+        the LJM calls they make are accounted per method in lj.io.
+"""
+def operation(method):
+    name = method.__name__
+
+    @functools.wraps(method)
+    def accounted(self, *args, **kwargs):
+        counter = getattr(self, "io", None)
+        if counter is None or not counter.begin(name):
+            return method(self, *args, **kwargs)
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            counter.end()
+    return accounted
+
+"""
+Method: measureIO(devices)
+    Description:
+        Context manager measuring the I/O cost of a block of code on a set
+        of StarburstLJ objects. Yields a dictionary that is filled with
+        the IOCost of each device (keyed like devices, or by identifier
+        when devices is a list) and the sum over all devices ("TOTAL")
+        when the block exits.
+"""
+@contextlib.contextmanager
+def measureIO(devices):
+    if not isinstance(devices, dict):
+        devices = dict((lj.identifier, lj) for lj in devices)
+    before = dict((key, lj.io.total.copy()) for key, lj in devices.items())
+    costs = {}
+    try:
+        yield costs
+    finally:
+        total = IOCost()
+        for key, lj in devices.items():
+            costs[key] = lj.io.total.minus(before[key])
+            total.merge(costs[key])
+        costs["TOTAL"] = total
+
+PlannedCall = collections.namedtuple("PlannedCall", ["device", "op",
+                                                     "names", "values"])
+
+"""
+Class: PlanningLJM extends LJMProxy
+    Description:
+        Layer that records the LJM calls of a device into a plan instead
+        of performing them. Reads return 0 (or "" for strings).
+    Arguments:
+        device: label of the device in the plan.
+        plan: shared list the PlannedCall entries are appended to.
+        lock: lock guarding the shared plan.
+"""
+class PlanningLJM(LJMProxy):
+    def __init__(self, device, plan, lock):
+        super(PlanningLJM, self).__init__()
+        self.device = device
+        self.plan = plan
+        self.lock = lock
+
+    def invoke(self, op, func, args):
+        names = list(callFrames(op, args))
+        values = []
+        if op == "eWriteName":
+            values = [args[2]]
+        elif op == "eWriteNames":
+            values = list(args[3][:args[1]])
+        elif op == "eWriteNameString":
+            values = [args[2]]
+        with self.lock:
+            self.plan.append(PlannedCall(self.device, op, names, values))
+
+        if op == "eReadNames":
+            return [0] * args[1]
+        elif op == "eReadNameString":
+            return ""
+        elif op in ("eReadName", "openS"):
+            return 0
+        return None
+
+"""
+Method: planPrograms(programs)
+    Description:
+        Plan of running RegisterPrograms (one eWriteNames call each, as
+        done by runProgram), built without touching any device. Programs
+        without registers are left out.
+    Arguments:
+        programs: dictionary (or list of pairs) of RegisterPrograms keyed
+            by the label of their device in the plan.
+    Returns:
+        plan: list of PlannedCall entries, in the order of programs.
+"""
+def planPrograms(programs):
+    if isinstance(programs, dict):
+        programs = programs.items()
+    return [PlannedCall(device, "eWriteNames", list(program.names),
+                        list(program.values))
+            for device, program in programs if program.names]
+
+"""
+Method: dryRun(devices)
+    Description:
+        Context manager that plans instead of performs the LJM calls made
+        on a set of StarburstLJ objects inside the block. Yields the list
+        of PlannedCall entries. Ghost copies of device state (listed in
+        the ghostState of each class) are restored on exit. The planning
+        layer is added to the device objects themselves, so every thread
+        using them is planned too (and state they change is restored):
+        only use it on devices nothing else is using meanwhile (refer to
+        planPrograms otherwise).
+    Arguments:
+        devices: dictionary of StarburstLJ objects keyed by the label
+            used for them in the plan.
+"""
+@contextlib.contextmanager
+def dryRun(devices):
+    plan = []
+    lock = threading.Lock()
+    layers = {}
+    saved = {}
+    for key, lj in devices.items():
+        saved[key] = dict((attr, copy.deepcopy(getattr(lj, attr)))
+                          for attr in lj.ghostState)
+        layers[key] = PlanningLJM(key, plan, lock)
+        lj.addLayer(layers[key])
+    try:
+        yield plan
+    finally:
+        for key, lj in devices.items():
+            lj.removeLayer(layers[key])
+            for attr, value in saved[key].items():
+                setattr(lj, attr, value)
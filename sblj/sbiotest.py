@@ -0,0 +1,131 @@
+"""
+    STARBURST LabJack I/O Access Layer Test Suite
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import unittest
+import sblj
+import sbio
+import sbsim
+
+"""
+TestIOAccounting Test Group Description:
+    This group of tests makes sure that every StarburstLJ accounts for the
+    LJM calls, registers and bytes of its operations.
+
+    Test Count: 5
+"""
+class TestIOAccounting(unittest.TestCase):
+
+    def setUp(self):
+        sbsim.backend.reset()
+        sbsim.backend.latency = sbsim.LatencyModel()
+        self.lo = sblj.LONoiseLJ("LONoise", "ETHERNET", "SIM")
+        self.ant = sblj.AntennaLJ("Antenna", "ETHERNET", "SIM")
+
+    """
+    Test - test_costPerOperation:
+        Given that we set the LO frequency and read the LO parameters,
+        Then the calls are accounted to each public method, with nested
+            getParams calls accounted to the outermost one.
+    """
+    def test_costPerOperation(self):
+        self.lo.setLOFreq(sblj.LOFreqConstants.LO_7_5GHZ)
+        self.lo.getParams()
+
+        cost = self.lo.io.operations["setLOFreq"]
+        self.assertEqual((cost.calls, cost.registers, cost.invocations),
+                         (1, 2, 1))
+        self.assertEqual(cost.byOp, {"eWriteNames": 1})
+        self.assertEqual(cost.bytes, sbio.CALL_BYTES + 2 * (
+            sbio.FRAME_BYTES + sbio.VALUE_BYTES))
+
+        cost = self.lo.io.operations["getParams"]
+        self.assertEqual(cost.invocations, 1)
+        self.assertEqual(cost.byOp, {"eReadNames": 1,
+                                     "eReadNameString": 1})
+
+    """
+    Test - test_getParamsSingleRead:
+        Given that we read every antenna parameter twice and rename the
+            LabJack,
+        Then each read is one eReadNames call, the name is only read the
+            first time and is read again after the rename.
+    """
+    def test_getParamsSingleRead(self):
+        with sbio.measureIO({"A": self.ant}) as first:
+            self.ant.getParams()
+        with sbio.measureIO({"A": self.ant}) as second:
+            self.ant.getParams()
+        self.ant.setLJName("Renamed")
+        with sbio.measureIO({"A": self.ant}) as third:
+            dict = self.ant.getParams(["NAME", "SERIAL"])
+
+        self.assertEqual(first["A"].byOp, {"eReadNames": 1,
+                                           "eReadNameString": 1})
+        self.assertEqual(second["A"].byOp, {"eReadNames": 1})
+        self.assertEqual(first["A"].registers, 20)
+        self.assertEqual(third["A"].byOp, {"eReadNames": 1,
+                                           "eReadNameString": 1})
+        self.assertEqual(dict["NAME"], "Renamed")
+
+    """
+    Test - test_totalsMatchBackend:
+        Given the calls made by constructing and using an antenna,
+        Then the totals of both devices (less the openS calls) match the
+            calls served by the simulated backend.
+    """
+    def test_totalsMatchBackend(self):
+        self.ant.setAttenuator(3)
+        served = sum(count[0] for count in sbsim.backend.stats.values())
+        made = sum(lj.io.total.calls - lj.io.total.byOp["openS"]
+                   for lj in [self.lo, self.ant])
+        self.assertEqual(made, served)
+
+    """
+    Test - test_measureIO:
+        Given a block of code touching two devices,
+        Then measureIO returns the cost per device and the total.
+    """
+    def test_measureIO(self):
+        with sbio.measureIO({"LO": self.lo, "A": self.ant}) as cost:
+            self.lo.setNoiseSourceOn()
+            self.ant.selectNoiseSource()
+
+        self.assertEqual(cost["LO"].calls, 1)
+        self.assertEqual(cost["A"].calls, 1)
+        self.assertEqual(cost["A"].registers, 2)
+        self.assertEqual(cost["TOTAL"].calls, 2)
+
+    """
+    Test - test_dryRunPlansWithoutWriting:
+        Given a dry run of an attenuator change,
+        Then the planned calls are returned, nothing reaches the device
+            and the ghost attenuations are restored.
+    """
+    def test_dryRunPlansWithoutWriting(self):
+        device = sbsim.backend.devices["Antenna"]
+        calls = self.ant.io.total.calls
+        with sbio.dryRun({"A": self.ant}) as plan:
+            self.ant.setAttenuator(0, ["VQ"])
+
+        self.assertEqual(len(plan), 1)
+        self.assertEqual(plan[0].op, "eWriteNames")
+        self.assertEqual(plan[0].names[:7], ["FIO0", "FIO1", "FIO2", "FIO3",
+                                             "FIO4", "FIO5", "CIO0"])
+        self.assertEqual(plan[0].values[:7], [0, 0, 0, 0, 0, 0, 1])
+        self.assertEqual(device.attenuation["VQ"], 63)
+        self.assertEqual(self.ant.allAtt["VQ"], 31.5)
+        self.assertEqual(self.ant.io.total.calls, calls)
+        self.assertTrue(self.ant.ljm is self.ant.io)
+
+
+# Main Method
+if __name__ == '__main__':
+    testGroups = [TestIOAccounting]
+    for tG in testGroups:
+        print "\nTesting: " + str(tG.__name__)
+        suite = unittest.TestLoader().loadTestsFromTestCase(
+            tG)
+        unittest.TextTestRunner(verbosity=2).run(suite)
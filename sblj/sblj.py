@@ -5,9 +5,12 @@
 """
 
 from labjack import ljm
+import sbio
+import sbhist
+import sbclock
 import time
-import copy
 import math
+import collections
 
 """
 Class: UnknownDeviceError extends Exception
@@ -42,7 +45,7 @@ class NoConnectionError(Exception):
         self.identifier = identifier
         
     def __str__(self):
-        return("There is no connection to device " + identifier)
+        return("There is no connection to device " + self.identifier)
 
 """
 Class: InvalidLOFreqError extends Exception
@@ -55,6 +58,34 @@ class InvalidLOFreqError(Exception):
         return("Please refer to LOFreqConstants for LO frequency constants," +
                " or documentation for usage.")
 
+"""
+Class: InvalidPWMError extends Exception
+    Description:
+        Custom error for checking that a noise source PWM setting can be
+        generated by the DIO extended features of the LabJack.
+"""
+class InvalidPWMError(Exception):
+    def __init__(self, reason):
+        self.reason = reason
+        
+    def __str__(self):
+        return("Invalid noise source PWM setting: " + self.reason)
+
+"""
+Class: RegisterProgram extends namedtuple
+    Description:
+        Precomputed register writes, sent in order with a single 
+        eWriteNames call by StarburstLJ.runProgram, and the ghost state 
+        they leave the device in.
+    Fields:
+        names: list of register names.
+        values: list of values to write to them.
+        state: dictionary keyed by ghost state attribute (e.g. "allAtt") 
+            of the entries to update in that attribute once written.
+"""
+RegisterProgram = collections.namedtuple("RegisterProgram", 
+                                         ["names", "values", "state"])
+
 """
 Class: LOFreqConstants
     Description:
@@ -84,10 +115,18 @@ Class: StarburstLJ extends Object
         deviceType: string representation of LabJack device. Can be "T7", 
             "ANY", or other types supported by the LabJack LMJ library. 
             (Refer to their documentation for details.) Default value set 
-            to "T7".
+            to "T7". Passing "SIM" as either deviceType or connectionType
+            selects the simulated T7 backend from sbsim.py instead of the
+            LJM library. (Other backends can be registered in sbio.py.)
         handle: LMJ handle object. The option to directly pass in the handle 
             object is used for unit testing. Otherwise, refrain from directly 
             passing the LMJ handle object.
+    Attributes:
+        io: sbio.IOCounter accounting for every LJM call made by the 
+            object (lj.io.total), and per public method 
+            (lj.io.operations["setAttenuator"], ...).
+        Every LJM call is also timed into the latency histograms of 
+            the device (refer to sbhist.py).
     Raises:
         TypeError: occurs when given parameters are not strings.
         UnknownDeviceError: occurs when device description such as 
@@ -112,6 +151,11 @@ class StarburstLJ(object):
     ljVariables = ["LJTEMP", "LJAIRTEMP", "POW_24V", "POW_15V", 
                    "POW_12V", "POW_5V", "POW_N5V", "NAME", 
                    "POW_S5V", "SERIAL"]
+                   
+    # Attributes holding ghost copies of device state. (These are restored
+    # after planning calls with sbio.dryRun.)
+    
+    ghostState = ("staticParams", "lastRead", "clock")
                             
     def __init__(self, identifier="ANY", connectionType="ETHERNET", 
                  deviceType="T7", handle=None):   
@@ -125,47 +169,62 @@ class StarburstLJ(object):
         self.identifier = str(identifier)
         self.connectionType = connectionType
         self.deviceType = deviceType
+        self.handle = handle
+        self.staticParams = {}
+        
+        # Timing of the last batched read of getParams, and the model of 
+        # the device clock when CORE_TIMER is read along (refer to 
+        # setCoreTimer).
+        self.lastRead = None
+        self.clock = None
+        
+        self.ljm = sbio.getBackend(deviceType, connectionType)
+        self.addLayer(sbhist.TimingLJM(self.identifier))
+        self.io = sbio.IOCounter()
+        self.addLayer(self.io)
+        for factory in sbio.layerFactories:
+            layer = factory(self)
+            if layer is not None:
+                self.addLayer(layer)
         
         if handle is None: 
-            self.handle = None
             self.connect()
-        else: 
-            self.handle = handle
     
     
-    # Private getter methods to retrieve specific parameters. Do NOT use 
-    # these methods without its wrapper getParams since these 
-    # are not error checked.
+    # Private getter methods to compute specific parameters from the 
+    # registers read by getParams (regs, keyed by register name). Do NOT 
+    # use these methods without its wrapper getParams since these are 
+    # not error checked.
     
-    def __getLJTemp(self):
-        temp = ljm.eReadName(self.handle, "TEMPERATURE_DEVICE_K")
+    def __getLJTemp(self, regs):
+        temp = regs["TEMPERATURE_DEVICE_K"]
         return temp
-    def __getLJAirTemp(self):
-        temp = ljm.eReadName(self.handle, "TEMPERATURE_AIR_K")
+    def __getLJAirTemp(self, regs):
+        temp = regs["TEMPERATURE_AIR_K"]
         return temp
-    def __get24V(self):
-        volt = ljm.eReadName(self.handle, "AIN4") * 3
+    def __get24V(self, regs):
+        volt = regs["AIN4"] * 3
         return volt
-    def __get15V(self):
-        volt = ljm.eReadName(self.handle, "AIN5") * 2
+    def __get15V(self, regs):
+        volt = regs["AIN5"] * 2
         return volt
-    def __get12V(self):
-        volt = ljm.eReadName(self.handle, "AIN6") * 2
+    def __get12V(self, regs):
+        volt = regs["AIN6"] * 2
         return volt
-    def __get5V(self):
-        volt = ljm.eReadName(self.handle, "AIN7")
+    def __get5V(self, regs):
+        volt = regs["AIN7"]
         return volt
-    def __getN5V(self):
-        volt = ljm.eReadName(self.handle, "AIN9")
+    def __getN5V(self, regs):
+        volt = regs["AIN9"]
         return volt
-    def __getName(self):
-        name = ljm.eReadNameString(self.handle, "DEVICE_NAME_DEFAULT")
+    def __getName(self, regs):
+        name = self.ljm.eReadNameString(self.handle, "DEVICE_NAME_DEFAULT")
         return name
-    def __getS5V(self):
-        volt = ljm.eReadName(self.handle, "AIN8")
+    def __getS5V(self, regs):
+        volt = regs["AIN8"]
         return volt
-    def __getSerial(self):
-        serial = ljm.eReadName(self.handle, "SERIAL_NUMBER")
+    def __getSerial(self, regs):
+        serial = regs["SERIAL_NUMBER"]
         return serial
         
     # Dictionary lookup for parameters (Placed here because the 
@@ -175,6 +234,21 @@ class StarburstLJ(object):
                  'POW_24V': __get24V, 'POW_15V': __get15V, 
                  'POW_12V': __get12V, 'POW_5V': __get5V, 'POW_N5V': __getN5V,
                  'NAME': __getName, 'POW_S5V': __getS5V, 'SERIAL': __getSerial}
+    
+    # Numeric registers each parameter is computed from. getParams reads
+    # the registers of all requested parameters in one eReadNames call.
+    
+    ljVarRegisters = {'LJTEMP': ["TEMPERATURE_DEVICE_K"], 
+                      'LJAIRTEMP': ["TEMPERATURE_AIR_K"],
+                      'POW_24V': ["AIN4"], 'POW_15V': ["AIN5"], 
+                      'POW_12V': ["AIN6"], 'POW_5V': ["AIN7"], 
+                      'POW_N5V': ["AIN9"], 'NAME': [], 'POW_S5V': ["AIN8"],
+                      'SERIAL': ["SERIAL_NUMBER"]}
+    
+    # Parameters that do not change while connected. These are read once
+    # and cached until the device is renamed, rebooted or reconnected.
+    
+    ljStaticVariables = ["NAME", "SERIAL"]
      
     """
     Method: connect()
@@ -188,9 +262,11 @@ class StarburstLJ(object):
                 valid LabJack module.
     """
     def connect(self):
+        self.staticParams = {}
         try:
-            self.handle = ljm.openS(self.deviceType, self.connectionType,
-                                    self.identifier)
+            self.handle = self.ljm.openS(self.deviceType,
+                                         self.connectionType,
+                                         self.identifier)
         except ljm.LJMError as e:
             self.handle = None
             raise UnknownDeviceError(self.deviceType, self.connectionType,
@@ -206,7 +282,7 @@ class StarburstLJ(object):
     """
     def disconnect(self):
         try:
-            ljm.close(self.handle)
+            self.ljm.close(self.handle)
         except ljm.LJMError:
             pass
         finally:
@@ -217,16 +293,24 @@ class StarburstLJ(object):
         Description:
             Reboots the LabJack device.
     """
+    @sbio.operation
     def reboot(self):
         self.errorCheck()
         
-        ljm.eWriteName(self.handle, "SYSTEM_REBOOT",
-                       0x4C4A0000)
+        self.ljm.eWriteName(self.handle, "SYSTEM_REBOOT",
+                            0x4C4A0000)
+        self.staticParams = {}
     
     """
     Method: getParams(variables)
         Description: 
-            Main query to LabJack modules for hardware information. 
+            Main query to LabJack modules for hardware information. All 
+            numeric registers needed are read in a single eReadNames call
+            and NAME and SERIAL are only read the first time. TIMESTAMP is
+            the wall clock time the registers were sampled, estimated as 
+            the middle of the read (or from CORE_TIMER, refer to 
+            setCoreTimer). The monotonic start and end of the read are 
+            kept in the lastRead attribute (sbclock.ReadTiming).
         Arguments: 
             variables: a list of keys from ljVarDict of which the 
                 corresponding parameter should be measured and returned.
@@ -238,17 +322,73 @@ class StarburstLJ(object):
                 LabJack unit.
             KeyError occurs when designated key is non-existent.
     """
+    @sbio.operation
     def getParams(self, variables=None):
         self.errorCheck()
         
-        varDump = {'TIMESTAMP': time.time()}
+        varDump = {}
         if variables is None:
             variables = StarburstLJ.ljVariables
         
+        registers = []
         for var in variables:
-            varDump[var] = self.ljVarDict[var](self)
-        return varDump
+            if var not in self.staticParams:
+                for register in self.ljVarRegisters[var]:
+                    if register not in registers:
+                        registers.append(register)
+                        
+        regs = {}
+        if registers:
+            if self.clock is not None:
+                registers.append("CORE_TIMER")
+            start = sbio.monotonic()
+            values = self.ljm.eReadNames(self.handle, len(registers), 
+                                         registers)
+            end = sbio.monotonic()
+            regs = dict(zip(registers, values))
             
+            ticks = regs.get("CORE_TIMER")
+            if ticks is None:
+                sample = (start + end) / 2.0
+            else:
+                sample = self.clock.update(ticks, start, end)
+            self.lastRead = sbclock.ReadTiming(
+                start, end, sample, sbclock.wallTime(sample), ticks)
+            varDump['TIMESTAMP'] = self.lastRead.timestamp
+        else:
+            varDump['TIMESTAMP'] = time.time()
+        
+        for var in variables:
+            if var in self.staticParams:
+                varDump[var] = self.staticParams[var]
+                continue
+            varDump[var] = self.ljVarDict[var](self, regs)
+            if var in self.ljStaticVariables:
+                self.staticParams[var] = varDump[var]
+        return varDump
+    
+    """
+    Method: setCoreTimer(enabled, rate)
+        Description:
+            Starts (or stops) reading CORE_TIMER in the same eReadNames
+            call as the registers of getParams. Its values fit a model of
+            the device clock against the host monotonic clock (the clock
+            attribute, sbclock.ClockModel), which then gives the time the
+            registers were sampled, instead of the middle of the read.
+        Arguments:
+            enabled: True to read CORE_TIMER, False to stop and drop the
+                model.
+            rate: CORE_TIMER frequency in Hz.
+        Returns:
+            clock: the sbclock.ClockModel, or None.
+    """
+    def setCoreTimer(self, enabled=True, rate=40e6):
+        if not enabled:
+            self.clock = None
+        elif self.clock is None or self.clock.rate != rate:
+            self.clock = sbclock.ClockModel(rate)
+        return self.clock
+    
     """
     Method: setLJName(name)
         Description:
@@ -268,6 +408,7 @@ class StarburstLJ(object):
             NoConnectionError: occurs when there is no connection to the
                 LabJack unit.
     """
+    @sbio.operation
     def setLJName(self, name):
         self.errorCheck()
         
@@ -277,9 +418,64 @@ class StarburstLJ(object):
                             str(type(name)) + 
                             " with less than 49 characters and no periods.")
         
-        ljm.eWriteNameString(self.handle, "DEVICE_NAME_DEFAULT",
-                                 name)
+        self.ljm.eWriteNameString(self.handle, "DEVICE_NAME_DEFAULT",
+                                  name)
+        self.staticParams = {}
+            
+    """
+    Method: runProgram(program)
+        Description:
+            Writes the registers of a RegisterProgram with one eWriteNames 
+            call and then updates the ghost state.
+        Arguments:
+            program: the RegisterProgram to run.
+        Raises:
+            NoConnectionError: occurs when there is no connection to the
+                LabJack unit.
+    """
+    @sbio.operation
+    def runProgram(self, program):
+        self.errorCheck()
+        
+        if program.names:
+            self.ljm.eWriteNames(self.handle, len(program.names), 
+                                 program.names, program.values)
+        for attribute, values in program.state.items():
+            getattr(self, attribute).update(values)
             
+    """
+    Method: addLayer(layer)
+        Description:
+            Stacks an sbio.LJMProxy layer on top of the backend used by
+            this LabJack so that every following LJM call goes through it.
+        Arguments:
+            layer: the LJMProxy to add.
+    """
+    def addLayer(self, layer):
+        layer.backend = self.ljm
+        self.ljm = layer
+        
+    """
+    Method: removeLayer(layer)
+        Description:
+            Removes a layer previously added with addLayer(), wherever it
+            is in the stack.
+        Raises:
+            ValueError: occurs when the layer is not in the stack.
+    """
+    def removeLayer(self, layer):
+        if self.ljm is layer:
+            self.ljm = layer.backend
+            return
+            
+        above = self.ljm
+        while isinstance(above, sbio.LJMProxy):
+            if above.backend is layer:
+                above.backend = layer.backend
+                return
+            above = above.backend
+        raise ValueError("Layer is not used by device " + self.identifier)
+        
     """
     Method: errorCheck()
         Description:
@@ -313,30 +509,35 @@ class LONoiseLJ(StarburstLJ):
                    "POW_S5V", "SERIAL", "LOFREQ", "NSSTAT"]
                    
     ljLOVariables = ["LOFREQ", "NSSTAT"]
+    
+    ghostState = ("staticParams", "lastRead", "clock", "noisePWM")
                    
     def __init__(self, identifier="ANY", connectionType="ETHERNET", 
                  deviceType="T7", handle=None):
         super(LONoiseLJ, self).__init__(identifier, connectionType,
                                         deviceType, handle)
+        
+        # Last noise source PWM setting sent (refer to startNoisePWM).
+        self.noisePWM = {"RUNNING": False}
                                         
         self.LOConstantNames = {value: name for name, 
                                 value in vars(LOFreqConstants).items() 
                                 if name.isupper()}
                                         
     
-    # Private getter methods to retrieve specific parameters. Do NOT use 
-    # these methods without its wrapper getParamsiables since these 
-    # are not error checked.
+    # Private getter methods to compute specific parameters from the 
+    # registers read by getParams. Do NOT use these methods without its 
+    # wrapper getParams since these are not error checked.
         
-    def __getLOFreq(self):
-        rightBit = ljm.eReadName(self.handle, "EIO3")
-        leftBit = ljm.eReadName(self.handle, "EIO4")
+    def __getLOFreq(self, regs):
+        rightBit = regs["EIO3"]
+        leftBit = regs["EIO4"]
         
         setting = leftBit * 2 + rightBit
         freqName = self.LOConstantNames[setting]
         return freqName, setting
-    def __getNSStatus(self):
-        status = ljm.eReadName(self.handle, "EIO0")
+    def __getNSStatus(self, regs):
+        status = regs["EIO0"]
         return status
         
 
@@ -344,30 +545,40 @@ class LONoiseLJ(StarburstLJ):
     # corresponding methods that are pointed to must be defined first.)
 
     ljLOVarDict = {'LOFREQ': __getLOFreq, 'NSSTAT': __getNSStatus}
+    ljLOVarRegisters = {'LOFREQ': ["EIO3", "EIO4"], 'NSSTAT': ["EIO0"]}
+    
+    ljVarDict = dict(StarburstLJ.ljVarDict)
+    ljVarDict.update(ljLOVarDict)
+    ljVarRegisters = dict(StarburstLJ.ljVarRegisters)
+    ljVarRegisters.update(ljLOVarRegisters)
 
 
-    # Private LO frequency setting methods. Do NOT call these methods 
-    # directly, instead, use the setLOFreq method. These methods are
-    # not error checked. 
-
-    def __setFreq(self, leftBit, rightBit):
-        ljm.eWriteName(self.handle, "EIO3", rightBit)
-        ljm.eWriteName(self.handle, "EIO4", leftBit)   
-    def __3_4GHZ(self):
-        self.__setFreq(0, 0)
-    def __7_5GHZ(self):
-        self.__setFreq(0, 1)  
-    def __11_5GHZ(self):
-        self.__setFreq(1, 0)
-    def __15_5GHZ(self):
-        self.__setFreq(1, 1)
-    
-    # Dictionary lookup for LO settings and corresponding methods.
+    # Dictionary lookup for LO settings and the corresponding (left, 
+    # right) bits, written to EIO4 and EIO3.
 
-    ljLODict = {LOFreqConstants.LO_3_4GHZ: __3_4GHZ, 
-                LOFreqConstants.LO_7_5GHZ: __7_5GHZ,
-                LOFreqConstants.LO_11_5GHZ: __11_5GHZ, 
-                LOFreqConstants.LO_15_5GHZ: __15_5GHZ}
+    ljLODict = {LOFreqConstants.LO_3_4GHZ: (0, 0), 
+                LOFreqConstants.LO_7_5GHZ: (0, 1),
+                LOFreqConstants.LO_11_5GHZ: (1, 0), 
+                LOFreqConstants.LO_15_5GHZ: (1, 1)}
+    
+    """
+    Method: compileLOFreq(freq)
+        Description:
+            Builds the RegisterProgram setting the LO frequency, without
+            touching any LabJack. (Used for precompiled band settings.)
+        Arguments:
+            freq: a frequency option defined in LOFreqConstants.
+        Raises:
+            InvalidLOFreqError: occurs when freq is not a defined frequency 
+                option from LOFreqConstants.
+    """
+    @classmethod
+    def compileLOFreq(cls, freq):
+        try:
+            leftBit, rightBit = cls.ljLODict[freq]
+        except (KeyError, TypeError):
+            raise InvalidLOFreqError()
+        return RegisterProgram(["EIO3", "EIO4"], [rightBit, leftBit], {})
     
     """
     Method: setLOFreq(freq)
@@ -383,12 +594,11 @@ class LONoiseLJ(StarburstLJ):
                 LabJack unit.
             
     """
+    @sbio.operation
     def setLOFreq(self, freq):
         self.errorCheck()
-        try:
-            LONoiseLJ.ljLODict[freq](self)
-        except KeyError:
-            raise InvalidLOFreqError()
+        
+        self.runProgram(LONoiseLJ.compileLOFreq(freq))
        
     """
     Method: setNoiseSourceOn
@@ -398,10 +608,11 @@ class LONoiseLJ(StarburstLJ):
             NoConnectionError: occurs when there is no connection to the
                 LabJack unit.
     """
+    @sbio.operation
     def setNoiseSourceOn(self):
         self.errorCheck()
         
-        ljm.eWriteName(self.handle, "EIO0", 1)
+        self.ljm.eWriteName(self.handle, "EIO0", 1)
     
     """
     Method: setNoiseSourceOff
@@ -411,10 +622,158 @@ class LONoiseLJ(StarburstLJ):
             NoConnectionError: occurs when there is no connection to the
                 LabJack unit.
     """
+    @sbio.operation
     def setNoiseSourceOff(self):
         self.errorCheck()
             
-        ljm.eWriteName(self.handle, "EIO0", 0)
+        self.ljm.eWriteName(self.handle, "EIO0", 0)
+    
+    """
+    Method: compileNoiseSource(on)
+        Description:
+            Builds the RegisterProgram turning the noise source on or off,
+            without touching any LabJack. (Used for planning.)
+    """
+    @classmethod
+    def compileNoiseSource(cls, on):
+        return RegisterProgram(["EIO0"], [1 if on else 0], {})
+            
+    # Hardware timed noise source switching. EIO0 has no DIO extended 
+    # features, so the noise source driver is also wired to a line that 
+    # can output PWM (DIO0, DIO2-DIO5 on the T7). The PWM is clocked by 
+    # DIO_EF_CLOCK0 (80MHz core clock, 32 bit roll value).
+    
+    noisePWMLine = "FIO0"
+    ljPWMLines = {"FIO0": 0, "FIO2": 2, "FIO3": 3, "FIO4": 4, "FIO5": 5}
+    ljCoreClock = 80e6
+    ljClockDivisors = [1, 2, 4, 8, 16, 32, 64, 256]
+    
+    @classmethod
+    def __pwmPrefix(cls, line):
+        if line not in cls.ljPWMLines:
+            raise InvalidPWMError(str(line) + " cannot output PWM")
+        return "DIO" + str(cls.ljPWMLines[line]) + "_EF_"
+    
+    """
+    Method: compileNoisePWM(freq, duty, line)
+        Description:
+            Builds the RegisterProgram configuring DIO_EF_CLOCK0 and the 
+            PWM output feature of line to switch the noise source at freq
+            with the given duty cycle, without touching any LabJack. The 
+            frequency and duty cycle are rounded to whole clock ticks (the
+            values obtained are in the ghost state).
+        Arguments:
+            freq: switching frequency in Hz.
+            duty: fraction of each period the noise source is on.
+            line: PWM capable line wired to the noise source (noisePWMLine
+                when omitted).
+        Raises:
+            InvalidPWMError: occurs when line cannot output PWM, duty is 
+                not within 0 and 1, or freq cannot be generated.
+    """
+    @classmethod
+    def compileNoisePWM(cls, freq, duty=0.5, line=None):
+        line = cls.noisePWMLine if line is None else line
+        prefix = cls.__pwmPrefix(line)
+        if not 0 <= duty <= 1:
+            raise InvalidPWMError("duty cycle " + str(duty))
+        if not freq > 0:
+            raise InvalidPWMError("frequency " + str(freq))
+            
+        for divisor in cls.ljClockDivisors:
+            roll = int(round(cls.ljCoreClock / divisor / freq))
+            if roll < 2 ** 32:
+                break
+        if not 2 <= roll < 2 ** 32:
+            raise InvalidPWMError("frequency " + str(freq))
+        high = int(round(duty * roll))
+            
+        names = ["DIO_EF_CLOCK0_ENABLE", "DIO_EF_CLOCK0_DIVISOR",
+                 "DIO_EF_CLOCK0_ROLL_VALUE", "DIO_EF_CLOCK0_ENABLE",
+                 prefix + "ENABLE", prefix + "INDEX", prefix + "CONFIG_A",
+                 prefix + "ENABLE"]
+        values = [0, divisor, roll, 1, 0, 0, high, 1]
+        state = {"RUNNING": True, "LINE": line, 
+                 "FREQ": cls.ljCoreClock / divisor / roll,
+                 "DUTY": high / float(roll)}
+        return RegisterProgram(names, values, {"noisePWM": state})
+    
+    """
+    Method: startNoisePWM(freq, duty, line)
+        Description:
+            Starts switching the noise source on the LabJack itself at 
+            freq with the given duty cycle, with one batched write. Costs
+            the host nothing per cycle. (Refer to compileNoisePWM.)
+        Raises:
+            InvalidPWMError: occurs when the setting cannot be generated.
+            NoConnectionError: occurs when there is no connection to the
+                LabJack unit.
+    """
+    @sbio.operation
+    def startNoisePWM(self, freq, duty=0.5, line=None):
+        self.errorCheck()
+        
+        self.runProgram(LONoiseLJ.compileNoisePWM(freq, duty, line))
+    
+    """
+    Method: stopNoisePWM(line)
+        Description:
+            Stops the noise source PWM and leaves its line low (noise 
+            source off, unless turned on with setNoiseSourceOn).
+        Arguments:
+            line: line of the PWM (the one it was started on when 
+                omitted).
+        Raises:
+            InvalidPWMError: occurs when line cannot output PWM.
+            NoConnectionError: occurs when there is no connection to the
+                LabJack unit.
+    """
+    @sbio.operation
+    def stopNoisePWM(self, line=None):
+        self.errorCheck()
+        
+        if line is None:
+            line = self.noisePWM.get("LINE", LONoiseLJ.noisePWMLine)
+        prefix = LONoiseLJ.__pwmPrefix(line)
+        self.runProgram(RegisterProgram(
+            [prefix + "ENABLE", "DIO_EF_CLOCK0_ENABLE", line], [0, 0, 0],
+            {"noisePWM": {"RUNNING": False}}))
+    
+    """
+    Method: getNoisePWM(line)
+        Description:
+            Reads the noise source PWM configuration back from the 
+            LabJack with one batched read.
+        Arguments:
+            line: line of the PWM (the one it was started on when 
+                omitted).
+        Returns:
+            status: dictionary with RUNNING (whether the line outputs 
+                PWM), LINE, FREQ (Hz) and DUTY (0 to 1).
+        Raises:
+            InvalidPWMError: occurs when line cannot output PWM.
+            NoConnectionError: occurs when there is no connection to the
+                LabJack unit.
+    """
+    @sbio.operation
+    def getNoisePWM(self, line=None):
+        self.errorCheck()
+        
+        if line is None:
+            line = self.noisePWM.get("LINE", LONoiseLJ.noisePWMLine)
+        prefix = LONoiseLJ.__pwmPrefix(line)
+        names = [prefix + "ENABLE", prefix + "INDEX", prefix + "CONFIG_A",
+                 "DIO_EF_CLOCK0_ENABLE", "DIO_EF_CLOCK0_DIVISOR",
+                 "DIO_EF_CLOCK0_ROLL_VALUE"]
+        enable, index, high, clock, divisor, roll = self.ljm.eReadNames(
+            self.handle, len(names), names)
+        
+        roll = roll or 2 ** 32
+        divisor = divisor or 1
+        return {"RUNNING": bool(enable and clock) and int(index) == 0,
+                "LINE": line,
+                "FREQ": LONoiseLJ.ljCoreClock / divisor / roll,
+                "DUTY": high / float(roll)}
             
     """
     Method: getParams(variables)
@@ -431,22 +790,12 @@ class LONoiseLJ(StarburstLJ):
                 LabJack unit.
             KeyError occurs when designated key is non-existent.
     """
+    @sbio.operation
     def getParams(self, variables=None):
-        self.errorCheck()
-            
         if variables is None:
             variables = LONoiseLJ.ljVariables
             
-        cpy = copy.copy(variables)
-        varDump = {}
-    
-        for var in LONoiseLJ.ljLOVariables:
-            if var in cpy:
-                varDump[var] = self.ljLOVarDict[var](self)
-                cpy.remove(var)
-            
-        varDump.update(super(LONoiseLJ, self).getParams(cpy))
-        return varDump
+        return super(LONoiseLJ, self).getParams(variables)
             
 
 """
@@ -502,6 +851,8 @@ class AntennaLJ(StarburstLJ):
                     "VQTEMP", "VITEMP", "HQTEMP", "HITEMP",
                     "VQATTEN", "VIATTEN", "HQATTEN", "HIATTEN",
                     "VNSSEL", "HNSSEL"]
+                    
+    ghostState = ("staticParams", "lastRead", "clock", "allAtt")
                              
     def __init__(self, identifier="ANY", connectionType="ETHERNET", 
                  deviceType="T7", handle=None):
@@ -515,11 +866,13 @@ class AntennaLJ(StarburstLJ):
         self.setAttenuator(31.5)
         
 
-    # Private attenuator methods. Do NOT call these methods directly, 
-    # instead, use the setAttenuator methods to do so. (These methods
-    # are not error checked.)
+    # Private attenuator method. Do NOT call this method directly, 
+    # instead, use the setAttenuator methods to do so. It appends the 
+    # (name, value) writes putting the code for val on the attenuator 
+    # data lines (FIO0 to FIO5) to writes, and returns the level set.
 
-    def __setUpAttenuations(self, val):
+    @staticmethod
+    def __setUpAttenuations(val, writes):
         attDict = {1: "FIO1", 2: "FIO2", 3: "FIO3", 4: "FIO4", 5: "FIO5"}
         
         if val > 31:
@@ -527,101 +880,80 @@ class AntennaLJ(StarburstLJ):
         elif val < 0:
             newVal = 0
         else:
-            newVal = math.ceil(val * 2)
+            newVal = int(math.ceil(val * 2))
             
         temp = newVal / 2.0
             
         if newVal % 2 == 1:
-            ljm.eWriteName(self.handle, "FIO0", 1)
-            newVal = (newVal - 1) / 2
+            writes.append(("FIO0", 1))
+            newVal = (newVal - 1) // 2
         else:
-            ljm.eWriteName(self.handle, "FIO0", 0)
-            newVal = newVal / 2
+            writes.append(("FIO0", 0))
+            newVal = newVal // 2
         
         for i in range(1, 6):
-            ljm.eWriteName(self.handle, attDict[i], newVal % 2)
-            newVal /= 2
+            writes.append((attDict[i], newVal % 2))
+            newVal //= 2
             
         return temp
-            
-    def __turnOffAllLatches(self):
-        ljm.eWriteName(self.handle, "CIO0", 0)
-        ljm.eWriteName(self.handle, "CIO1", 0)
-        ljm.eWriteName(self.handle, "CIO2", 0)
-        ljm.eWriteName(self.handle, "CIO3", 0)
-    def __VQAttenLatch(self, newVal):
-        ljm.eWriteName(self.handle, "CIO0", 1)
-        self.__turnOffAllLatches()
-        self.allAtt["VQ"] = newVal
-    def __VIAttenLatch(self, newVal):
-        ljm.eWriteName(self.handle, "CIO1", 1)
-        self.__turnOffAllLatches()
-        self.allAtt["VI"] = newVal
-    def __HQAttenLatch(self, newVal):
-        ljm.eWriteName(self.handle, "CIO2", 1)
-        self.__turnOffAllLatches()
-        self.allAtt["HQ"] = newVal
-    def __HIAttenLatch(self, newVal):
-        ljm.eWriteName(self.handle, "CIO3", 1)
-        self.__turnOffAllLatches()
-        self.allAtt["HI"] = newVal
 
-        # Dictionary for attenuator method setups.
+    # Dictionary for the latch line of each attenuator. Raising a latch 
+    # makes its attenuator take the code on FIO0 to FIO5.
 
-    attDict = {'VQ': __VQAttenLatch, 
-               'VI': __VIAttenLatch,  
-               'HQ': __HQAttenLatch, 
-               'HI': __HIAttenLatch}
+    attDict = {'VQ': "CIO0", 
+               'VI': "CIO1",  
+               'HQ': "CIO2", 
+               'HI': "CIO3"}
 
-    # Private getter methods to retrieve specific parameters. Do NOT use 
-    # these methods without its wrapper getParamsiables since these 
-    # are not error checked.
+    # Private getter methods to compute specific parameters from the 
+    # registers read by getParams. Do NOT use these methods without its 
+    # wrapper getParams since these are not error checked.
         
-    def __getVQPow(self):
-        pow = ljm.eReadName(self.handle, "AIN3")
+    def __getVQPow(self, regs):
+        pow = regs["AIN3"]
         pow = 24 - 40 * pow
         return pow
-    def __getVIPow(self):
-        pow = ljm.eReadName(self.handle, "AIN2")
+    def __getVIPow(self, regs):
+        pow = regs["AIN2"]
         pow = 24 - 40 * pow
         return pow
-    def __getHQPow(self):
-        pow = ljm.eReadName(self.handle, "AIN1")
+    def __getHQPow(self, regs):
+        pow = regs["AIN1"]
         pow = 24 - 40 * pow
         return pow
-    def __getHIPow(self):
-        pow = ljm.eReadName(self.handle, "AIN0")
+    def __getHIPow(self, regs):
+        pow = regs["AIN0"]
         pow = 24 - 40 * pow
         return pow
-    def __getVQTemp(self):
-        temp = ljm.eReadName(self.handle, "AIN13")
+    def __getVQTemp(self, regs):
+        temp = regs["AIN13"]
         temp = 478 * temp - 267
         return temp
-    def __getVITemp(self):
-        temp = ljm.eReadName(self.handle, "AIN12")
+    def __getVITemp(self, regs):
+        temp = regs["AIN12"]
         temp = 478 * temp - 267
         return temp
-    def __getHQTemp(self):
-        temp = ljm.eReadName(self.handle, "AIN11")
+    def __getHQTemp(self, regs):
+        temp = regs["AIN11"]
         temp = 478 * temp - 267
         return temp
-    def __getHITemp(self):
-        temp = ljm.eReadName(self.handle, "AIN10")
+    def __getHITemp(self, regs):
+        temp = regs["AIN10"]
         temp = 478 * temp - 267
         return temp
-    def __getVQAtt(self):
+    def __getVQAtt(self, regs):
         return self.allAtt["VQ"]
-    def __getVIAtt(self):
+    def __getVIAtt(self, regs):
         return self.allAtt["VI"]
-    def __getHQAtt(self):
+    def __getHQAtt(self, regs):
         return self.allAtt["HQ"]
-    def __getHIAtt(self):
+    def __getHIAtt(self, regs):
         return self.allAtt["HI"]
-    def __getVNoiseSel(self):
-        sel = ljm.eReadName(self.handle, "EIO2")
+    def __getVNoiseSel(self, regs):
+        sel = regs["EIO2"]
         return sel
-    def __getHNoiseSel(self):
-        sel = ljm.eReadName(self.handle, "EIO1")
+    def __getHNoiseSel(self, regs):
+        sel = regs["EIO1"]
         return sel
 
     # Dictionary lookup for parameters (Placed here because the 
@@ -634,6 +966,17 @@ class AntennaLJ(StarburstLJ):
                   'VQATTEN': __getVQAtt, 'VIATTEN': __getVIAtt,
                   'HQATTEN': __getHQAtt, 'HIATTEN': __getHIAtt,
                   'VNSSEL': __getVNoiseSel, 'HNSSEL': __getHNoiseSel}
+    ljAVarRegisters = {'VQPOW': ["AIN3"], 'VIPOW': ["AIN2"], 
+                       'HQPOW': ["AIN1"], 'HIPOW': ["AIN0"],
+                       'VQTEMP': ["AIN13"], 'VITEMP': ["AIN12"],
+                       'HQTEMP': ["AIN11"], 'HITEMP': ["AIN10"],
+                       'VQATTEN': [], 'VIATTEN': [], 'HQATTEN': [], 
+                       'HIATTEN': [], 'VNSSEL': ["EIO2"], 'HNSSEL': ["EIO1"]}
+    
+    ljVarDict = dict(StarburstLJ.ljVarDict)
+    ljVarDict.update(ljAVarDict)
+    ljVarRegisters = dict(StarburstLJ.ljVarRegisters)
+    ljVarRegisters.update(ljAVarRegisters)
     
     """
     Method: getParams(variables)
@@ -650,22 +993,12 @@ class AntennaLJ(StarburstLJ):
                 LabJack unit.
             KeyError occurs when designated key is non-existent.
     """
+    @sbio.operation
     def getParams(self, variables=None):
-        self.errorCheck()
-            
         if variables is None:
             variables = AntennaLJ.ljVariables
             
-        cpy = copy.copy(variables)
-        varDump = {}
-    
-        for var in AntennaLJ.ljAVariables:
-            if var in cpy:
-                varDump[var] = self.ljAVarDict[var](self)
-                cpy.remove(var)
-            
-        varDump.update(super(AntennaLJ, self).getParams(cpy))
-        return varDump
+        return super(AntennaLJ, self).getParams(variables)
     
     """
     Method setAttenuator(val, list)
@@ -681,13 +1014,58 @@ class AntennaLJ(StarburstLJ):
             KeyError occurs when designated attenuator is non-existent.
             
     """
+    @sbio.operation
     def setAttenuator(self, level, list=["VQ","VI","HQ","HI"]):
+        self.setAttenuators(dict((input, level) for input in list))
+    
+    """
+    Method setAttenuators(levels)
+        Description:
+            Sets each attenuator in levels to its own level (rounded as in
+            setAttenuator) with a single eWriteNames call.
+        Arguments:
+            levels: dictionary of levels keyed by attenuator.
+        Raises:
+            NoConnectionError: occurs when there is no connection to the 
+                LabJack unit.
+            KeyError occurs when designated attenuator is non-existent.
+    """
+    @sbio.operation
+    def setAttenuators(self, levels):
         self.errorCheck()
         
-        newVal = self.__setUpAttenuations(level)
-                       
-        for input in list:
-            self.attDict[input](self, newVal)
+        self.runProgram(AntennaLJ.compileAttenuators(levels))
+    
+    """
+    Method compileAttenuators(levels)
+        Description:
+            Builds the RegisterProgram setting each attenuator in levels,
+            without touching any LabJack. Attenuators set to the same code
+            share one write of the data lines and are latched together. 
+            (Used for precompiled band settings.)
+        Arguments:
+            levels: dictionary of levels keyed by attenuator.
+        Raises:
+            KeyError occurs when designated attenuator is non-existent.
+    """
+    @classmethod
+    def compileAttenuators(cls, levels):
+        codes = collections.OrderedDict()
+        newVals = {}
+        for input in sorted(levels):
+            latch = cls.attDict[input]
+            writes = []
+            newVals[input] = cls.__setUpAttenuations(levels[input], writes)
+            codes.setdefault(tuple(writes), []).append(latch)
+        
+        writes = []
+        for code, latches in codes.items():
+            writes.extend(code)
+            writes.extend((latch, 1) for latch in latches)
+            writes.extend((latch, 0) for latch in latches)
+        return RegisterProgram([name for name, value in writes], 
+                               [value for name, value in writes],
+                               {"allAtt": newVals})
     
     """
     Method deltaAttenuator(delta, list)
@@ -703,12 +1081,37 @@ class AntennaLJ(StarburstLJ):
                 LabJack unit.
             KeyError occurs when designated attenuator is non-existent.
     """
+    @sbio.operation
     def deltaAttenuator(self, delta, list=["VQ","VI","HQ","HI"]):
+        self.setAttenuators(dict((input, self.allAtt[input] + delta)
+                                 for input in list))
+    
+    # Private noise source selection method. Do NOT call this method 
+    # directly, instead, use selectNoiseSource or selectRFSource.
+    
+    def __selectSource(self, list, sel):
         self.errorCheck()
         
-        for input in list:
-            newVal = self.__setUpAttenuations(self.allAtt[input] + delta)
-            self.attDict[input](self, newVal)
+        program = AntennaLJ.compileSource(list, sel)
+        if program.names:
+            self.ljm.eWriteNames(self.handle, len(program.names), 
+                                 program.names, program.values)
+    
+    """
+    Method compileSource(list, sel)
+        Description:
+            Builds the RegisterProgram selecting the noise source (sel 1) 
+            or RF (sel 0) for the polarizations in list, without touching 
+            any LabJack. (Used for planning.)
+    """
+    @classmethod
+    def compileSource(cls, list, sel):
+        names = []
+        if "H" in list:
+            names.append("EIO1")
+        if "V" in list:
+            names.append("EIO2")
+        return RegisterProgram(names, [sel] * len(names), {})
     
     """
     Method selectNoiseSource(list)
@@ -720,13 +1123,9 @@ class AntennaLJ(StarburstLJ):
             NoConnectionError: occurs when there is no connection to the 
                 LabJack unit.
     """
+    @sbio.operation
     def selectNoiseSource(self, list=["H","V"]):
-        self.errorCheck()
-        
-        if "H" in list:
-            ljm.eWriteName(self.handle, "EIO1", 1)
-        if "V" in list:
-            ljm.eWriteName(self.handle, "EIO2", 1)
+        self.__selectSource(list, 1)
     
     """
     Method selectRFSource(list)
@@ -738,10 +1137,6 @@ class AntennaLJ(StarburstLJ):
             NoConnectionError: occurs when there is no connection to the 
                 LabJack unit.
     """
+    @sbio.operation
     def selectRFSource(self, list=["H","V"]):
-        self.errorCheck()
-        
-        if "H" in list:
-            ljm.eWriteName(self.handle, "EIO1", 0)
-        if "V" in list:
-            ljm.eWriteName(self.handle, "EIO2", 0)
\ No newline at end of file
+        self.__selectSource(list, 0)
\ No newline at end of file
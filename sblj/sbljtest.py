@@ -25,6 +25,9 @@ class TestGenericLabJackGetParams(unittest.TestCase):
     def eReadName(self, handle, name):
         return self.mockLabJackValues[name]
         
+    def eReadNames(self, handle, numFrames, names):
+        return [self.eReadName(handle, name) for name in names]
+        
     def eReadNameString(self, handle, name):
         return self.mockLabJackValues[name]
     
@@ -46,13 +49,16 @@ class TestGenericLabJackGetParams(unittest.TestCase):
         self.lj = sblj.StarburstLJ("ANY","ANY","ANY","MOCK")
         
         self.o_eReadName = ljm.eReadName
+        self.o_eReadNames = ljm.eReadNames
         self.o_eReadNameString = ljm.eReadNameString
         
         ljm.eReadName = self.eReadName
+        ljm.eReadNames = self.eReadNames
         ljm.eReadNameString = self.eReadNameString
         
     def tearDown(self):
         ljm.eReadName = self.o_eReadName
+        ljm.eReadNames = self.o_eReadNames
         ljm.eReadNameString = self.o_eReadNameString
     
     """
@@ -299,16 +305,23 @@ class TestGenericLabJackReboot(unittest.TestCase):
         if name is "SYSTEM_REBOOT":
             self.reboot = newVal
         
+    def eWriteNames(self, handle, numFrames, names, newVals):
+        for name, newVal in zip(names, newVals):
+            self.eWriteName(handle, name, newVal)
+        
     def setUp(self):
         self.reboot = 0
         self.lj = sblj.StarburstLJ("", "", "", "MOCK")
         
         self.o_eWriteName = ljm.eWriteName
+        self.o_eWriteNames = ljm.eWriteNames
         
         ljm.eWriteName = self.eWriteName
+        ljm.eWriteNames = self.eWriteNames
         
     def tearDown(self):
         ljm.eWriteName = self.o_eWriteName
+        ljm.eWriteNames = self.o_eWriteNames
         
     def test_rebootChangesRebootValue(self):
         self.lj.reboot()
@@ -321,7 +334,7 @@ TestLONoiseLabJackModule Test Group Description:
     This group of tests makes sure that we can get/set the LO frequency 
     and that the settings are correct. 
     
-    Test Count: 4
+    Test Count: 5
 """
 class TestLONoiseLabJackModule(unittest.TestCase):
     # Monkey patching methods for LJM Library in order to unit test 
@@ -332,12 +345,19 @@ class TestLONoiseLabJackModule(unittest.TestCase):
     def eReadName(self, handle, name):
         return self.mockLabJackValues[name]
         
+    def eReadNames(self, handle, numFrames, names):
+        return [self.eReadName(handle, name) for name in names]
+        
     def eReadNameString(self, handle, name):
         return self.mockLabJackValues[name]
         
     def eWriteName(self, handle, name, newVal):
         self.mockLabJackValues[name] = newVal
         
+    def eWriteNames(self, handle, numFrames, names, newVals):
+        for name, newVal in zip(names, newVals):
+            self.eWriteName(handle, name, newVal)
+        
     def eWriteNameString(self, handle, name, newVal):
         self.mockLabJackValues[name] = newVal
     
@@ -362,19 +382,25 @@ class TestLONoiseLabJackModule(unittest.TestCase):
         self.lj = sblj.LONoiseLJ("","","","MOCK")
         
         self.o_eReadName = ljm.eReadName
+        self.o_eReadNames = ljm.eReadNames
         self.o_eReadNameString = ljm.eReadNameString
         self.o_eWriteName = ljm.eWriteName
+        self.o_eWriteNames = ljm.eWriteNames
         self.o_eWriteNameString = ljm.eWriteNameString
         
         ljm.eReadName = self.eReadName
+        ljm.eReadNames = self.eReadNames
         ljm.eReadNameString = self.eReadNameString
         ljm.eWriteName = self.eWriteName
+        ljm.eWriteNames = self.eWriteNames
         ljm.eWriteNameString = self.eWriteNameString
         
     def tearDown(self):
         ljm.eReadName = self.o_eReadName
+        ljm.eReadNames = self.o_eReadNames
         ljm.eReadNameString = self.o_eReadNameString
         ljm.eWriteName = self.o_eWriteName
+        ljm.eWriteNames = self.o_eWriteNames
         ljm.eWriteNameString = self.o_eWriteNameString
     
     """
@@ -436,6 +462,35 @@ class TestLONoiseLabJackModule(unittest.TestCase):
         self.lj.setNoiseSourceOff()
         self.assertEqual(self.mockLabJackValues["EIO0"], 0)
     
+    """
+    Test - test_noisePWMProgram:
+        Given that we start the noise source PWM at 1kHz with a 25% duty
+            cycle,
+        Then DIO_EF_CLOCK0 rolls over every 80000 ticks, FIO0 stays high
+            for 20000 of them, and lines without PWM or impossible 
+            settings raise InvalidPWMError.
+    """
+    def test_noisePWMProgram(self):
+        self.lj.startNoisePWM(1000, 0.25)
+        self.assertEqual(self.mockLabJackValues["DIO_EF_CLOCK0_ROLL_VALUE"],
+                         80000)
+        self.assertEqual(self.mockLabJackValues["DIO0_EF_CONFIG_A"], 20000)
+        self.assertEqual(self.mockLabJackValues["DIO0_EF_ENABLE"], 1)
+        self.assertEqual(self.lj.getNoisePWM(), 
+                         {"RUNNING": True, "LINE": "FIO0", "FREQ": 1000, 
+                          "DUTY": 0.25})
+        
+        self.lj.stopNoisePWM()
+        self.assertFalse(self.lj.getNoisePWM()["RUNNING"])
+        self.assertFalse(self.lj.noisePWM["RUNNING"])
+        self.assertEqual(self.mockLabJackValues["FIO0"], 0)
+        
+        self.assertRaises(sblj.InvalidPWMError, self.lj.startNoisePWM, 
+                          1000, 0.5, "EIO0")
+        self.assertRaises(sblj.InvalidPWMError, self.lj.startNoisePWM, 
+                          1000, 1.5)
+        self.assertRaises(sblj.InvalidPWMError, self.lj.startNoisePWM, 1e8)
+    
     """
     Test - test_getParamsReturnsCorrectValues:
         Given that the LMJ library calls work, 
@@ -476,7 +531,7 @@ TestAntennaLabJackModule Test Group Description:
     This group of tests makes sure that the methods for the AntennaLJ
     work properly.
     
-    Test Count: 5
+    Test Count: 6
 """    
 class TestAntennaLabJackModule(unittest.TestCase):
     # Monkey patching methods for LJM Library in order to unit test 
@@ -487,12 +542,19 @@ class TestAntennaLabJackModule(unittest.TestCase):
     def eReadName(self, handle, name):
         return self.mockLabJackValues[name]
         
+    def eReadNames(self, handle, numFrames, names):
+        return [self.eReadName(handle, name) for name in names]
+        
     def eReadNameString(self, handle, name):
         return self.mockLabJackValues[name]
         
     def eWriteName(self, handle, name, newVal):
         self.mockLabJackValues[name] = newVal
         
+    def eWriteNames(self, handle, numFrames, names, newVals):
+        for name, newVal in zip(names, newVals):
+            self.eWriteName(handle, name, newVal)
+        
     def eWriteNameString(self, handle, name, newVal):
         self.mockLabJackValues[name] = newVal
     
@@ -532,21 +594,27 @@ class TestAntennaLabJackModule(unittest.TestCase):
                                   'SERIAL_NUMBER': 1000}
         
         self.o_eReadName = ljm.eReadName
+        self.o_eReadNames = ljm.eReadNames
         self.o_eReadNameString = ljm.eReadNameString
         self.o_eWriteName = ljm.eWriteName
+        self.o_eWriteNames = ljm.eWriteNames
         self.o_eWriteNameString = ljm.eWriteNameString
         
         ljm.eReadName = self.eReadName
+        ljm.eReadNames = self.eReadNames
         ljm.eReadNameString = self.eReadNameString
         ljm.eWriteName = self.eWriteName
+        ljm.eWriteNames = self.eWriteNames
         ljm.eWriteNameString = self.eWriteNameString
         
         self.lj = sblj.AntennaLJ("","","","MOCK")
         
     def tearDown(self):
         ljm.eReadName = self.o_eReadName
+        ljm.eReadNames = self.o_eReadNames
         ljm.eReadNameString = self.o_eReadNameString
         ljm.eWriteName = self.o_eWriteName
+        ljm.eWriteNames = self.o_eWriteNames
         ljm.eWriteNameString = self.o_eWriteNameString
     
     """
@@ -658,6 +726,34 @@ class TestAntennaLabJackModule(unittest.TestCase):
         
         self.lj.disconnect()
         self.assertRaises(sblj.NoConnectionError, self.lj.getParams)
+    
+    """
+    Test - test_compiledAttenuatorsShareCodes:
+        Given a program setting VQ and HI to 10dB and VI to 3dB,
+        Then the data lines are written once per distinct code, with the 
+            latches of attenuators sharing a code raised together, and 
+            running it sets the same values as setAttenuator.
+    """
+    def test_compiledAttenuatorsShareCodes(self):
+        program = sblj.AntennaLJ.compileAttenuators({"VQ": 10, "HI": 10,
+                                                     "VI": 3})
+        
+        self.assertEqual(program.names.count("FIO0"), 2)
+        self.assertEqual(len(program.names), 6 + 4 + 6 + 2)
+        self.assertEqual(program.state, 
+                         {"allAtt": {"VQ": 10, "HI": 10, "VI": 3}})
+        self.assertRaises(KeyError, sblj.AntennaLJ.compileAttenuators,
+                          {"XX": 1})
+        
+        self.lj.runProgram(program)
+        dict = self.lj.getParams(["VQATTEN", "VIATTEN", "HQATTEN", 
+                                  "HIATTEN"])
+        self.assertEqual(dict["VQATTEN"], 10)
+        self.assertEqual(dict["VIATTEN"], 3)
+        self.assertEqual(dict["HQATTEN"], 31.5)
+        self.assertEqual(dict["HIATTEN"], 10)
+        for latch in ["CIO0", "CIO1", "CIO2", "CIO3"]:
+            self.assertEqual(self.mockLabJackValues[latch], 0)
         
         
 # Main Method
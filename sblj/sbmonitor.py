@@ -0,0 +1,341 @@
+"""
+    STARBURST Background Monitor
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import sbio
+import sbpool
+import threading
+import time
+import collections
+
+"""
+Class: Snapshot extends object
+    Description:
+        Monitor data acquired by one sweep over the LabJacks. Snapshots
+        are never modified once published, new sweeps publish new ones.
+    Arguments:
+        data: dictionary of dictionaries of monitor data keyed by device.
+        monotonic: sbio.monotonic() time at which the sweep finished.
+        timestamp: wall clock time at which the sweep finished.
+"""
+class Snapshot(object):
+    def __init__(self, data, monotonic=None, timestamp=None):
+        self.data = data
+        self.monotonic = sbio.monotonic() if monotonic is None else monotonic
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    """
+    Method: age()
+        Description:
+            Seconds since the snapshot was acquired.
+    """
+    def age(self):
+        return sbio.monotonic() - self.monotonic
+
+    """
+    Method: copy()
+        Description:
+            Returns the data with a copy of the dictionary of every device
+            so that callers can modify it freely.
+    """
+    def copy(self):
+        return dict((key, dict(value)) for key, value in self.data.items())
+
+    """
+    Method: select(fields)
+        Description:
+            Returns the data of the devices in fields restricted to the
+            parameters listed for each (and TIMESTAMP, STALE and AGE), or
+            None when the snapshot does not hold all of them.
+        Arguments:
+            fields: dictionary keyed by device of lists of parameters.
+    """
+    def select(self, fields):
+        data = {}
+        for key, names in fields.items():
+            values = self.data.get(key)
+            if values is None:
+                return None
+            try:
+                data[key] = dict((name, values[name]) for name in names)
+            except KeyError:
+                return None
+            for name in ["TIMESTAMP", "STALE", "AGE"]:
+                if name in values:
+                    data[key][name] = values[name]
+        return data
+
+"""
+Class: MonitorDaemon extends object
+    Description:
+        Background thread calling acquire at a fixed cadence. Each call is
+        scheduled period seconds after the previous one was due (on the
+        monotonic clock), so the cadence does not drift with the time a
+        sweep takes. Sweeps that overrun skip the cadence points they
+        missed. Errors raised by acquire are counted and kept in
+        lastError, and polling goes on.
+    Arguments:
+        acquire: callable doing one sweep (taking no arguments).
+        period: seconds between sweeps.
+        name: name of the thread.
+"""
+class MonitorDaemon(object):
+    def __init__(self, acquire, period=1.0, name="sbmonitor"):
+        self.acquire = acquire
+        self.period = period
+        self.name = name
+        self.sweeps = 0
+        self.errors = 0
+        self.lastError = None
+        self.thread = None
+        self.stopping = threading.Event()
+
+    def __run(self):
+        due = sbio.monotonic()
+        while not self.stopping.is_set():
+            try:
+                self.acquire()
+                self.sweeps += 1
+            except Exception as e:
+                self.errors += 1
+                self.lastError = e
+
+            due += self.period
+            now = sbio.monotonic()
+            if due < now:
+                due += (int((now - due) / self.period) + 1) * self.period
+            self.stopping.wait(due - now)
+
+    """
+    Method: start()
+        Description:
+            Starts polling. Does nothing if the daemon is already running.
+    """
+    def start(self):
+        if self.running():
+            return
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.__run, name=self.name)
+        self.thread.daemon = True
+        self.thread.start()
+
+    """
+    Method: stop(timeout)
+        Description:
+            Stops polling and waits up to timeout seconds for the sweep
+            in progress to finish.
+    """
+    def stop(self, timeout=None):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+"""
+Class: DeviceWatchdog extends object
+    Description:
+        Runs monitor reads on per-device workers with a common deadline.
+        Devices that answer in time get their new values. A device that
+        misses the deadline (or fails) gets the last values it answered
+        with instead, so that the sweep is still on time. Every device
+        dictionary gets STALE (False only for values read in this sweep)
+        and AGE (seconds since its values were read, None if it never
+        answered). A read that missed the deadline keeps running on the
+        worker of its device, and is waited for (instead of starting a
+        new one) on the next sweep, so a hung device does not pile up
+        reads and is picked up again as soon as it answers.
+    Arguments:
+        workers: sbpool.DeviceWorkers running the reads.
+        timeout: seconds from the start of a sweep to its deadline.
+    Attributes:
+        errors: last exception of every device whose last read failed.
+        misses: number of missed deadlines per device.
+"""
+class DeviceWatchdog(object):
+    def __init__(self, workers, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.lastGood = {}
+        self.errors = {}
+        self.misses = {}
+
+    # Private helper methods
+
+    @staticmethod
+    def __timed(func):
+        values = func()
+        return values, sbio.monotonic()
+
+    def __submit(self, key, func):
+        task = self.pending.pop(key, None)
+        if task is None:
+            return self.workers.submit(key, DeviceWatchdog.__timed, func)
+        if not task.done():
+            return task
+        if task.error is None:
+            self.lastGood[key] = task.value
+        return self.workers.submit(key, DeviceWatchdog.__timed, func)
+
+    """
+    Method: sweep(calls)
+        Description:
+            Runs one read per device and returns their data by the
+            deadline.
+        Arguments:
+            calls: dictionary keyed by device of callables (taking no
+                arguments) returning the dictionary of monitor data of
+                the device.
+        Returns:
+            data: dictionary of the monitor data keyed by device, with
+                STALE and AGE added for every device.
+    """
+    def sweep(self, calls):
+        with self.lock:
+            deadline = sbio.monotonic() + self.timeout
+            tasks = dict((key, self.__submit(key, func))
+                         for key, func in calls.items())
+
+            fresh = set()
+            for key, task in tasks.items():
+                try:
+                    self.lastGood[key] = task.result(
+                        max(deadline - sbio.monotonic(), 0))
+                    self.errors.pop(key, None)
+                    fresh.add(key)
+                except sbpool.DeviceTimeoutError:
+                    self.pending[key] = task
+                    self.misses[key] = self.misses.get(key, 0) + 1
+                except Exception as e:
+                    self.errors[key] = e
+
+            now = sbio.monotonic()
+            data = {}
+            for key in calls:
+                values, read = self.lastGood.get(key, ({}, None))
+                data[key] = dict(values)
+                data[key]["STALE"] = key not in fresh
+                data[key]["AGE"] = None if read is None else now - read
+            return data
+
+"""
+Class: StartBarrier extends object
+    Description:
+        Lines up the reads of a synchronized sweep. Every party waits
+        until all parties have arrived (that is until every worker is
+        done with the tasks queued before), after which all of them are
+        released at the same sbio.monotonic() time, lead seconds after
+        the last one arrived. Parties poll for the release time and busy
+        wait the rest, so that the release does not depend on how fast
+        waiting threads wake up. A party waiting longer than timeout
+        breaks the barrier, releasing itself and every later party at
+        once.
+    Arguments:
+        parties: number of parties.
+        lead: seconds from the last arrival to the release.
+        timeout: seconds a party waits for the others (None for as long
+            as it takes).
+        poll: seconds between looks at the release time.
+"""
+class StartBarrier(object):
+    def __init__(self, parties, lead=0.002, timeout=None, poll=0.0002):
+        self.parties = parties
+        self.lead = lead
+        self.timeout = timeout
+        self.poll = poll
+        self.lock = threading.Lock()
+        self.arrived = 0
+        self.release = None
+        self.broken = False
+
+    """
+    Method: wait()
+        Description:
+            Arrives at the barrier and waits for the release.
+        Returns:
+            release: sbio.monotonic() time the party was released at.
+    """
+    def wait(self):
+        arrived = sbio.monotonic()
+        with self.lock:
+            self.arrived += 1
+            if self.arrived == self.parties and self.release is None:
+                self.release = arrived + self.lead
+
+        while self.release is None:
+            if (self.timeout is not None and
+                    sbio.monotonic() - arrived >= self.timeout):
+                with self.lock:
+                    if self.release is None:
+                        self.release = sbio.monotonic()
+                        self.broken = True
+                break
+            time.sleep(self.poll)
+
+        release = self.release
+        while sbio.monotonic() < release:
+            pass
+        return release
+
+"""
+Class: SyncReport extends namedtuple
+    Description:
+        Timing of a synchronized sweep.
+    Fields:
+        release: sbio.monotonic() time the reads were released at.
+        starts: dictionary keyed by device of the sbio.monotonic() time
+            its read started.
+        ends: dictionary keyed by device of the sbio.monotonic() time its
+            read finished.
+        skew: seconds between the first and the last read to start.
+        broken: True when a device was not ready in time and the reads
+            were released without it.
+"""
+SyncReport = collections.namedtuple("SyncReport", [
+    "release", "starts", "ends", "skew", "broken"])
+
+"""
+Method: synchronizedSweep(workers, calls, lead, timeout)
+    Description:
+        Runs one read per device, all of them started at the same time on
+        their workers (refer to StartBarrier), instead of each as soon as
+        its worker is free.
+    Arguments:
+        workers: sbpool.DeviceWorkers running the reads.
+        calls: dictionary keyed by device of callables (taking no
+            arguments).
+        lead: seconds from the last worker being ready to the start.
+        timeout: seconds the ready workers wait for the others before
+            starting without them.
+    Returns:
+        results: dictionary of the results keyed by device.
+        report: SyncReport with the achieved start skew.
+    Raises:
+        sbpool.MultiDeviceError: occurs when any of the reads raised.
+"""
+def synchronizedSweep(workers, calls, lead=0.002, timeout=1.0):
+    barrier = StartBarrier(len(calls), lead, timeout)
+    starts = {}
+    ends = {}
+
+    def read(key, func):
+        barrier.wait()
+        starts[key] = sbio.monotonic()
+        try:
+            return func()
+        finally:
+            ends[key] = sbio.monotonic()
+
+    tasks = collections.OrderedDict(
+        (key, workers.submit(key, read, key, func))
+        for key, func in calls.items())
+    results = sbpool.collect(tasks)
+    skew = max(starts.values()) - min(starts.values()) if starts else 0.0
+    return results, SyncReport(barrier.release, starts, ends, skew,
+                               barrier.broken)
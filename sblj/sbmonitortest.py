@@ -0,0 +1,332 @@
+"""
+    STARBURST Background Monitor Test Suite
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import unittest
+import threading
+import time
+import sbovro
+import sbpool
+import sbsim
+import sbmonitor
+
+"""
+TestMonitorDaemon Test Group Description:
+    This group of tests makes sure that the background monitor keeps a
+    snapshot of the monitor data fresh, and that getMonitorData serves
+    callers from it without touching the LabJacks.
+
+    Test Count: 3
+"""
+class TestMonitorDaemon(unittest.TestCase):
+
+    def setUp(self):
+        sbsim.backend.reset()
+        sbsim.backend.latency = sbsim.LatencyModel()
+        self.ovroObj = sbovro.OVROStarburst("LONoise", "AntennaA",
+                                            "AntennaB", "ETHERNET", "SIM")
+
+    def tearDown(self):
+        self.ovroObj.endConnection()
+
+    def calls(self):
+        return sum(count[0] for count in sbsim.backend.stats.values())
+
+    """
+    Test - test_freshSnapshotServedFromCache:
+        Given a monitor sweeping every 50ms,
+        Then many getMonitorData(max_age=1) calls make no LJM calls of
+            their own, and the sweeps keep to the cadence.
+    """
+    def test_freshSnapshotServedFromCache(self):
+        monitor = self.ovroObj.startMonitor(0.05)
+        time.sleep(0.02)
+        self.assertTrue(self.ovroObj.snapshot is not None)
+
+        start = time.time()
+        sweeps = monitor.sweeps
+        calls = self.calls()
+        for i in range(200):
+            dict = self.ovroObj.getMonitorData(max_age=1)
+            self.assertEqual(sorted(dict.keys()), ["A", "B", "LONOISE"])
+        self.assertTrue(self.calls() - calls <=
+                        3 * (monitor.sweeps - sweeps + 1))
+
+        time.sleep(0.3)
+        self.ovroObj.stopMonitor()
+        self.assertFalse(monitor.running())
+        elapsed = time.time() - start
+        self.assertTrue(abs(monitor.sweeps - (elapsed / 0.05 + 1)) <= 2)
+        self.assertEqual(monitor.errors, 0)
+
+    """
+    Test - test_staleSnapshotRefreshed:
+        Given no monitor and a snapshot older than max_age,
+        Then getMonitorData sweeps the LabJacks and publishes a new
+            snapshot, while a fresh enough one is reused.
+    """
+    def test_staleSnapshotRefreshed(self):
+        self.ovroObj.getMonitorData()
+        first = self.ovroObj.snapshot
+        self.ovroObj.getMonitorData(max_age=10)
+        self.assertTrue(self.ovroObj.snapshot is first)
+
+        time.sleep(0.02)
+        calls = self.calls()
+        self.ovroObj.getMonitorData(max_age=0.01)
+        self.assertTrue(self.ovroObj.snapshot is not first)
+        self.assertEqual(self.calls() - calls, 3)
+
+    """
+    Test - test_copiesAndErrors:
+        Given a caller modifying the data it got, and a sweep that fails,
+        Then the snapshot is unchanged and the daemon counts the error
+            and keeps polling.
+    """
+    def test_copiesAndErrors(self):
+        dict = self.ovroObj.getMonitorData()
+        dict["A"]["VQATTEN"] = -1
+        self.assertEqual(self.ovroObj.getMonitorData(max_age=10)["A"]
+                         ["VQATTEN"], 31.5)
+
+        def fail():
+            raise IOError("lost")
+        monitor = sbmonitor.MonitorDaemon(fail, 0.01)
+        monitor.start()
+        time.sleep(0.05)
+        monitor.stop()
+        self.assertTrue(monitor.errors >= 2)
+        self.assertTrue(isinstance(monitor.lastError, IOError))
+
+"""
+TestDeviceWatchdog Test Group Description:
+    This group of tests makes sure that a hung or failing LabJack does not
+    delay sweeps of the others, and that its data is flagged as stale
+    until it answers again.
+
+    Test Count: 3
+"""
+class TestDeviceWatchdog(unittest.TestCase):
+
+    def setUp(self):
+        self.workers = sbpool.DeviceWorkers("test")
+        self.release = threading.Event()
+        self.reads = 0
+        self.failing = False
+
+    def tearDown(self):
+        self.release.set()
+        self.workers.shutdown()
+
+    def hung(self):
+        self.reads += 1
+        if self.failing:
+            raise IOError("lost")
+        self.release.wait(5)
+        return {"VALUE": self.reads}
+
+    """
+    Test - test_hungDeviceStale:
+        Given a device that hangs until released, then fails,
+        Then sweeps keep to the deadline with the device flagged stale,
+            the hung read is not repeated, and its values are used from
+            the sweep after it answers on.
+    """
+    def test_hungDeviceStale(self):
+        watchdog = sbmonitor.DeviceWatchdog(self.workers, 0.05)
+        calls = {"A": lambda: {"VALUE": 1}, "B": self.hung}
+
+        for i in range(2):
+            start = time.time()
+            data = watchdog.sweep(calls)
+            self.assertTrue(time.time() - start < 0.1)
+            self.assertEqual(data["A"]["VALUE"], 1)
+            self.assertFalse(data["A"]["STALE"])
+            self.assertEqual(data["B"], {"STALE": True, "AGE": None})
+        self.assertEqual(self.reads, 1)
+        self.assertEqual(watchdog.misses, {"B": 2})
+
+        self.release.set()
+        watchdog.pending["B"].result(1)
+        data = watchdog.sweep(calls)
+        self.assertEqual(data["B"]["VALUE"], 2)
+        self.assertFalse(data["B"]["STALE"])
+
+        self.failing = True
+        time.sleep(0.02)
+        data = watchdog.sweep(calls)
+        self.assertEqual(data["B"]["VALUE"], 2)
+        self.assertTrue(data["B"]["STALE"])
+        self.assertTrue(data["B"]["AGE"] >= 0.02)
+        self.assertTrue(isinstance(watchdog.errors["B"], IOError))
+
+    """
+    Test - test_slowLabJackStale:
+        Given a monitor with a 50ms device timeout and an antenna whose
+            LabJack turns very slow,
+        Then the snapshots stay on time with the last values of that
+            antenna flagged stale and the others fresh.
+    """
+    def test_slowLabJackStale(self):
+        sbsim.backend.reset()
+        ovroObj = sbovro.OVROStarburst("LONoise", "AntennaA", "AntennaB",
+                                       "ETHERNET", "SIM")
+        try:
+            ovroObj.setDeviceTimeout(0.05)
+            dict = ovroObj.getMonitorData()
+            self.assertFalse(dict["B"]["STALE"])
+
+            sbsim.backend.devices["AntennaB"].latency = \
+                sbsim.LatencyModel(0.3)
+            monitor = ovroObj.startMonitor(0.1)
+            time.sleep(0.25)
+            ovroObj.stopMonitor()
+
+            dict = ovroObj.getMonitorData(max_age=1)
+            self.assertTrue(ovroObj.snapshot.age() < 0.15)
+            self.assertTrue(dict["B"]["STALE"])
+            self.assertEqual(dict["B"]["NAME"], "AntennaB")
+            self.assertFalse(dict["A"]["STALE"])
+            self.assertFalse(dict["LONOISE"]["STALE"])
+            self.assertEqual(monitor.errors, 0)
+        finally:
+            ovroObj.endConnection()
+
+    """
+    Test - test_subsetReadStale:
+        Given a 50ms device timeout and an antenna whose LabJack turns
+            very slow,
+        Then reads of a subset of the fields stay on time with the last
+            values of that antenna flagged stale, also when the subset
+            selects every parameter of a device with None.
+    """
+    def test_subsetReadStale(self):
+        sbsim.backend.reset()
+        ovroObj = sbovro.OVROStarburst("LONoise", "AntennaA", "AntennaB",
+                                       "ETHERNET", "SIM")
+        fields = {"A": ["VQPOW"], "B": ["VQPOW"]}
+        try:
+            ovroObj.setDeviceTimeout(0.05)
+            dict = ovroObj.getMonitorData(fields=fields)
+            self.assertFalse(dict["B"]["STALE"])
+            power = dict["B"]["VQPOW"]
+
+            sbsim.backend.devices["AntennaB"].latency = \
+                sbsim.LatencyModel(0.3)
+            for i in range(2):
+                start = time.time()
+                dict = ovroObj.getMonitorData(fields=fields)
+                self.assertTrue(time.time() - start < 0.1)
+                self.assertTrue(dict["B"]["STALE"])
+                self.assertEqual(dict["B"]["VQPOW"], power)
+                self.assertFalse(dict["A"]["STALE"])
+
+            dict = ovroObj.getMonitorData(fields={"A": None, "B": ["VQPOW"]})
+            self.assertFalse(dict["A"]["STALE"])
+            self.assertTrue("HIATTEN" in dict["A"])
+        finally:
+            ovroObj.endConnection()
+
+"""
+TestSynchronizedSweep Test Group Description:
+    This group of tests makes sure that synchronized sweeps start the
+    reads of all devices together even when some workers are busy, and
+    report the skew they achieved.
+
+    Test Count: 3
+"""
+class TestSynchronizedSweep(unittest.TestCase):
+
+    def setUp(self):
+        sbsim.backend.reset()
+        sbsim.backend.latency = sbsim.LatencyModel(0.002)
+        self.ovroObj = sbovro.OVROStarburst("LONoise", "AntennaA",
+                                            "AntennaB", "ETHERNET", "SIM")
+
+    def tearDown(self):
+        self.ovroObj.endConnection()
+        sbsim.backend.latency = sbsim.LatencyModel()
+
+    """
+    Test - test_busyWorkerWaitedFor:
+        Given that the worker of antenna B is busy for 30ms,
+        Then the reads of all devices start within 2ms of each other,
+            after B is free, and the full read becomes the snapshot.
+    """
+    def test_busyWorkerWaitedFor(self):
+        start = sbovro.sbio.monotonic()
+        self.ovroObj.workers.submit("B", time.sleep, 0.03)
+        data, report = self.ovroObj.getSynchronizedData()
+
+        self.assertEqual(sorted(data.keys()), ["A", "B", "LONOISE"])
+        self.assertEqual(data["B"]["NAME"], "AntennaB")
+        self.assertEqual(sorted(report.starts.keys()), ["A", "B", "LONOISE"])
+        self.assertTrue(report.skew < 0.002)
+        self.assertTrue(min(report.starts.values()) >= start + 0.03)
+        self.assertTrue(min(report.starts.values()) >= report.release)
+        for key in report.starts:
+            self.assertTrue(report.ends[key] > report.starts[key])
+        self.assertFalse(report.broken)
+        self.assertEqual(self.ovroObj.snapshot.data["A"]["NAME"],
+                         "AntennaA")
+
+    """
+    Test - test_brokenBarrier:
+        Given a subset of the antenna powers, and a worker busy for longer
+            than the barrier timeout,
+        Then only the subset is read, and the ready devices read without
+            the busy one and the report shows the barrier broken.
+    """
+    def test_brokenBarrier(self):
+        fields = {"A": ["VQPOW"], "B": ["VQPOW"]}
+        data, report = self.ovroObj.getSynchronizedData(fields)
+        self.assertEqual(sorted(data["A"].keys()), ["TIMESTAMP", "VQPOW"])
+        self.assertFalse(report.broken)
+
+        self.ovroObj.workers.submit("B", time.sleep, 0.1)
+        start = sbovro.sbio.monotonic()
+        data, report = self.ovroObj.getSynchronizedData(fields,
+                                                        timeout=0.02)
+        self.assertTrue(report.broken)
+        self.assertTrue(report.starts["A"] - start < 0.05)
+        self.assertTrue(report.skew >= 0.05)
+
+    """
+    Test - test_fullReadRecorded:
+        Given a historian, and then a snapshot taken after the reads,
+        Then a full synchronized read is appended to the historian and
+            becomes the snapshot, and one finishing before the later
+            snapshot neither replaces it nor is recorded.
+    """
+    def test_fullReadRecorded(self):
+        appended = []
+
+        class Recorder(object):
+            def append(self, data, timestamp):
+                appended.append(data)
+
+        self.ovroObj.setHistorian(Recorder())
+        data, report = self.ovroObj.getSynchronizedData()
+        self.assertEqual(len(appended), 1)
+        self.assertEqual(appended[0]["A"]["NAME"], "AntennaA")
+        self.assertTrue(self.ovroObj.snapshot.data is appended[0])
+
+        later = sbmonitor.Snapshot({}, sbovro.sbio.monotonic() + 60)
+        self.ovroObj.snapshot = later
+        data, report = self.ovroObj.getSynchronizedData()
+        self.assertEqual(data["A"]["NAME"], "AntennaA")
+        self.assertTrue(self.ovroObj.snapshot is later)
+        self.assertEqual(len(appended), 1)
+
+
+# Main Method
+if __name__ == '__main__':
+    testGroups = [TestMonitorDaemon, TestDeviceWatchdog,
+                  TestSynchronizedSweep]
+    for tG in testGroups:
+        print "\nTesting: " + str(tG.__name__)
+        suite = unittest.TestLoader().loadTestsFromTestCase(
+            tG)
+        unittest.TextTestRunner(verbosity=2).run(suite)
@@ -5,8 +5,18 @@
 """
 
 import sblj
+import sbio
+import sbpool
+import sbmonitor
+import sbbands
+import sbschedule
+import sbcal
+import sbyfactor
+import sbsweep
 import copy
-import pickle
+import time
+import threading
+import collections
 
 """
 Class: InvalidBandError extends Exception
@@ -18,7 +28,39 @@ class InvalidBandError(Exception):
         self.band = band
         
     def __str__(self):
-        return("Band " + str(band) + " is unavailable.")
+        return("Band " + str(self.band) + " is unavailable.")
+
+"""
+Class: BandProgram extends namedtuple
+    Description:
+        Band setting compiled into the register writes that apply it.
+    Fields:
+        lo: sblj.RegisterProgram setting the LO frequency on the LO/Noise 
+            LabJack.
+        antenna: sblj.RegisterProgram setting the attenuators of an 
+            antenna LabJack (the same for every antenna).
+"""
+BandProgram = collections.namedtuple("BandProgram", ["lo", "antenna"])
+
+"""
+Method: compileBands(bands)
+    Description:
+        Compiles every band of a band table (as stored by bands.py) into a 
+        BandProgram.
+    Returns:
+        programs: dictionary keyed by band of the BandProgram, or of the 
+            error raised compiling it when the band setting is invalid.
+"""
+def compileBands(bands):
+    programs = {}
+    for band, ref in bands.items():
+        try:
+            programs[band] = BandProgram(
+                sblj.LONoiseLJ.compileLOFreq(ref["LOFREQ"]),
+                sblj.AntennaLJ.compileAttenuators(ref["ATTEN"]))
+        except (sblj.InvalidLOFreqError, KeyError, TypeError) as e:
+            programs[band] = e
+    return programs
 
 """
 Class: OVROStarburst extends object
@@ -32,6 +74,19 @@ Class: OVROStarburst extends object
             first antenna.
         antennaB: identifier string for the LabJack corresponding to the 
             second antenna.
+        connectionType: connection type passed to every LabJack. (Refer
+            to StarburstLJ in sblj.py.)
+        deviceType: device type passed to every LabJack. (Refer to 
+            StarburstLJ in sblj.py, "SIM" selects simulated LabJacks.)
+        antennas: further antennas as a dictionary (or list of pairs) of
+            identifier strings keyed by antenna key. antennaA and antennaB
+            are registered under the keys "A" and "B".
+    Attributes:
+        ljAntennas: ordered dictionary of the AntennaLJ objects keyed by
+            antenna key. (ljA and ljB remain available for "A" and "B".)
+        Methods taking a list of antenna keys apply to every registered 
+            antenna when it is omitted, with one batched LJM call per 
+            antenna where possible, running on all antennas concurrently.
     Raises:
         UnknownDeviceError: occurs when device description such as 
                 identifier, deviceType, or connectionType, do not point to a
@@ -41,121 +96,709 @@ class OVROStarburst(object):
 
     # Default dictionary for band levels.
 
-    bandDictionary = {1: {"LOFREQ": 0,
-                          "ATTEN": {"VQ": 10, "VI": 10, "HQ": 12, "HI": 12}, 
-                          "DESCR": "Default band" } }
+    bandDictionary = sbbands.DEFAULT_BANDS
+    
+    # Seconds the LO synthesizer takes to lock after a frequency change 
+    # and the attenuators take to settle after a change. Lock times of 
+    # particular transitions can be set in the loSettleTimes attribute, 
+    # keyed by (old LO frequency, new LO frequency).
+    
+    loSettle = 0.05
+    attSettle = 0.001
                                     
-    def __init__(self, noiseLOID, antennaA=None, antennaB=None):
+    def __init__(self, noiseLOID, antennaA=None, antennaB=None,
+                 connectionType="ETHERNET", deviceType="T7", antennas=None):
         self.noiseLOID = noiseLOID
         self.antennaA = antennaA
         self.antennaB = antennaB
+        self.connectionType = connectionType
+        self.deviceType = deviceType
+        
+        # Each LabJack gets its own persistent worker so that operations
+        # spanning several of them take as long as the slowest one.
+        self.workers = sbpool.DeviceWorkers("ovro")
+        
+        # Latest monitor data (sbmonitor.Snapshot), replaced as a whole by
+        # every sweep, and the daemon keeping it fresh when started.
+        self.snapshot = None
+        self.monitor = None
+        
+        # Per-device deadline of full sweeps (refer to setDeviceTimeout),
+        # the history they are appended to (refer to setHistorian) and 
+        # the shared memory they are published to (refer to setPublisher).
+        self.watchdog = None
+        self.subsetWatchdogs = {}
+        self.historian = None
+        self.publisher = None
+        
+        # Full sweeps are recorded to the historian and the publisher one
+        # at a time. Their errors are counted here instead of failing the
+        # read.
+        self.recordLock = threading.Lock()
+        self.recordErrors = 0
+        self.lastRecordError = None
+        
+        # Band timetable started by scheduleBands.
+        self.scheduler = None
+        
+        # LO frequency last written (None when unknown), per-transition 
+        # lock times, and the sbio.monotonic() time by which the last band
+        # switch has settled (refer to setToBand).
+        self.loFreq = None
+        self.loSettleTimes = {}
+        self.bandReady = 0.0
+        
+        self.ljLONoise = sblj.LONoiseLJ(self.noiseLOID, connectionType,
+                                        deviceType)
+        self.ljAntennas = collections.OrderedDict()
         
-        self.ljLONoise = sblj.LONoiseLJ(self.noiseLOID)
+        identifiers = collections.OrderedDict()
         if antennaA is not None:
-            self.ljA = sblj.AntennaLJ(self.antennaA)
+            identifiers["A"] = antennaA
         if antennaB is not None:
-            self.ljB = sblj.AntennaLJ(self.antennaB)
+            identifiers["B"] = antennaB
+        if antennas is not None:
+            identifiers.update(collections.OrderedDict(antennas))
+        
+        # Antennas are connected (and their attenuators initialized) 
+        # concurrently. The error of the first antenna that fails is 
+        # raised as is.
+        try:
+            created = self.workers.fanOut(collections.OrderedDict(
+                (key, lambda identifier=identifier: sblj.AntennaLJ(
+                    identifier, connectionType, deviceType))
+                for key, identifier in identifiers.items()))
+        except sbpool.MultiDeviceError as e:
+            for lj in e.results.values():
+                lj.disconnect()
+            self.ljLONoise.disconnect()
+            self.workers.shutdown()
+            raise e.errors[[key for key in identifiers 
+                            if key in e.errors][0]]
+        self.ljAntennas.update(created)
             
+        # Band table of the working directory, reloaded (and recompiled)
+        # by setToBand whenever the file changes.
+        self.bandStore = sbbands.BandStore()
+        self.setBands(self.bandStore.load())
+    
+    """
+    Method: setBands(bands)
+        Description:
+            Replaces the band table (keyed by band, as stored by bands.py)
+            and compiles every band into the register writes applying it, 
+            so that setToBand only has to look them up. Call this after 
+            changing entries of the bands attribute.
+    """
+    def setBands(self, bands):
+        programs = compileBands(bands)
+        self.bands = bands
+        self.programs = programs
+    
+    """
+    Method: reloadBands()
+        Description:
+            Reloads the band table if its file changed since it was last
+            loaded (looking at the file at most every 
+            bandStore.checkInterval seconds). A file that cannot be read 
+            (e.g. while being written by another tool) leaves the current 
+            table in place until the next look.
+        Returns:
+            reloaded: True when a new table was loaded.
+    """
+    def reloadBands(self):
+        if not self.bandStore.changed():
+            return False
+        try:
+            bands = self.bandStore.load()
+        except (IOError, ValueError, AttributeError):
+            return False
+        self.setBands(bands)
+        return True
+    
+    # Antennas A and B under their original attribute names.
+    
+    @property
+    def ljA(self):
         try:
-            with open(".bands", "r") as file:
-                self.bands = pickle.load(file)
-        except IOError:
-            with open(".bands", "w") as file:
-                pickle.dump(OVROStarburst.bandDictionary, file)
-            self.bands = OVROStarburst.bandDictionary
+            return self.ljAntennas["A"]
+        except KeyError:
+            raise AttributeError("ljA")
+    
+    @property
+    def ljB(self):
+        try:
+            return self.ljAntennas["B"]
+        except KeyError:
+            raise AttributeError("ljB")
     
     """
-    Method: getMonitorData()
+    Method: addAntenna(key, identifier)
+        Description:
+            Connects to the LabJack of another antenna and registers it 
+            under key.
+        Arguments:
+            key: key of the antenna in the monitor data and antennas lists.
+            identifier: identifier string for the LabJack of the antenna.
+        Returns:
+            lj: the new AntennaLJ.
+        Raises:
+            ValueError: occurs when key is already in use.
+            UnknownDeviceError: occurs when the LabJack cannot be found.
+    """
+    def addAntenna(self, key, identifier):
+        if key in self.ljAntennas or key == "LONOISE":
+            raise ValueError("Antenna key " + str(key) + " is in use.")
+        
+        lj = sblj.AntennaLJ(identifier, self.connectionType, 
+                            self.deviceType)
+        self.ljAntennas[key] = lj
+        return lj
+    
+    """
+    Method: removeAntenna(key)
+        Description:
+            Disconnects the LabJack of an antenna and removes it from the 
+            system.
+        Raises:
+            KeyError: occurs when key does not match any antenna.
+    """
+    def removeAntenna(self, key):
+        lj = self.ljAntennas.pop(key)
+        lj.disconnect()
+    
+    """
+    Method: devices()
+        Description:
+            Returns the LabJacks of the system as a dictionary keyed like
+            the monitor data ("LONOISE" and the antenna keys). Useful 
+            together with sbio.measureIO to find the I/O cost of an 
+            operation.
+    """
+    def devices(self):
+        devices = collections.OrderedDict([("LONOISE", self.ljLONoise)])
+        devices.update(self.ljAntennas)
+        return devices
+    
+    # Private helper methods
+    
+    def __antennas(self, antennas=None):
+        if antennas is None:
+            return list(self.ljAntennas.items())
+        return [(key, self.ljAntennas[key]) for key in antennas]
+    
+    """
+    Method: getMonitorData(max_age, fields)
         Description:
             Query to the OVRO LabJacks to dump all data concerning the 
             system. The data is returned as a dictionary of dictionaries
             where the keys are "LONOISE" for the LO Noise module and 
-            "A" and "B" for the corresponding antennas (A and B). The 
+            the antenna keys ("A", "B", ...) for the antennas. The 
             dictionaries inside are keyed by the parameters described
             under the sblj.py for LONoiseLJ and AntennaLJ.
+        Parameters:
+            max_age: when given, the latest snapshot is returned without 
+                touching the LabJacks if it is at most max_age seconds 
+                old. (Refer to startMonitor for keeping it fresh.) A new 
+                sweep is made otherwise, and becomes the latest snapshot.
+            fields: dictionary keyed by device ("LONOISE" or an antenna
+                key) of the lists of parameters to read from it. Only the
+                devices and registers needed are read and devices not in
+                fields are left out. (gen_starburst_sf.starburst_fields 
+                gives the parameters packed into the stateframe.) Reads
+                of a subset do not replace the latest snapshot, but are 
+                served from it when it is fresh enough.
         Raises:
-            NoConnectionError: occurs when there is no connection to the 
-                at least one of the LabJack units.
+            sbpool.MultiDeviceError: occurs when at least one of the 
+                LabJack units fails (e.g. with NoConnectionError). Holds the
+                error of each failed unit and the results of the others.
+                (Reads report failed units as stale instead once a device
+                timeout is set, refer to setDeviceTimeout.)
+            KeyError: occurs when a key in fields does not match any 
+                device.
     """
-    def getMonitorData(self):
-        varDump = {}
-        varDump["LONOISE"] = self.ljLONoise.getParams()
+    def getMonitorData(self, max_age=None, fields=None):
+        if max_age is not None:
+            snapshot = self.snapshot
+            if snapshot is not None and snapshot.age() <= max_age:
+                if fields is None:
+                    return snapshot.copy()
+                data = snapshot.select(fields)
+                if data is not None:
+                    return data
         
-        if self.antennaA is not None:
-            varDump["A"] = self.ljA.getParams()
-        if self.antennaB is not None:
-            varDump["B"] = self.ljB.getParams()
+        if fields is not None:
+            return self.__read(fields)
+        return self.__sweep().copy()
+    
+    def __readCalls(self, fields=None):
+        devices = self.devices()
+        if fields is None:
+            fields = dict((key, None) for key in devices)
         
-        return varDump
+        calls = {}
+        for key, names in fields.items():
+            calls[key] = (lambda lj=devices[key], names=names: 
+                          lj.getParams(None if names is None 
+                                       else list(names)))
+        return calls
+    
+    def __read(self, fields=None):
+        calls = self.__readCalls(fields)
+        watchdog = self.watchdog
+        if watchdog is None:
+            return dict(self.workers.fanOut(calls))
+        if fields is not None:
+            # Last good values are kept per selection of fields (None 
+            # selecting every parameter of a device).
+            selection = tuple(sorted(
+                (key, None if names is None else tuple(names)) 
+                for key, names in fields.items()))
+            timeout = watchdog.timeout
+            watchdog = self.subsetWatchdogs.get(selection)
+            if watchdog is None:
+                watchdog = self.subsetWatchdogs.setdefault(
+                    selection, sbmonitor.DeviceWatchdog(self.workers, 
+                                                        timeout))
+        return watchdog.sweep(calls)
+    
+    def __sweep(self):
+        return self.__keep(sbmonitor.Snapshot(self.__read()))
+    
+    def __keep(self, snapshot):
+        # Full reads become the latest snapshot and are recorded.
+        with self.recordLock:
+            # A sweep finishing after a later one (the monitor and callers
+            # sweep concurrently) is returned but not recorded.
+            current = self.snapshot
+            if current is not None and current.monotonic > snapshot.monotonic:
+                return snapshot
+            self.snapshot = snapshot
+            if self.historian is not None:
+                self.__record(self.historian.append, snapshot)
+            if self.publisher is not None:
+                self.__record(self.publisher.publish, snapshot)
+        return snapshot
+    
+    def __record(self, func, snapshot):
+        try:
+            func(snapshot.data, snapshot.timestamp)
+        except Exception as e:
+            self.recordErrors += 1
+            self.lastRecordError = e
+    
+    """
+    Method: setHistorian(historian)
+        Description:
+            Appends every full sweep (getMonitorData and 
+            getSynchronizedData without fields, and the sweeps of the 
+            monitor started by startMonitor) to a 
+            historian, or stops when historian is None. Sweeps are 
+            appended one at a time, and errors appending are counted in 
+            the recordErrors attribute (with the last one kept in 
+            lastRecordError) instead of failing the sweep.
+        Parameters:
+            historian: sbhistorian.Historian (or any object with an 
+                append(data, timestamp) method), or None.
+    """
+    def setHistorian(self, historian):
+        self.historian = historian
+    
+    """
+    Method: setPublisher(publisher)
+        Description:
+            Publishes every full sweep to local processes through shared
+            memory, or stops when publisher is None. (Refer to 
+            SnapshotWriter in sbshm.py.) Errors are counted as for 
+            setHistorian.
+        Parameters:
+            publisher: sbshm.SnapshotWriter, or None.
+    """
+    def setPublisher(self, publisher):
+        self.publisher = publisher
+    
+    """
+    Method: getSynchronizedData(fields, lead, timeout)
+        Description:
+            Reads the LabJacks like getMonitorData, but with the reads of
+            all of them started at the same time on their workers, so
+            that values compared across devices (e.g. the IF powers of
+            different antennas) are sampled close together. The workers
+            first finish whatever is queued on them, then all reads are
+            released lead seconds after the last one is ready. The
+            achieved skew between the starts of the reads is reported.
+            (Refer to synchronizedSweep in sbmonitor.py.) Full reads
+            become the latest snapshot (unless a later one has been 
+            taken meanwhile) and are recorded like other full sweeps 
+            (refer to setHistorian and setPublisher).
+        Parameters:
+            fields: dictionary keyed by device of the lists of parameters
+                to read from it (as for getMonitorData, all parameters of
+                all devices when omitted).
+            lead: seconds from the last LabJack being ready to the reads.
+            timeout: seconds the ready LabJacks wait for the others before
+                reading without them (the report then shows the barrier
+                as broken).
+        Returns:
+            data: dictionary of dictionaries of the parameters read keyed
+                by device (as returned by getMonitorData).
+            report: sbmonitor.SyncReport with the start and end times of
+                every read and their skew in seconds.
+        Raises:
+            sbpool.MultiDeviceError: occurs when at least one of the
+                LabJack units fails (e.g. with NoConnectionError).
+            KeyError: occurs when a key in fields does not match any
+                device.
+    """
+    def getSynchronizedData(self, fields=None, lead=0.002, timeout=1.0):
+        data, report = sbmonitor.synchronizedSweep(
+            self.workers, self.__readCalls(fields), lead, timeout)
+        data = dict(data)
+        if fields is None:
+            data = self.__keep(sbmonitor.Snapshot(data)).copy()
+        return data, report
+    
+    """
+    Method: setDeviceTimeout(timeout)
+        Description:
+            Gives monitor reads (getMonitorData, with or without fields, 
+            and the monitor started by startMonitor) a deadline of timeout
+            seconds.
+            LabJacks that miss it, or fail, are reported with their last 
+            good values instead of holding up (or failing) the sweep, and 
+            are read again in the background. Every device in the monitor
+            data then has STALE (True for values not read in this sweep) 
+            and AGE (seconds since they were read). (Refer to 
+            DeviceWatchdog in sbmonitor.py.) None restores sweeps waiting 
+            for every LabJack.
+        Returns:
+            watchdog: the sbmonitor.DeviceWatchdog (with the errors and 
+                missed deadlines per device), or None.
+    """
+    def setDeviceTimeout(self, timeout):
+        self.subsetWatchdogs = {}
+        if timeout is None:
+            self.watchdog = None
+        else:
+            self.watchdog = sbmonitor.DeviceWatchdog(self.workers, timeout)
+        return self.watchdog
+    
+    """
+    Method: startMonitor(period, timeout)
+        Description:
+            Starts a background thread sweeping the LabJacks every period
+            seconds into the latest snapshot, so that any number of 
+            getMonitorData(max_age) callers share the same sweeps. When 
+            timeout is given, it becomes the per-device deadline of the 
+            sweeps (refer to setDeviceTimeout), so that a hung LabJack 
+            does not delay the snapshots of the others.
+        Returns:
+            monitor: the sbmonitor.MonitorDaemon (with its sweep and error
+                counts).
+    """
+    def startMonitor(self, period=1.0, timeout=None):
+        if timeout is not None:
+            self.setDeviceTimeout(timeout)
+        if self.monitor is None:
+            self.monitor = sbmonitor.MonitorDaemon(self.__sweep, period,
+                                                   "ovro-monitor")
+        self.monitor.period = period
+        self.monitor.start()
+        return self.monitor
+    
+    """
+    Method: stopMonitor()
+        Description:
+            Stops the background thread started by startMonitor.
+    """
+    def stopMonitor(self):
+        if self.monitor is not None:
+            self.monitor.stop()
     
     """
     Method: selectNoiseSource()
         Description:
             Turns on the Noise Source and switches all polarizations in all 
             antennas to the noise source.
+        Parameters:
+            dryRun: when True, nothing is sent to the LabJacks and the
+                planned register operations are returned instead as a 
+                list of sbio.PlannedCall.
         Raises:
-            NoConnectionError: occurs when there is no connection to the 
-                at least one of the LabJack units.
+            sbpool.MultiDeviceError: occurs when at least one of the 
+                LabJack units fails (e.g. with NoConnectionError). Holds the
+                error of each failed unit and the results of the others.
     """
-    def selectNoiseSource(self):
-        self.ljLONoise.setNoiseSourceOn()
-        
-        if self.antennaA is not None:
-            self.ljA.selectNoiseSource()
-        if self.antennaB is not None:
-            self.ljB.selectNoiseSource()
+    def selectNoiseSource(self, dryRun=False):
+        if dryRun:
+            return self.__planSource(True)
+            
+        calls = {"LONOISE": self.ljLONoise.setNoiseSourceOn}
+        for key, lj in self.__antennas():
+            calls[key] = lj.selectNoiseSource
+        self.workers.fanOut(calls)
+    
+    # Plans are built from the compiled register writes, without touching
+    # the LabJacks (which other threads may be using meanwhile).
+    
+    def __planSource(self, on):
+        return sbio.planPrograms(
+            [("LONOISE", sblj.LONoiseLJ.compileNoiseSource(on))] + 
+            [(key, sblj.AntennaLJ.compileSource(["H", "V"], int(on)))
+             for key, lj in self.__antennas()])
     
     """
     Method: selectRFSource()
         Description:
             Turns off the Noise source and switches all polarizations in all 
             antennas to the RF signal source.
+        Parameters:
+            dryRun: when True, returns the planned register operations
+                instead of running them. (Refer to selectNoiseSource.)
         Raises:
-            NoConnectionError: occurs when there is no connection to the 
-                at least one of the LabJack units.
+            sbpool.MultiDeviceError: occurs when at least one of the 
+                LabJack units fails (e.g. with NoConnectionError). Holds the
+                error of each failed unit and the results of the others.
     """
-    def selectRFSource(self):
-        self.ljLONoise.setNoiseSourceOff()
-        
-        if self.antennaA is not None:
-            self.ljA.selectRFSource()
-        if self.antennaB is not None:
-            self.ljB.selectRFSource()
+    def selectRFSource(self, dryRun=False):
+        if dryRun:
+            return self.__planSource(False)
+            
+        calls = {"LONOISE": self.ljLONoise.setNoiseSourceOff}
+        for key, lj in self.__antennas():
+            calls[key] = lj.selectRFSource
+        self.workers.fanOut(calls)
+    
+    """
+    Method: calibrate(schedule, antennas)
+        Description:
+            Runs a noise calibration cycle: switches the antennas to the 
+            noise source path and measures their IF powers with the noise
+            source on and off, then switches them back to the sky. The 
+            switches and measurements span all LabJacks concurrently, and
+            the time off the sky is kept to the settle delays and the 
+            measurements. (Refer to CalibrationCycle in sbcal.py.)
+        Parameters:
+            schedule: list of sbcal.CalibrationStep (sbcal.DEFAULT_SCHEDULE
+                when omitted).
+            antennas: list of keys to antennas to calibrate (all antennas
+                when omitted).
+        Returns:
+            result: sbcal.CalibrationResult with the timestamped power sets
+                (on() and off()) and the time spent off the sky.
+        Raises:
+            sbpool.MultiDeviceError: occurs when at least one of the 
+                LabJack units fails (e.g. with NoConnectionError). The 
+                antennas are still switched back to the sky.
+            KeyError: occurs when a key in antennas does not match to any 
+                AntennaLJ objects.
+    """
+    def calibrate(self, schedule=None, antennas=None):
+        return sbcal.CalibrationCycle(self, schedule, antennas).run()
+    
+    """
+    Method: measureYFactor(noiseTemp, antennas, mode, freq, duty, 
+                           duration)
+        Description:
+            Measures the Y-factor and system temperature of every 
+            polarization/component of the antennas by streaming their IF
+            powers while the noise source is switched at freq, in 
+            hardware (mode sbyfactor.HARDWARE, refer to 
+            LONoiseLJ.startNoisePWM) or by the host (sbyfactor.HOST). 
+            (Refer to YFactorEngine in sbyfactor.py.)
+        Parameters:
+            noiseTemp: excess noise temperature of the noise source in K.
+            antennas: list of keys to antennas to measure (all antennas 
+                when omitted).
+            duration: seconds of samples taken.
+        Returns:
+            results: dictionary keyed by antenna of dictionaries keyed by
+                polarization/component with Y, TSYS (K), ON and OFF (dBm)
+                and SAMPLES.
+        Raises:
+            sbpool.MultiDeviceError: occurs when at least one of the 
+                antenna LabJacks fails. The antennas are still switched 
+                back to the sky.
+            KeyError: occurs when a key in antennas does not match to any 
+                AntennaLJ objects.
+    """
+    def measureYFactor(self, noiseTemp, antennas=None, 
+                       mode=sbyfactor.HARDWARE, freq=10.0, duty=0.5, 
+                       duration=1.0):
+        return sbyfactor.YFactorEngine(self, noiseTemp, antennas, mode, 
+                                       freq, duty, 
+                                       duration=duration).run()
+    
+    """
+    Method: sweepAttenuators(antennas, levels, settle, oversample)
+        Description:
+            Measures the gain curve of the attenuators of the antennas,
+            all antennas in parallel. Every step is one eWriteNames call
+            setting all four attenuators and, after settle seconds, one
+            eReadNames call of their IF power detectors. The attenuators
+            are set back to their previous levels afterwards. (Refer to
+            sweepAttenuators in sbsweep.py.)
+        Parameters:
+            antennas: list of keys to antennas to sweep (all antennas
+                when omitted).
+            levels: attenuations to step through in dB (all 64 codes
+                when omitted).
+            settle: seconds waited between setting and reading.
+            oversample: readings averaged per detector and step.
+        Returns:
+            sweeps: dictionary keyed by antenna of dictionaries of NumPy
+                arrays with ATTEN and the powers in dBm keyed by
+                attenuator (and their standard deviations keyed by
+                attenuator + "_STD").
+        Raises:
+            sbpool.MultiDeviceError: occurs when at least one of the
+                LabJack units fails (e.g. with NoConnectionError). Holds the
+                error of each failed unit and the results of the others.
+            KeyError: occurs when a key in antennas does not match to any
+                AntennaLJ objects.
+    """
+    def sweepAttenuators(self, antennas=None, levels=None, settle=0.005,
+                         oversample=1):
+        calls = {}
+        for key, lj in self.__antennas(antennas):
+            calls[key] = (lambda lj=lj: sbsweep.sweepAttenuators(
+                lj, levels, settle, oversample))
+        return self.workers.fanOut(calls)
     
     """
     Method: setToBand(band, antennas)
         Description:
             Takes a band setting that is predefined and sets the LO frequency
-            and attenuator settings.
+            and attenuator settings. Bands are precompiled (refer to 
+            setBands), so this sends one eWriteNames call per LabJack. 
+            Changes to the band file are picked up within a second (refer 
+            to reloadBands). The LO write is sent first and the antennas 
+            are written while the LO locks. Nothing is waited for: the 
+            time by which the new band has settled is returned (and kept 
+            in the bandReady attribute, refer to waitForBand). It allows 
+            loSettle (or the loSettleTimes entry of the transition) after 
+            the LO write when the LO frequency changes, and attSettle after
+            the write of each antenna whose attenuations change.
         Parameters:
-            band: band setting as defined in .bands file. (This can be edited
-                using bands.py.)
+            band: band setting as defined in .bands.json file. (This can be
+                edited using bands.py.)
             antennas: list of keys to antennas that the attenuation changes
-                should apply to, valid keys are "A" and "B".
+                should apply to (all antennas when omitted).
+            dryRun: when True, returns the planned register operations
+                instead of running them. (Refer to selectNoiseSource.)
+        Returns:
+            ready: sbio.monotonic() time by which the band has settled.
         Raises:
             InvalidBandError: occurs when the .bands setting does not have 
                 values for a given band.
-            NoConnectionError: occurs when there is no connection to the 
-                at least one of the LabJack units.
+            InvalidLOFreqError, KeyError: occur when the band setting has
+                an invalid LO frequency or attenuator.
+            sbpool.MultiDeviceError: occurs when at least one of the 
+                LabJack units fails (e.g. with NoConnectionError). Holds the
+                error of each failed unit and the results of the others.
+                The LO frequency is taken as unknown afterwards.
             KeyError: occurs when a key in antennas does not match to any 
                 AntennaLJ objects.
     """
-    def setToBand(self, band, antennas=["A", "B"]):
-        ref = {}
-        try:
-            ref = self.bands[band]
-        except KeyError:
-            raise InvalidBandError(band)
+    def setToBand(self, band, antennas=None, dryRun=False):
+        self.reloadBands()
+        staged = self.__stageBand(band, antennas)
+        if dryRun:
+            freq, program, antennas = staged
+            return sbio.planPrograms([("LONOISE", program.lo)] + 
+                                     [(key, program.antenna) 
+                                      for key, lj in antennas])
             
-        self.ljLONoise.setLOFreq(ref["LOFREQ"])
-        
-        if "A" in antennas and self.antennaA is not None:
-            for comp, val in ref["ATTEN"].items():
-                self.ljA.setAttenuator(val, [comp])
+        return self.__sendBand(staged)
+    
+    """
+    Method: waitForBand()
+        Description:
+            Sleeps until the last band switch has settled (refer to 
+            setToBand). Returns at once when it already has.
+    """
+    def waitForBand(self):
+        wait = self.bandReady - sbio.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+    
+    def __stageBand(self, band, antennas=None):
+        program = self.programs.get(band)
+        if program is None:
+            if band not in self.bands:
+                raise InvalidBandError(band)
+            # Added to the bands attribute without setBands.
+            program = compileBands({band: self.bands[band]})[band]
+            self.programs[band] = program
+        if isinstance(program, Exception):
+            raise program
+        return self.bands[band]["LOFREQ"], program, self.__antennas(antennas)
+    
+    def __bandCalls(self, staged):
+        freq, program, antennas = staged
+        calls = collections.OrderedDict()
+        calls["LONOISE"] = lambda: self.__written(self.ljLONoise, 
+                                                  program.lo)
+        for key, lj in antennas:
+            calls[key] = lambda lj=lj: self.__written(lj, program.antenna)
+        return calls
+    
+    def __written(self, lj, program):
+        lj.runProgram(program)
+        return sbio.monotonic()
+    
+    def __sendBand(self, staged):
+        freq, program, antennas = staged
+        settle = {"LONOISE": 0.0}
+        if freq != self.loFreq:
+            settle["LONOISE"] = self.loSettleTimes.get((self.loFreq, freq),
+                                                       self.loSettle)
+        for key, lj in antennas:
+            changed = lj.allAtt != program.antenna.state["allAtt"]
+            settle[key] = self.attSettle if changed else 0.0
         
-        if "B" in antennas and self.antennaB is not None:
-            for comp, val in ref["ATTEN"].items():
-                self.ljB.setAttenuator(val, [comp])
+        # The LO write is queued first so that its lock time overlaps 
+        # with the antenna writes.
+        self.loFreq = None
+        written = self.workers.fanOut(self.__bandCalls(staged))
+        self.loFreq = freq
+        self.bandReady = max(written[key] + settle[key] for key in written)
+        return self.bandReady
+    
+    """
+    Method: scheduleBands(entries, antennas)
+        Description:
+            Starts switching bands on a timetable, with the same writes 
+            as setToBand sent to all LabJacks concurrently at each entry.
+            The writes of every entry are prepared beforehand (with the 
+            band table as it is when scheduling), and the switches are 
+            timed on the monotonic clock. (Refer to BandScheduler in 
+            sbschedule.py.) A timetable still running is stopped first. 
+            A monitor sweep in progress on a LabJack 
+            delays its switch by the time of that sweep.
+        Parameters:
+            entries: list of (wall clock time, band) pairs.
+            antennas: list of keys to antennas that the attenuation 
+                changes should apply to (all antennas when omitted).
+        Returns:
+            scheduler: the running sbschedule.BandScheduler, whose 
+                switches attribute records the time each switch was sent,
+                its lateness and the time it has settled (as returned by
+                setToBand).
+        Raises:
+            InvalidBandError, InvalidLOFreqError, KeyError: occur as for 
+                setToBand, for any entry, before anything is scheduled.
+    """
+    def scheduleBands(self, entries, antennas=None):
+        self.reloadBands()
+        scheduler = sbschedule.BandScheduler(
+            entries, lambda band: self.__stageBand(band, antennas),
+            self.__sendBand, "ovro-schedule")
+        if self.scheduler is not None:
+            self.scheduler.stop()
+        self.scheduler = scheduler
+        scheduler.start()
+        return scheduler
     
     """
     Method: alterAntByDelta(delta, antennas)
@@ -165,28 +808,41 @@ class OVROStarburst(object):
         Parameters:
             delta: amount to change the attenuations by.
             antennas: list of keys to antennas that the attenuation changes
-                should apply to, valid keys are "A" and "B".
+                should apply to (all antennas when omitted).
+            dryRun: when True, returns the planned register operations
+                instead of running them. (Refer to selectNoiseSource.)
         Raises:
             InvalidBandError: occurs when the .bands setting does not have 
                 values for a given band.
-            NoConnectionError: occurs when there is no connection to the 
-                at least one of the LabJack units.
+            sbpool.MultiDeviceError: occurs when at least one of the 
+                LabJack units fails (e.g. with NoConnectionError). Holds the
+                error of each failed unit and the results of the others.
             KeyError: occurs when a key in antennas does not match to any 
                 AntennaLJ objects.
     """
-    def alterAntByDelta(self, delta, antennas=["A", "B"]):
-        if "A" in antennas and self.antennaA is not None:
-            self.ljA.deltaAttenuator(delta)
-        
-        if "B" in antennas and self.antennaB is not None:
-            self.ljB.deltaAttenuator(delta)
+    def alterAntByDelta(self, delta, antennas=None, dryRun=False):
+        if dryRun:
+            return sbio.planPrograms(
+                (key, sblj.AntennaLJ.compileAttenuators(
+                    dict((input, lj.allAtt[input] + delta) 
+                         for input in ["VQ", "VI", "HQ", "HI"])))
+                for key, lj in self.__antennas(antennas))
+            
+        calls = {}
+        for key, lj in self.__antennas(antennas):
+            calls[key] = lambda lj=lj: lj.deltaAttenuator(delta)
+        self.workers.fanOut(calls)
     
     """
     Method: endConnection()
         Description:
-            Ends connections to all LabJacks in the system.
+            Ends connections to all LabJacks in the system and stops their
+            workers, the monitor and the band timetable.
     """
     def endConnection(self):
-        self.ljLONoise.disconnect()
-        self.ljA.disconnect()
-        self.ljB.disconnect()
\ No newline at end of file
+        self.stopMonitor()
+        if self.scheduler is not None:
+            self.scheduler.stop()
+        for lj in self.devices().values():
+            lj.disconnect()
+        self.workers.shutdown()
\ No newline at end of file
@@ -8,7 +8,13 @@ import unittest
 from labjack import ljm
 import sblj
 import sbovro
-import pickle
+import sbsim
+import sbbands
+import copy
+import time
+import os
+import shutil
+import tempfile
 
 """
 TestOVROMethods Test Group Description:
@@ -16,7 +22,7 @@ TestOVROMethods Test Group Description:
     sbovro module. This group only provides for basic functionality 
     testing.
     
-    Test Count: 6
+    Test Count: 10
 """
 class TestOVROMethods(unittest.TestCase):
     # Monkey patching methods for LJM Library and sblj in order to unit 
@@ -33,6 +39,9 @@ class TestOVROMethods(unittest.TestCase):
     def eReadName(self, handle, name):
         return self.testValues[handle][name]
         
+    def eReadNames(self, handle, numFrames, names):
+        return [self.eReadName(handle, name) for name in names]
+        
     def eReadNameString(self, handle, name):
         return self.testValues[handle][name]
         
@@ -41,6 +50,10 @@ class TestOVROMethods(unittest.TestCase):
             handle = "Antenna"
         self.testValues[handle][name] = newVal
         
+    def eWriteNames(self, handle, numFrames, names, newVals):
+        for name, newVal in zip(names, newVals):
+            self.eWriteName(handle, name, newVal)
+        
     def eWriteNameString(self, handle, name, newVal):
         self.testValues[handle][name] = newVal
         
@@ -101,15 +114,19 @@ class TestOVROMethods(unittest.TestCase):
         self.o_connect = sblj.StarburstLJ.connect
         self.o_errorCheck = sblj.StarburstLJ.errorCheck
         self.o_eReadName = ljm.eReadName
+        self.o_eReadNames = ljm.eReadNames
         self.o_eReadNameString = ljm.eReadNameString
         self.o_eWriteName = ljm.eWriteName
+        self.o_eWriteNames = ljm.eWriteNames
         self.o_eWriteNameString = ljm.eWriteNameString
         
         sblj.StarburstLJ.connect = self.connect
         sblj.StarburstLJ.errorCheck = self.errorCheck
         ljm.eReadName = self.eReadName
+        ljm.eReadNames = self.eReadNames
         ljm.eReadNameString = self.eReadNameString
         ljm.eWriteName = self.eWriteName
+        ljm.eWriteNames = self.eWriteNames
         ljm.eWriteNameString = self.eWriteNameString
         
         self.ovroObj = sbovro.OVROStarburst("LONoise", "Antenna", "Antenna")
@@ -121,8 +138,10 @@ class TestOVROMethods(unittest.TestCase):
         sblj.StarburstLJ.connect = self.o_connect
         sblj.StarburstLJ.errorCheck = self.o_errorCheck
         ljm.eReadName = self.o_eReadName
+        ljm.eReadNames = self.o_eReadNames
         ljm.eReadNameString = self.o_eReadNameString
         ljm.eWriteName = self.o_eWriteName
+        ljm.eWriteNames = self.o_eWriteNames
         ljm.eWriteNameString = self.o_eWriteNameString
     
     """
@@ -218,21 +237,20 @@ class TestOVROMethods(unittest.TestCase):
         self.ovroObj.setToBand(1)
         dict = self.ovroObj.getMonitorData()
         
-        with open(".bands", "r") as file:
-            check = pickle.load(file)
-            attens = check[1]["ATTEN"]
-            lofrq = check[1]["LOFREQ"]
-        
-            self.assertEqual(dict["LONOISE"]["LOFREQ"][0], 
-                             self.LOConstantNames[lofrq])
-            self.assertEqual(dict["LONOISE"]["LOFREQ"][1], 0)
-        
-            for key in ["A", "B"]:
-                dict = self.ovroObj.getMonitorData()
-                self.assertEqual(dict[key]["VQATTEN"], attens["VQ"])
-                self.assertEqual(dict[key]["VIATTEN"], attens["VI"])
-                self.assertEqual(dict[key]["HQATTEN"], attens["HQ"])
-                self.assertEqual(dict[key]["HIATTEN"], attens["HI"])
+        check = sbbands.BandStore().load()
+        attens = check[1]["ATTEN"]
+        lofrq = check[1]["LOFREQ"]
+        
+        self.assertEqual(dict["LONOISE"]["LOFREQ"][0], 
+                         self.LOConstantNames[lofrq])
+        self.assertEqual(dict["LONOISE"]["LOFREQ"][1], 0)
+        
+        for key in ["A", "B"]:
+            dict = self.ovroObj.getMonitorData()
+            self.assertEqual(dict[key]["VQATTEN"], attens["VQ"])
+            self.assertEqual(dict[key]["VIATTEN"], attens["VI"])
+            self.assertEqual(dict[key]["HQATTEN"], attens["HQ"])
+            self.assertEqual(dict[key]["HIATTEN"], attens["HI"])
     
     """
     Test - test_setToBandNonexistantBandRaisesError:
@@ -242,6 +260,62 @@ class TestOVROMethods(unittest.TestCase):
     def test_setToBandNonexistantBandRaisesError(self):
         self.assertRaises(sbovro.InvalidBandError, self.ovroObj.setToBand, 123)
         
+    """
+    Test - test_bandsPrecompiled:
+        Given a new band table with a valid and an invalid band,
+        Then the valid band is applied from its compiled program, and the 
+            invalid one raises the error found compiling it.
+    """
+    def test_bandsPrecompiled(self):
+        self.ovroObj.setBands({2: {"LOFREQ": 3, "DESCR": "Test band",
+                                   "ATTEN": {"VQ": 1, "VI": 2, 
+                                             "HQ": 3, "HI": 4}},
+                               3: {"LOFREQ": 9, "DESCR": "Bad band",
+                                   "ATTEN": {"VQ": 1}}})
+        
+        self.assertTrue(isinstance(self.ovroObj.programs[2], 
+                                   sbovro.BandProgram))
+        self.ovroObj.setToBand(2)
+        dict = self.ovroObj.getMonitorData()
+        self.assertEqual(dict["LONOISE"]["LOFREQ"][1], 3)
+        self.assertEqual(dict["A"]["HIATTEN"], 4)
+        self.assertEqual(dict["B"]["VIATTEN"], 2)
+        
+        self.assertRaises(sblj.InvalidLOFreqError, self.ovroObj.setToBand, 3)
+        self.assertRaises(sbovro.InvalidBandError, self.ovroObj.setToBand, 1)
+    
+    """
+    Test - test_bandsHotReload:
+        Given that the band file is replaced while the system is running,
+        Then setToBand applies the new bands once the file was looked at
+            again, and a file that is not valid JSON leaves the bands in
+            place.
+    """
+    def test_bandsHotReload(self):
+        scratch = tempfile.mkdtemp()
+        try:
+            store = sbbands.BandStore(os.path.join(scratch, "bands.json"),
+                                      os.path.join(scratch, "bands"), 0)
+            self.ovroObj.bandStore = store
+            store.save({5: {"LOFREQ": 2, "DESCR": "Test band",
+                            "ATTEN": {"VQ": 1, "VI": 2, "HQ": 3, "HI": 4}}})
+            self.ovroObj.setToBand(5)
+            self.assertEqual(self.ovroObj.getMonitorData()["A"]["HQATTEN"], 3)
+            
+            store.save({6: {"LOFREQ": 1, "DESCR": "Replacement band",
+                            "ATTEN": {"VQ": 5, "VI": 5, "HQ": 5, "HI": 5}}})
+            self.assertRaises(sbovro.InvalidBandError, 
+                              self.ovroObj.setToBand, 5)
+            self.ovroObj.setToBand(6)
+            self.assertEqual(self.ovroObj.getMonitorData()["B"]["VQATTEN"], 5)
+            
+            with open(store.path, "w") as file:
+                file.write("{")
+            self.assertFalse(self.ovroObj.reloadBands())
+            self.assertEqual(list(self.ovroObj.bands.keys()), [6])
+        finally:
+            shutil.rmtree(scratch)
+    
     """
     Test - test_alterAntByDelta:
         Given that we decrement all attenuations by 10,
@@ -257,10 +331,266 @@ class TestOVROMethods(unittest.TestCase):
             self.assertEqual(dict[key]["HQATTEN"], 21.5)
             self.assertEqual(dict[key]["HIATTEN"], 21.5)
     
+    """
+    Test - test_setToBandDryRun:
+        Given that we plan setting the band to band 1,
+        Then the planned writes cover the LO lines and the attenuators of
+            both antennas, and nothing is written to the LabJacks.
+    """
+    def test_setToBandDryRun(self):
+        before = copy.deepcopy(self.testValues)
+        plan = self.ovroObj.setToBand(1, dryRun=True)
+        
+        self.assertEqual(self.testValues, before)
+        self.assertEqual(self.ovroObj.ljA.allAtt["VQ"], 31.5)
+        
+        self.assertEqual([call.names for call in plan 
+                          if call.device == "LONOISE"], [["EIO3", "EIO4"]])
+        for key in ["A", "B"]:
+            calls = [call for call in plan if call.device == key]
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(calls[0].op, "eWriteNames")
+            self.assertEqual(len(calls[0].names), 20)
+    
+    """
+    Test - test_alterAntByDeltaDryRun:
+        Given that we plan decrementing all attenuations by 10,
+        Then the ghost attenuations are unchanged afterwards, and the 
+            plan latches each of the four attenuators of each antenna.
+    """
+    def test_alterAntByDeltaDryRun(self):
+        plan = self.ovroObj.alterAntByDelta(-10, dryRun=True)
+        
+        dict = self.ovroObj.getMonitorData()
+        for key in ["A", "B"]:
+            self.assertEqual(dict[key]["VQATTEN"], 31.5)
+            calls = [call for call in plan if call.device == key]
+            self.assertEqual(len(calls), 1)
+            latches = [name for name, value in zip(calls[0].names, 
+                                                   calls[0].values)
+                       if value == 1 and name.startswith("CIO")]
+            self.assertEqual(sorted(latches), ["CIO0", "CIO1", "CIO2", 
+                                               "CIO3"])
+    
+"""
+TestOVROConcurrency Test Group Description:
+    This group of tests makes sure that operations spanning several 
+    LabJacks run on each of them concurrently, against simulated LabJacks,
+    for any number of antennas.
+
+    Test Count: 7
+"""
+class TestOVROConcurrency(unittest.TestCase):
+
+    def setUp(self):
+        sbsim.backend.reset()
+        sbsim.backend.latency = sbsim.LatencyModel(0.002)
+        self.ovroObj = sbovro.OVROStarburst("LONoise", "AntennaA", 
+                                            "AntennaB", "ETHERNET", "SIM")
+    
+    def tearDown(self):
+        self.ovroObj.endConnection()
+        sbsim.backend.latency = sbsim.LatencyModel()
+    
+    """
+    Test - test_monitorTakesSlowestDevice:
+        Given LabJacks with 2ms of latency per call,
+        Then getMonitorData takes well under the sum of the time each 
+            LabJack takes on its own.
+    """
+    def test_monitorTakesSlowestDevice(self):
+        serial = 0
+        for lj in self.ovroObj.devices().values():
+            start = time.time()
+            lj.getParams()
+            serial += time.time() - start
+        
+        start = time.time()
+        dict = self.ovroObj.getMonitorData()
+        self.assertTrue(time.time() - start < 0.7 * serial)
+        self.assertEqual(sorted(dict.keys()), ["A", "B", "LONOISE"])
+        self.assertEqual(dict["A"]["NAME"], "AntennaA")
+    
+    """
+    Test - test_failuresGatheredPerDevice:
+        Given that antenna B has lost its connection,
+        Then setToBand still sets antenna A and the LO, and raises a
+            MultiDeviceError holding the NoConnectionError of B.
+    """
+    def test_failuresGatheredPerDevice(self):
+        self.ovroObj.ljB.handle = None
+        try:
+            self.ovroObj.setToBand(1)
+            self.fail("MultiDeviceError not raised")
+        except sbovro.sbpool.MultiDeviceError as e:
+            self.assertEqual(list(e.errors.keys()), ["B"])
+            self.assertTrue(isinstance(e.errors["B"], 
+                                       sblj.NoConnectionError))
+            self.assertTrue("A" in e.results and "LONOISE" in e.results)
+        self.assertEqual(self.ovroObj.ljA.allAtt["VQ"], 10)
+    
+    """
+    Test - test_antennaRegistry:
+        Given a system with eight antennas, one of them added later and 
+            one removed,
+        Then the operations apply to the registered antennas (or the 
+            ones listed), with one LJM call per antenna, and unknown keys
+            raise KeyError.
+    """
+    def test_antennaRegistry(self):
+        self.ovroObj.endConnection()
+        self.ovroObj = sbovro.OVROStarburst(
+            "LONoise", "AntennaA", None, "ETHERNET", "SIM", 
+            [("ANT%d" % i, "Antenna%d" % i) for i in range(2, 8)])
+        self.ovroObj.addAntenna("ANT8", "Antenna8")
+        self.ovroObj.removeAntenna("ANT2")
+        self.assertRaises(ValueError, self.ovroObj.addAntenna, "A", "Other")
+        
+        keys = ["A"] + ["ANT%d" % i for i in range(3, 9)]
+        self.assertEqual(list(self.ovroObj.ljAntennas.keys()), keys)
+        self.assertRaises(AttributeError, getattr, self.ovroObj, "ljB")
+        
+        with sbovro.sbio.measureIO(self.ovroObj.devices()) as cost:
+            self.ovroObj.setToBand(1)
+        for key in keys:
+            self.assertEqual(cost[key].calls, 1)
+            self.assertEqual(self.ovroObj.ljAntennas[key].allAtt["HI"], 12)
+        self.assertEqual(sorted(self.ovroObj.getMonitorData().keys()),
+                         sorted(keys + ["LONOISE"]))
+        
+        self.ovroObj.alterAntByDelta(1, ["ANT8"])
+        self.assertEqual(self.ovroObj.ljAntennas["ANT8"].allAtt["HI"], 13)
+        self.assertEqual(self.ovroObj.ljA.allAtt["HI"], 12)
+        self.assertRaises(KeyError, self.ovroObj.alterAntByDelta, 1, ["B"])
+    
+    """
+    Test - test_fieldSelection:
+        Given a selection of two LO parameters and one antenna A power,
+        Then only those registers are read, antenna B is left out, and 
+            the same selection is served from a fresh full snapshot.
+    """
+    def test_fieldSelection(self):
+        fields = {"LONOISE": ["LOFREQ", "NSSTAT"], "A": ["VQPOW"]}
+        with sbovro.sbio.measureIO(self.ovroObj.devices()) as cost:
+            dict = self.ovroObj.getMonitorData(fields=fields)
+        
+        self.assertEqual(sorted(dict.keys()), ["A", "LONOISE"])
+        self.assertEqual(sorted(dict["A"].keys()), ["TIMESTAMP", "VQPOW"])
+        self.assertEqual(cost["LONOISE"].registers, 3)
+        self.assertEqual(cost["A"].registers, 1)
+        self.assertEqual(cost["B"].calls, 0)
+        self.assertTrue(self.ovroObj.snapshot is None)
+        
+        self.ovroObj.getMonitorData()
+        with sbovro.sbio.measureIO(self.ovroObj.devices()) as cost:
+            cached = self.ovroObj.getMonitorData(max_age=10, fields=fields)
+        self.assertEqual(cost["TOTAL"].calls, 0)
+        self.assertAlmostEqual(cached["A"]["VQPOW"], dict["A"]["VQPOW"])
+        self.assertEqual(cached["LONOISE"]["LOFREQ"], 
+                         dict["LONOISE"]["LOFREQ"])
+    
+    """
+    Test - test_scheduleBands:
+        Given a timetable switching to a new band and back to band 1,
+        Then every LabJack is switched at each entry, with the switches 
+            recorded on time, and an unknown band is refused before 
+            anything is scheduled.
+    """
+    def test_scheduleBands(self):
+        self.ovroObj.setBands({1: self.ovroObj.bands[1],
+                               2: {"LOFREQ": 3, "DESCR": "Test band",
+                                   "ATTEN": {"VQ": 1, "VI": 2, 
+                                             "HQ": 3, "HI": 4}}})
+        self.assertRaises(sbovro.InvalidBandError, 
+                          self.ovroObj.scheduleBands, [(time.time(), 7)])
+        
+        now = time.time()
+        scheduler = self.ovroObj.scheduleBands([(now + 0.03, 2), 
+                                                (now + 0.09, 1)])
+        time.sleep(0.06)
+        self.assertEqual(self.ovroObj.ljB.allAtt["VI"], 2)
+        self.assertTrue(scheduler.wait(1))
+        
+        self.assertEqual(self.ovroObj.ljB.allAtt["VI"], 10)
+        self.assertEqual([switch.band for switch in scheduler.switches], 
+                         [2, 1])
+        for switch in scheduler.switches:
+            self.assertTrue(switch.error is None)
+            self.assertTrue(switch.lateness < 0.01)
+            self.assertTrue(switch.done - switch.sent < 0.03)
+            self.assertTrue(switch.ready >= switch.done)
+    
+    """
+    Test - test_bandSettle:
+        Given a 50ms LO lock time, 20ms from LO setting 0 to 3, and a 
+            5ms attenuator settle time,
+        Then setToBand returns without waiting, and the band is ready 
+            after the lock time of the transition when the LO changes, 
+            after the attenuator settle time when only attenuations 
+            change, and at once when nothing changes.
+    """
+    def test_bandSettle(self):
+        self.ovroObj.setBands({1: self.ovroObj.bands[1],
+                               2: {"LOFREQ": 3, "DESCR": "Test band",
+                                   "ATTEN": {"VQ": 1, "VI": 2, 
+                                             "HQ": 3, "HI": 4}},
+                               3: {"LOFREQ": 3, "DESCR": "Test band",
+                                   "ATTEN": {"VQ": 5, "VI": 5, 
+                                             "HQ": 5, "HI": 5}}})
+        self.ovroObj.loSettle = 0.05
+        self.ovroObj.loSettleTimes[(0, 3)] = 0.02
+        self.ovroObj.attSettle = 0.005
+        
+        for band, settle in [(1, 0.05), (2, 0.02), (3, 0.005), (3, 0)]:
+            start = sbovro.sbio.monotonic()
+            ready = self.ovroObj.setToBand(band)
+            end = sbovro.sbio.monotonic()
+            self.assertTrue(end - start < 0.02)
+            self.assertTrue(start + settle <= ready <= end + settle)
+            self.assertEqual(self.ovroObj.bandReady, ready)
+        
+        self.ovroObj.bandReady = sbovro.sbio.monotonic() + 0.02
+        self.ovroObj.waitForBand()
+        self.assertTrue(sbovro.sbio.monotonic() >= self.ovroObj.bandReady)
+        
+        self.ovroObj.ljB.handle = None
+        self.assertRaises(sbovro.sbpool.MultiDeviceError, 
+                          self.ovroObj.setToBand, 1)
+        self.assertEqual(self.ovroObj.loFreq, None)
+    
+    """
+    Test - test_dryRunWhileMonitoring:
+        Given the monitor sweeping every millisecond while band, source 
+            and attenuation changes are planned,
+        Then the snapshots keep the values read from the LabJacks, the 
+            plans hold only the planned writes, and nothing is written.
+    """
+    def test_dryRunWhileMonitoring(self):
+        device = sbsim.backend.devices["AntennaA"]
+        self.ovroObj.startMonitor(0.001)
+        try:
+            for i in range(20):
+                plans = [self.ovroObj.setToBand(1, dryRun=True),
+                         self.ovroObj.selectNoiseSource(dryRun=True),
+                         self.ovroObj.selectRFSource(dryRun=True),
+                         self.ovroObj.alterAntByDelta(-1, dryRun=True)]
+                for plan in plans:
+                    self.assertTrue(all(call.op == "eWriteNames" 
+                                        for call in plan))
+                self.assertEqual([len(plan) for plan in plans], 
+                                 [3, 3, 3, 2])
+                data = self.ovroObj.getMonitorData(max_age=1.0)
+                self.assertNotEqual(data["A"]["POW_24V"], 0)
+        finally:
+            self.ovroObj.stopMonitor()
+        self.assertEqual(device.attenuation["VQ"], 63)
+        self.assertEqual(self.ovroObj.ljA.allAtt["VQ"], 31.5)
+        self.assertFalse(sbsim.backend.noiseSourceOn())
+    
 
 # Main Method
 if __name__ == '__main__':
-    testGroups = [TestOVROMethods]
+    testGroups = [TestOVROMethods, TestOVROConcurrency]
     for tG in testGroups:
         print "\nTesting: " + str(tG.__name__)
         suite = unittest.TestLoader().loadTestsFromTestCase(
@@ -0,0 +1,210 @@
+"""
+    STARBURST Per-Device Worker Pool
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import sbio
+import threading
+import collections
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+"""
+Class: MultiDeviceError extends Exception
+    Description:
+        Custom error for operations fanned out over several LabJacks where
+        at least one of them failed. Holds the exception of every device
+        that failed and the results of those that did not.
+    Arguments:
+        errors: dictionary of exceptions keyed by device.
+        results: dictionary of results keyed by device.
+"""
+class MultiDeviceError(Exception):
+    def __init__(self, errors, results):
+        self.errors = errors
+        self.results = results
+
+    def __str__(self):
+        return ("Failed on " + ", ".join(
+            str(key) + " (" + type(error).__name__ + ": " + str(error) + ")"
+            for key, error in sorted(self.errors.items())))
+
+"""
+Class: DeviceTimeoutError extends Exception
+    Description:
+        Custom error for a device task that did not finish in time.
+"""
+class DeviceTimeoutError(Exception):
+    def __init__(self, key, timeout):
+        self.key = key
+        self.timeout = timeout
+
+    def __str__(self):
+        return ("Device " + str(self.key) + " did not respond within " +
+                str(self.timeout) + "s")
+
+"""
+Class: DeviceTask extends object
+    Description:
+        A call queued on the worker of a device. The result (or the
+        exception raised by the call) is collected with result().
+"""
+class DeviceTask(object):
+    def __init__(self, key, func, args, kwargs):
+        self.key = key
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.finished = threading.Event()
+        self.value = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.value = self.func(*self.args, **self.kwargs)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished.set()
+
+    def done(self):
+        return self.finished.is_set()
+
+    """
+    Method: result(timeout)
+        Description:
+            Waits for the task and returns its result.
+        Raises:
+            DeviceTimeoutError: occurs when the task is not done within
+                timeout seconds. (The task keeps running.)
+            Exception: whatever the call raised.
+    """
+    def result(self, timeout=None):
+        if not self.finished.wait(timeout):
+            raise DeviceTimeoutError(self.key, timeout)
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+"""
+Class: DeviceWorkers extends object
+    Description:
+        Persistent pool with one worker thread per device. Calls on one
+        device run one after another (in submission order) while calls on
+        different devices run concurrently. LJM releases the GIL while it
+        waits on the network, so the time of an operation spanning
+        several devices becomes that of the slowest device.
+    Arguments:
+        name: prefix of the worker thread names.
+"""
+class DeviceWorkers(object):
+    def __init__(self, name="sbpool"):
+        self.name = name
+        self.lock = threading.Lock()
+        self.queues = {}
+        self.threads = {}
+
+    def __worker(self, tasks):
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            task.run()
+
+    """
+    Method: submit(key, func, *args, **kwargs)
+        Description:
+            Queues func(*args, **kwargs) on the worker of device key
+            (starting the worker on first use). A task submitted from the
+            worker of the same device runs immediately instead.
+        Returns:
+            task: the DeviceTask.
+    """
+    def submit(self, key, func, *args, **kwargs):
+        task = DeviceTask(key, func, args, kwargs)
+        with self.lock:
+            thread = self.threads.get(key)
+            if thread is threading.current_thread():
+                tasks = None
+            else:
+                if thread is None:
+                    self.queues[key] = queue.Queue()
+                    thread = threading.Thread(
+                        target=self.__worker, args=(self.queues[key],),
+                        name=self.name + "-" + str(key))
+                    thread.daemon = True
+                    self.threads[key] = thread
+                    thread.start()
+                tasks = self.queues[key]
+        if tasks is None:
+            task.run()
+        else:
+            tasks.put(task)
+        return task
+
+    """
+    Method: fanOut(calls, timeout)
+        Description:
+            Runs one call per device concurrently and waits for all of
+            them.
+        Arguments:
+            calls: dictionary keyed by device of callables (taking no
+                arguments).
+            timeout: seconds to wait for all devices (None to wait for
+                as long as it takes).
+        Returns:
+            results: dictionary of the results keyed by device.
+        Raises:
+            MultiDeviceError: occurs when any of the calls raised (or
+                timed out), after all calls finished.
+    """
+    def fanOut(self, calls, timeout=None):
+        tasks = collections.OrderedDict(
+            (key, self.submit(key, func)) for key, func in calls.items())
+        return collect(tasks, timeout)
+
+    """
+    Method: shutdown()
+        Description:
+            Stops all workers once their queued tasks are done.
+    """
+    def shutdown(self):
+        with self.lock:
+            for tasks in self.queues.values():
+                tasks.put(None)
+            self.queues = {}
+            self.threads = {}
+
+"""
+Method: collect(tasks, timeout)
+    Description:
+        Waits for a dictionary of DeviceTask objects keyed by device,
+        for at most timeout seconds in all.
+    Returns:
+        results: dictionary of results keyed by device.
+    Raises:
+        MultiDeviceError: occurs when any of the tasks raised or timed
+            out.
+"""
+def collect(tasks, timeout=None):
+    results = collections.OrderedDict()
+    errors = {}
+    if timeout is not None:
+        deadline = sbio.monotonic() + timeout
+    for key, task in tasks.items():
+        try:
+            if timeout is None:
+                results[key] = task.result()
+            else:
+                results[key] = task.result(max(deadline - sbio.monotonic(),
+                                               0))
+        except DeviceTimeoutError:
+            errors[key] = DeviceTimeoutError(key, timeout)
+        except Exception as e:
+            errors[key] = e
+    if errors:
+        raise MultiDeviceError(errors, results)
+    return results
@@ -0,0 +1,131 @@
+"""
+    STARBURST Per-Device Worker Pool Test Suite
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import unittest
+import threading
+import time
+import sbpool
+
+"""
+TestDeviceWorkers Test Group Description:
+    This group of tests makes sure that calls fanned out over devices run
+    concurrently across devices, in order on each device, and that their
+    results and errors are gathered per device.
+
+    Test Count: 5
+"""
+class TestDeviceWorkers(unittest.TestCase):
+
+    def setUp(self):
+        self.workers = sbpool.DeviceWorkers("test")
+
+    def tearDown(self):
+        self.workers.shutdown()
+
+    """
+    Test - test_concurrentAcrossDevices:
+        Given three devices that each take 50ms,
+        Then fanOut returns every result in well under the 150ms it
+            would take to run them one after another.
+    """
+    def test_concurrentAcrossDevices(self):
+        def call(key):
+            time.sleep(0.05)
+            return key * 2
+
+        start = time.time()
+        results = self.workers.fanOut(dict(
+            (key, lambda key=key: call(key)) for key in ["A", "B", "C"]))
+        self.assertTrue(time.time() - start < 0.12)
+        self.assertEqual(dict(results), {"A": "AA", "B": "BB", "C": "CC"})
+
+    """
+    Test - test_errorsGatheredPerDevice:
+        Given that one of two devices raises,
+        Then a MultiDeviceError holding that error and the result of the
+            other device is raised once both are done.
+    """
+    def test_errorsGatheredPerDevice(self):
+        def fail():
+            raise ValueError("bad")
+
+        try:
+            self.workers.fanOut({"A": fail, "B": lambda: 1})
+            self.fail("MultiDeviceError not raised")
+        except sbpool.MultiDeviceError as e:
+            self.assertEqual(list(e.errors.keys()), ["A"])
+            self.assertTrue(isinstance(e.errors["A"], ValueError))
+            self.assertEqual(dict(e.results), {"B": 1})
+            self.assertTrue("ValueError" in str(e))
+
+    """
+    Test - test_serialPerDevice:
+        Given several calls submitted to the same device,
+        Then they run in submission order on a single persistent thread.
+    """
+    def test_serialPerDevice(self):
+        order = []
+        threads = set()
+
+        def call(i):
+            order.append(i)
+            threads.add(threading.current_thread())
+
+        tasks = [self.workers.submit("A", call, i) for i in range(20)]
+        for task in tasks:
+            task.result(1)
+        self.workers.fanOut({"A": lambda: call(20)})
+
+        self.assertEqual(order, list(range(21)))
+        self.assertEqual(len(threads), 1)
+
+    """
+    Test - test_nestedSubmitAndTimeout:
+        Given a call that submits to its own device, and a call that
+            outlives its timeout,
+        Then the nested call runs in place and the slow call raises
+            DeviceTimeoutError.
+    """
+    def test_nestedSubmitAndTimeout(self):
+        def outer():
+            return self.workers.submit("A", lambda: "inner").result(1)
+
+        self.assertEqual(self.workers.submit("A", outer).result(1), "inner")
+
+        task = self.workers.submit("B", time.sleep, 0.2)
+        self.assertRaises(sbpool.DeviceTimeoutError, task.result, 0.01)
+        task.result(1)
+
+    """
+    Test - test_commonTimeout:
+        Given three devices that each take 200ms fanned out with a 100ms
+            timeout,
+        Then all three time out after about 100ms, instead of the later
+            devices getting timeouts of their own.
+    """
+    def test_commonTimeout(self):
+        start = time.time()
+        try:
+            self.workers.fanOut(dict(
+                (key, lambda: time.sleep(0.2)) for key in ["A", "B", "C"]),
+                0.1)
+            self.fail("MultiDeviceError not raised")
+        except sbpool.MultiDeviceError as e:
+            self.assertTrue(time.time() - start < 0.15)
+            self.assertEqual(sorted(e.errors.keys()), ["A", "B", "C"])
+            for error in e.errors.values():
+                self.assertTrue(isinstance(error, sbpool.DeviceTimeoutError))
+                self.assertEqual(error.timeout, 0.1)
+
+
+# Main Method
+if __name__ == '__main__':
+    testGroups = [TestDeviceWorkers]
+    for tG in testGroups:
+        print "\nTesting: " + str(tG.__name__)
+        suite = unittest.TestLoader().loadTestsFromTestCase(
+            tG)
+        unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,249 @@
+"""
+    STARBURST Monitor History Rollups
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import sbhistorian
+import os
+import math
+import numbers
+import numpy as np
+
+# Aggregates kept per parameter and bucket, as column suffixes.
+
+AGGREGATES = ["MIN", "MEAN", "MAX", "COUNT"]
+
+# Default bucket sizes in seconds.
+
+DEFAULT_RESOLUTIONS = (1, 60, 3600)
+
+"""
+Class: DeviceRollup extends object
+    Description:
+        Aggregates of the monitor data of one device over buckets of
+        resolution seconds, maintained as rows arrive, in a DeviceHistory
+        (TIME is the start of the bucket, and every parameter X gets the
+        columns X_MIN, X_MEAN, X_MAX and X_COUNT). The bucket being filled
+        is the last row, rewritten with every row added to it, so that a
+        reopened rollup (or one left by a crash) carries on filling it.
+        NaN values are left out of the aggregates.
+    Arguments:
+        path: directory of the rollup.
+        resolution: bucket size in seconds.
+        chunkRows: rows per chunk file.
+"""
+class DeviceRollup(object):
+    def __init__(self, path, resolution, chunkRows=4096):
+        self.resolution = resolution
+        self.history = sbhistorian.DeviceHistory(path, chunkRows)
+        self.bucket = None
+        self.stats = {}
+
+        last = self.history.last()
+        if last is not None:
+            self.bucket = last["TIME"]
+            for column in last:
+                if not column.endswith("_COUNT"):
+                    continue
+                name = column[:-len("_COUNT")]
+                count = int(last[column])
+                if count:
+                    self.stats[name] = [last[name + "_MIN"],
+                                        last[name + "_MEAN"] * count,
+                                        last[name + "_MAX"], count]
+                else:
+                    self.stats[name] = [np.inf, 0.0, -np.inf, 0]
+
+    # Private helper methods
+
+    def __row(self):
+        row = {}
+        for name, (low, total, high, count) in self.stats.items():
+            row[name + "_MIN"] = low if count else np.nan
+            row[name + "_MEAN"] = total / count if count else np.nan
+            row[name + "_MAX"] = high if count else np.nan
+            row[name + "_COUNT"] = count
+        return row
+
+    """
+    Method: add(values, timestamp)
+        Description:
+            Adds a row of values (dictionary of numbers keyed by
+            parameter) taken at the wall clock time timestamp.
+    """
+    def add(self, values, timestamp):
+        bucket = math.floor(timestamp / self.resolution) * self.resolution
+        started = bucket != self.bucket
+        if started:
+            self.bucket = bucket
+            self.stats = {}
+        for name, value in values.items():
+            stats = self.stats.setdefault(name, [np.inf, 0.0, -np.inf, 0])
+            if value is None or math.isnan(value):
+                continue
+            stats[0] = min(stats[0], value)
+            stats[1] += value
+            stats[2] = max(stats[2], value)
+            stats[3] += 1
+        if started:
+            self.history.append(self.__row(), bucket)
+        else:
+            self.history.replaceLast(self.__row())
+
+    """
+    Method: query(start, end, names)
+        Description:
+            Buckets overlapping the wall clock times start to end (None
+            for no bound), including the bucket being filled.
+        Arguments:
+            names: list of parameters whose aggregates are returned.
+        Returns:
+            data: dictionary of NumPy arrays keyed by TIME and by the
+                aggregate columns of names.
+    """
+    def query(self, start=None, end=None, names=[]):
+        columns = [name + "_" + aggregate for name in names
+                   for aggregate in AGGREGATES]
+        if start is not None:
+            start = math.floor(start / self.resolution) * self.resolution
+        if self.history.columns is None:
+            return dict((column, np.empty(0))
+                        for column in ["TIME"] + columns)
+        return self.history.query(start, end, columns)
+
+    def flush(self):
+        self.history.flush()
+
+    def close(self):
+        self.history.close()
+
+"""
+Class: RollupHistorian extends sbhistorian.Historian
+    Description:
+        Historian that also maintains, per device, the minimum, mean,
+        maximum and count of every parameter over buckets of each of the
+        resolutions (in directories rollup-<resolution> of the device).
+        Long ranges are read with summary, which picks the coarsest
+        resolution still giving the requested number of points, so that
+        plotting weeks of data reads a few thousand rows instead of
+        every sample.
+    Arguments:
+        root: directory of the historian (created when missing).
+        resolutions: bucket sizes in seconds.
+        chunkRows: rows per chunk file of the samples.
+        rollupRows: rows per chunk file of the rollups.
+"""
+class RollupHistorian(sbhistorian.Historian):
+    def __init__(self, root, resolutions=DEFAULT_RESOLUTIONS,
+                 chunkRows=65536, rollupRows=4096):
+        self.resolutions = sorted(resolutions)
+        self.rollupRows = rollupRows
+        self.rollups = {}
+        super(RollupHistorian, self).__init__(root, chunkRows)
+
+    # Private helper methods
+
+    def __summary(self, key, start, end, points, names):
+        history = self.devices.get(str(key))
+        if history is None:
+            raise KeyError(key)
+        if names is None:
+            names = history.columns or []
+        for name in names:
+            if name not in (history.columns or []):
+                raise KeyError(name)
+
+        chunks = [chunk for chunk in history.chunks if chunk[2]]
+        if not chunks:
+            return None, dict((column, np.empty(0)) for column in ["TIME"] +
+                              [name + "_" + aggregate for name in names
+                               for aggregate in AGGREGATES])
+        first = chunks[0][0] if start is None else start
+        last = chunks[-1][1] if end is None else end
+        for rollup in reversed(self.rollups[str(key)]):
+            buckets = (math.floor(last / rollup.resolution) -
+                       math.floor(first / rollup.resolution) + 1)
+            if buckets >= points:
+                return rollup.resolution, rollup.query(start, end, names)
+
+        samples = history.query(start, end, names)
+        data = {"TIME": samples["TIME"]}
+        for name in names:
+            values = samples[name]
+            for aggregate in AGGREGATES[:3]:
+                data[name + "_" + aggregate] = values
+            data[name + "_COUNT"] = (~np.isnan(values)).astype(float)
+        return None, data
+
+    def device(self, key):
+        with self.lock:
+            history = super(RollupHistorian, self).device(key)
+            key = str(key)
+            if key not in self.rollups:
+                self.rollups[key] = [
+                    DeviceRollup(os.path.join(history.path, "rollup-" +
+                                              str(resolution)),
+                                 resolution, self.rollupRows)
+                    for resolution in self.resolutions]
+            return history
+
+    """
+    Method: appendDevice(key, values, timestamp)
+        Description:
+            Appends one row of monitor data of a device and adds it to
+            its rollups, so that a row refused by the history (e.g. out
+            of time order) is left out of the rollups too. (Refer to
+            Historian.append.)
+    """
+    def appendDevice(self, key, values, timestamp):
+        with self.lock:
+            super(RollupHistorian, self).appendDevice(key, values,
+                                                      timestamp)
+            row = {}
+            for name in self.devices[str(key)].columns:
+                value = values.get(name)
+                row[name] = (float(value) if isinstance(
+                    value, numbers.Number) else np.nan)
+            for rollup in self.rollups[str(key)]:
+                rollup.add(row, timestamp)
+
+    """
+    Method: summary(key, start, end, points, names)
+        Description:
+            Minimum, mean, maximum and count of parameters of a device
+            between the wall clock times start and end, at the coarsest
+            resolution with at least points buckets over the range.
+            When no resolution is fine enough the samples themselves are
+            returned in the same form (with every aggregate equal to the
+            sample and counts of 1).
+        Arguments:
+            start, end: wall clock times (the first and last row of the
+                device when None).
+            points: number of points wanted over the range.
+            names: list of parameters (all when omitted).
+        Returns:
+            resolution: bucket size used in seconds (None for samples).
+            data: dictionary of NumPy arrays keyed by TIME and by
+                parameter + "_MIN", "_MEAN", "_MAX" and "_COUNT".
+        Raises:
+            KeyError: occurs when the device or a parameter does not
+                exist.
+    """
+    def summary(self, key, start=None, end=None, points=1000, names=None):
+        with self.lock:
+            return self.__summary(key, start, end, points, names)
+
+    def flush(self):
+        with self.lock:
+            super(RollupHistorian, self).flush()
+            for rollups in self.rollups.values():
+                for rollup in rollups:
+                    rollup.flush()
+
+    def close(self):
+        with self.lock:
+            super(RollupHistorian, self).close()
+            for rollups in self.rollups.values():
+                for rollup in rollups:
+                    rollup.close()
@@ -0,0 +1,174 @@
+"""
+    STARBURST Monitor History Rollups Test Suite
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+import sbrollup
+
+"""
+TestRollups Test Group Description:
+    This group of tests makes sure that rollups aggregate samples per
+    bucket as they arrive, and that summaries pick the coarsest
+    resolution giving the points asked for.
+
+    Test Count: 5
+"""
+class TestRollups(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.start = 360000.0
+        self.historian = sbrollup.RollupHistorian(self.root, chunkRows=256,
+                                                  rollupRows=64)
+        for i in range(720):
+            self.historian.append({"A": {"TIMESTAMP": self.start + 10 * i,
+                                         "VQPOW": float(i),
+                                         "LJTEMP": None if i % 2 else 300,
+                                         "NAME": "AntennaA"}})
+
+    def tearDown(self):
+        self.historian.close()
+        shutil.rmtree(self.root)
+
+    """
+    Test - test_resolutionPicked:
+        Given two hours of samples every 10s,
+        Then summaries asking for 2, 100, 1000 and 10000 points use the
+            1h, 1min and 1s rollups and the samples, and the aggregates
+            of every bucket (including the one being filled) are right.
+    """
+    def test_resolutionPicked(self):
+        resolution, data = self.historian.summary("A", points=2,
+                                                  names=["VQPOW"])
+        self.assertEqual(resolution, 3600)
+        self.assertEqual(list(data["TIME"]),
+                         [self.start, self.start + 3600])
+        self.assertEqual(list(data["VQPOW_MIN"]), [0, 360])
+        self.assertEqual(list(data["VQPOW_MAX"]), [359, 719])
+        self.assertEqual(list(data["VQPOW_MEAN"]), [179.5, 539.5])
+        self.assertEqual(list(data["VQPOW_COUNT"]), [360, 360])
+
+        resolution, data = self.historian.summary("A", points=100)
+        self.assertEqual(resolution, 60)
+        self.assertEqual(len(data["TIME"]), 120)
+        self.assertTrue((data["VQPOW_COUNT"] == 6).all())
+        self.assertTrue((data["LJTEMP_COUNT"] == 3).all())
+        self.assertTrue((data["LJTEMP_MEAN"] == 300).all())
+
+        self.assertEqual(self.historian.summary("A", points=1000)[0], 1)
+        resolution, data = self.historian.summary("A", points=10000,
+                                                  names=["LJTEMP"])
+        self.assertEqual(resolution, None)
+        self.assertEqual(len(data["TIME"]), 720)
+        self.assertEqual(data["LJTEMP_COUNT"].sum(), 360)
+
+        resolution, data = self.historian.summary(
+            "A", self.start + 600, self.start + 1200, 5, ["VQPOW"])
+        self.assertEqual(resolution, 60)
+        self.assertEqual(list(data["VQPOW_MIN"]), list(range(60, 126, 6)))
+        self.assertRaises(KeyError, self.historian.summary, "A",
+                          names=["NAME"])
+
+    """
+    Test - test_reopened:
+        Given the historian closed and reopened,
+        Then the buckets written stay queryable and new samples go on
+            filling new buckets.
+    """
+    def test_reopened(self):
+        self.historian.close()
+        self.historian = sbrollup.RollupHistorian(self.root)
+        self.historian.append({"A": {"TIMESTAMP": self.start + 7200,
+                                     "VQPOW": 1000.0, "LJTEMP": 301}})
+
+        resolution, data = self.historian.summary("A", points=3,
+                                                  names=["VQPOW"])
+        self.assertEqual(resolution, 3600)
+        self.assertEqual(list(data["VQPOW_MAX"]), [359, 719, 1000])
+        self.assertEqual(self.historian.device("A").rows(), 721)
+
+    """
+    Test - test_reopenedMidBucket:
+        Given a historian left without closing (as after a crash) in the
+            middle of its buckets and reopened,
+        Then the new samples go on filling the same buckets, with one row
+            per bucket aggregating the samples from before and after.
+    """
+    def test_reopenedMidBucket(self):
+        root = os.path.join(self.root, "mid")
+        historian = sbrollup.RollupHistorian(root)
+        for i in range(10):
+            historian.append({"A": {"TIMESTAMP": 7200.0 + i,
+                                    "VQPOW": float(i)}})
+        historian.flush()
+
+        historian = sbrollup.RollupHistorian(root)
+        for i in range(10, 20):
+            historian.append({"A": {"TIMESTAMP": 7200.0 + i,
+                                    "VQPOW": float(i)}})
+        resolution, data = historian.summary("A", points=1)
+        self.assertEqual(resolution, 3600)
+        self.assertEqual(list(data["TIME"]), [7200])
+        self.assertEqual(list(data["VQPOW_COUNT"]), [20])
+        self.assertEqual(list(data["VQPOW_MEAN"]), [9.5])
+        self.assertEqual(list(data["VQPOW_MIN"]), [0])
+        self.assertEqual(list(data["VQPOW_MAX"]), [19])
+        historian.close()
+
+    """
+    Test - test_staleRowsSkipped:
+        Given one sample followed by three sweeps where the device missed
+            its deadline (repeating the sample flagged stale),
+        Then the sample is stored and aggregated once.
+    """
+    def test_staleRowsSkipped(self):
+        historian = sbrollup.RollupHistorian(os.path.join(self.root,
+                                                          "stale"))
+        historian.append({"A": {"TIMESTAMP": 100.0, "V": 1.0,
+                                "STALE": False}})
+        for i in range(3):
+            historian.append({"A": {"TIMESTAMP": 100.0, "V": 1.0,
+                                    "STALE": True}}, 101.0 + i)
+        self.assertEqual(list(historian.query("A")["TIME"]), [100.0])
+        resolution, data = historian.summary("A", points=1, names=["V"])
+        self.assertEqual(list(data["V_COUNT"]), [1])
+        historian.close()
+
+    """
+    Test - test_refusedRowNotRolledUp:
+        Given a snapshot where one device is out of time order,
+        Then a ValueError is raised, and the rollups of every device
+            still hold exactly the rows of its history.
+    """
+    def test_refusedRowNotRolledUp(self):
+        historian = sbrollup.RollupHistorian(os.path.join(self.root,
+                                                          "order"))
+        historian.append({"A": {"TIMESTAMP": 200.0, "V": 1.0},
+                          "B": {"TIMESTAMP": 200.0, "V": 1.0}})
+        self.assertRaises(ValueError, historian.append,
+                          {"A": {"TIMESTAMP": 300.0, "V": 2.0},
+                           "B": {"TIMESTAMP": 100.0, "V": 2.0}})
+        for key in ["A", "B"]:
+            times = list(historian.query(key)["TIME"])
+            for rollup in historian.rollups[key]:
+                data = rollup.query(names=["V"])
+                self.assertEqual(sum(data["V_COUNT"]), len(times))
+            self.assertEqual(list(historian.rollups[key][0].query()["TIME"]),
+                             times)
+        historian.close()
+
+
+# Main Method
+if __name__ == '__main__':
+    testGroups = [TestRollups]
+    for tG in testGroups:
+        print "\nTesting: " + str(tG.__name__)
+        suite = unittest.TestLoader().loadTestsFromTestCase(
+            tG)
+        unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,150 @@
+"""
+    STARBURST Band Hopping Scheduler
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import sbio
+import threading
+import time
+import collections
+
+"""
+Class: BandSwitch extends namedtuple
+    Description:
+        Record of one scheduled band switch.
+    Fields:
+        band: band switched to.
+        scheduled: wall clock time the switch was scheduled for.
+        deadline: sbio.monotonic() time the switch was scheduled for.
+        sent: sbio.monotonic() time the register writes were sent.
+        done: sbio.monotonic() time every device had been written.
+        lateness: seconds between deadline and sent.
+        timestamp: wall clock time at which the writes were sent.
+        error: exception raised sending the writes (None on success).
+        ready: value returned by send, e.g. the sbio.monotonic() time the
+            switch has settled (None on failure).
+"""
+BandSwitch = collections.namedtuple("BandSwitch", [
+    "band", "scheduled", "deadline", "sent", "done", "lateness",
+    "timestamp", "error", "ready"])
+
+"""
+Class: BandScheduler extends object
+    Description:
+        Background thread switching bands on a fixed timetable. The
+        writes of every entry are prepared before the thread starts, and
+        the wall clock times are turned into deadlines on the monotonic
+        clock once (when starting), so that neither compiling bands nor
+        wall clock adjustments delay a switch. The thread sleeps until
+        spin seconds before each deadline and busy waits the rest, then
+        sends the writes. Entries whose time has already passed are sent
+        at once (their lateness shows by how much). An entry whose writes
+        fail is recorded with its error and the timetable goes on.
+    Arguments:
+        entries: list of (wall clock time, band) pairs, in any order.
+        stage: callable taking a band and returning the prepared writes.
+            Called for every entry when the scheduler is created, so that
+            invalid bands raise there.
+        send: callable taking the prepared writes of an entry and
+            applying them. Its return value is recorded as ready.
+        name: name of the thread.
+        spin: seconds busy waited before each deadline.
+"""
+class BandScheduler(object):
+    def __init__(self, entries, stage, send, name="sbschedule", spin=0.002):
+        self.entries = sorted(entries, key=lambda entry: entry[0])
+        self.staged = [stage(band) for scheduled, band in self.entries]
+        self.send = send
+        self.name = name
+        self.spin = spin
+        self.switches = []
+        self.deadlines = None
+        self.thread = None
+        self.stopping = threading.Event()
+
+    def __waitUntil(self, deadline):
+        while True:
+            remaining = deadline - sbio.monotonic()
+            if remaining <= 0:
+                return not self.stopping.is_set()
+            if remaining > self.spin:
+                if self.stopping.wait(remaining - self.spin):
+                    return False
+            elif self.stopping.is_set():
+                return False
+
+    def __run(self):
+        for (scheduled, band), staged, deadline in zip(
+                self.entries, self.staged, self.deadlines):
+            if not self.__waitUntil(deadline):
+                return
+            sent = sbio.monotonic()
+            error = None
+            ready = None
+            try:
+                ready = self.send(staged)
+            except Exception as e:
+                error = e
+            self.switches.append(BandSwitch(
+                band, scheduled, deadline, sent, sbio.monotonic(),
+                sent - deadline, scheduled + sent - deadline, error, ready))
+
+    """
+    Method: start()
+        Description:
+            Converts the entry times into monotonic deadlines and starts
+            the timetable. Does nothing if it is already running.
+    """
+    def start(self):
+        if self.running():
+            return
+        offset = sbio.monotonic() - time.time()
+        self.deadlines = [scheduled + offset
+                          for scheduled, band in self.entries]
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.__run, name=self.name)
+        self.thread.daemon = True
+        self.thread.start()
+
+    """
+    Method: stop(timeout)
+        Description:
+            Cancels the switches not made yet and waits up to timeout
+            seconds for a switch in progress to finish.
+    """
+    def stop(self, timeout=None):
+        self.stopping.set()
+        self.wait(timeout)
+
+    """
+    Method: wait(timeout)
+        Description:
+            Waits up to timeout seconds for the timetable to finish.
+        Returns:
+            finished: True when no switch is left to make.
+    """
+    def wait(self, timeout=None):
+        if self.thread is not None:
+            self.thread.join(timeout)
+        return not self.running()
+
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    """
+    Method: summary()
+        Description:
+            Count, errors, mean and maximum lateness in seconds of the
+            switches made so far.
+    """
+    def summary(self):
+        switches = list(self.switches)
+        if not switches:
+            return {"count": 0, "errors": 0}
+        lateness = [switch.lateness for switch in switches]
+        return {"count": len(switches),
+                "errors": len([switch for switch in switches
+                               if switch.error is not None]),
+                "mean": sum(lateness) / len(lateness),
+                "max": max(lateness)}
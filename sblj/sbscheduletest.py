@@ -0,0 +1,101 @@
+"""
+    STARBURST Band Hopping Scheduler Test Suite
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import unittest
+import time
+import sbio
+import sbschedule
+
+"""
+TestBandScheduler Test Group Description:
+    This group of tests makes sure that the scheduler sends prepared
+    writes on their deadlines, in time order, and records each switch.
+
+    Test Count: 3
+"""
+class TestBandScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.sent = []
+
+    def send(self, staged):
+        if staged == "fail":
+            raise ValueError("bad band")
+        self.sent.append((staged, sbio.monotonic()))
+
+    """
+    Test - test_switchesOnDeadlines:
+        Given three entries 40ms apart listed out of order,
+        Then they are sent in time order within a few milliseconds of
+            their deadlines, each recorded with its lateness.
+    """
+    def test_switchesOnDeadlines(self):
+        now = time.time()
+        entries = [(now + 0.12, 3), (now + 0.04, 1), (now + 0.08, 2)]
+        scheduler = sbschedule.BandScheduler(entries, lambda band: band * 10,
+                                             self.send)
+        scheduler.start()
+        self.assertTrue(scheduler.wait(1))
+
+        self.assertEqual([staged for staged, sent in self.sent],
+                         [10, 20, 30])
+        self.assertEqual([switch.band for switch in scheduler.switches],
+                         [1, 2, 3])
+        for switch in scheduler.switches:
+            self.assertTrue(0 <= switch.lateness < 0.01)
+            self.assertTrue(switch.error is None)
+            self.assertAlmostEqual(switch.timestamp, switch.scheduled,
+                                   delta=0.01)
+        self.assertEqual(scheduler.summary()["count"], 3)
+
+    """
+    Test - test_stagedBeforeStart:
+        Given a band that cannot be staged,
+        Then creating the scheduler raises, and a band whose writes fail
+            is recorded with its error while the others still switch.
+    """
+    def test_stagedBeforeStart(self):
+        def stage(band):
+            if band is None:
+                raise KeyError(band)
+            return band
+
+        now = time.time()
+        self.assertRaises(KeyError, sbschedule.BandScheduler,
+                          [(now, 1), (now, None)], stage, self.send)
+
+        scheduler = sbschedule.BandScheduler(
+            [(now - 1, "fail"), (now + 0.02, "ok")], stage, self.send)
+        scheduler.start()
+        self.assertTrue(scheduler.wait(1))
+        self.assertTrue(isinstance(scheduler.switches[0].error, ValueError))
+        self.assertTrue(scheduler.switches[0].lateness >= 1)
+        self.assertEqual([staged for staged, sent in self.sent], ["ok"])
+        self.assertEqual(scheduler.summary()["errors"], 1)
+
+    """
+    Test - test_stop:
+        Given a timetable with an entry far in the future,
+        Then stop cancels it without sending anything.
+    """
+    def test_stop(self):
+        scheduler = sbschedule.BandScheduler([(time.time() + 60, 1)],
+                                             lambda band: band, self.send)
+        scheduler.start()
+        scheduler.stop(1)
+        self.assertFalse(scheduler.running())
+        self.assertEqual(self.sent, [])
+        self.assertEqual(scheduler.switches, [])
+
+
+# Main Method
+if __name__ == '__main__':
+    testGroups = [TestBandScheduler]
+    for tG in testGroups:
+        print "\nTesting: " + str(tG.__name__)
+        suite = unittest.TestLoader().loadTestsFromTestCase(
+            tG)
+        unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,422 @@
+"""
+    STARBURST Local Monitor and Control Service
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import sbio
+import sblj
+import sbpool
+import collections
+import numbers
+import json
+import os
+import socket
+import stat
+import threading
+try:
+    import queue
+    import socketserver
+except ImportError:
+    import Queue as queue
+    import SocketServer as socketserver
+
+# Commands of the service and their parameters:
+#     MONITOR: max_age (seconds, the service maxAge when omitted) and
+#         fields (as for OVROStarburst.getMonitorData).
+#     BAND: band.
+#     NOISE: on (True switches every antenna to the noise source with
+#         the noise source on, False back to the sky).
+#     ATTEN: antenna and levels (dictionary of levels keyed by
+#         attenuator).
+
+MONITOR = "MONITOR"
+BAND = "BAND"
+NOISE = "NOISE"
+ATTEN = "ATTEN"
+COMMANDS = [MONITOR, BAND, NOISE, ATTEN]
+
+"""
+Class: ServiceError extends Exception
+    Description:
+        Custom error for a command the service could not carry out. Holds
+        the error reported by the service.
+"""
+class ServiceError(Exception):
+    def __init__(self, error):
+        self.error = error
+
+    def __str__(self):
+        return "Service error: " + str(self.error)
+
+"""
+Class: Pending extends object
+    Description:
+        A command waiting for the dispatcher of the service, and its reply.
+"""
+class Pending(object):
+    def __init__(self, request):
+        self.request = request
+        self.reply = None
+        self.finished = threading.Event()
+
+    def finish(self, result=None, error=None):
+        if error is None:
+            self.reply = {"ok": True, "result": result}
+        else:
+            self.reply = {"ok": False,
+                          "error": type(error).__name__ + ": " + str(error)}
+        self.reply["id"] = self.request.get("id")
+        self.finished.set()
+
+"""
+Class: StarburstService extends object
+    Description:
+        Local service owning the LabJacks of an OVROStarburst system, so
+        that any number of tools can share them. Clients send one JSON
+        object per line ({"id": ..., "op": ..., parameters}) and get one
+        JSON object per line back ({"id": ..., "ok": ..., "result": ...}
+        or "error"). Connections are served by their own threads, but
+        every command goes through one dispatcher, which takes all
+        commands arriving within window seconds of each other as a batch:
+            MONITOR commands share one getMonitorData call (served from
+                the latest snapshot when fresh enough).
+            Of BAND and NOISE commands only the last one is applied.
+            ATTEN commands are merged per antenna and applied with one
+                write per antenna, all antennas concurrently. Commands
+                sent before the last BAND command of the batch are
+                overridden by it.
+        Every command of a batch gets the outcome of the write that
+        applied it.
+    Arguments:
+        ovro: OVROStarburst system.
+        address: (host, port) pair to serve TCP on (port 0 picks a free
+            port), or the path of a Unix socket (a stale socket left at
+            the path is removed).
+        maxAge: default max_age of MONITOR commands in seconds.
+        window: seconds commands are gathered for after the first one of
+            a batch arrives.
+    Attributes:
+        address: address the service is bound to.
+        batches: number of batches dispatched.
+"""
+class StarburstService(object):
+    def __init__(self, ovro, address=("127.0.0.1", 0), maxAge=1.0,
+                 window=0.005):
+        self.ovro = ovro
+        self.maxAge = maxAge
+        self.window = window
+        self.pending = queue.Queue()
+        self.batches = 0
+        self.dispatcher = None
+        self.thread = None
+
+        service = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in iter(self.rfile.readline, b""):
+                    if not line.strip():
+                        continue
+                    reply = service.submit(line)
+                    self.wfile.write(json.dumps(reply).encode("utf-8") +
+                                     b"\n")
+                    self.wfile.flush()
+
+        if isinstance(address, tuple):
+            serverClass = socketserver.ThreadingTCPServer
+        else:
+            serverClass = socketserver.ThreadingUnixStreamServer
+            self.__removeStale(address)
+        serverClass.allow_reuse_address = True
+        serverClass.daemon_threads = True
+        self.server = serverClass(address, Handler)
+        self.address = self.server.server_address
+
+    # Private helper methods
+
+    def __removeStale(self, path):
+        # A socket left behind by a service that did not stop is removed,
+        # one still being served is kept (so binding fails).
+        try:
+            if not stat.S_ISSOCK(os.stat(path).st_mode):
+                return
+        except OSError:
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except socket.error:
+            os.remove(path)
+        finally:
+            probe.close()
+
+    def __check(self, request):
+        op = request.get("op")
+        if op not in COMMANDS:
+            raise ValueError("Unknown command " + str(op) + ".")
+        if op == MONITOR:
+            maxAge = request.get("max_age", self.maxAge)
+            fields = request.get("fields")
+            if not isinstance(maxAge, numbers.Number):
+                raise ValueError("max_age must be a number.")
+            if fields is not None and not (
+                    isinstance(fields, dict) and
+                    all(isinstance(names, list)
+                        for names in fields.values())):
+                raise ValueError("fields must map devices to lists.")
+        elif op == BAND:
+            if "band" not in request:
+                raise ValueError("BAND needs a band.")
+        elif op == NOISE:
+            if not isinstance(request.get("on"), bool):
+                raise ValueError("NOISE needs on (true or false).")
+        elif op == ATTEN:
+            levels = request.get("levels")
+            if request.get("antenna") not in self.ovro.ljAntennas:
+                raise KeyError(request.get("antenna"))
+            if not isinstance(levels, dict):
+                raise ValueError("ATTEN needs levels keyed by attenuator.")
+            for input, level in levels.items():
+                if input not in sblj.AntennaLJ.attDict:
+                    raise KeyError(input)
+                if not isinstance(level, numbers.Number):
+                    raise ValueError("Levels must be numbers.")
+
+    def __gather(self):
+        batch = [self.pending.get()]
+        if batch[0] is None:
+            return None
+        deadline = sbio.monotonic() + self.window
+        while True:
+            remaining = deadline - sbio.monotonic()
+            try:
+                if remaining > 0:
+                    pending = self.pending.get(True, remaining)
+                else:
+                    pending = self.pending.get_nowait()
+            except queue.Empty:
+                return batch
+            if pending is None:
+                self.pending.put(None)
+                return batch
+            batch.append(pending)
+
+    def __apply(self, commands, func):
+        if not commands:
+            return
+        try:
+            result = func()
+        except Exception as e:
+            for pending in commands:
+                pending.finish(error=e)
+            return
+        for pending in commands:
+            pending.finish(result)
+
+    def __monitor(self, commands):
+        if not commands:
+            return
+        try:
+            data = self.ovro.getMonitorData(max_age=min(
+                pending.request.get("max_age", self.maxAge)
+                for pending in commands))
+        except Exception as e:
+            for pending in commands:
+                pending.finish(error=e)
+            return
+        for pending in commands:
+            fields = pending.request.get("fields")
+            try:
+                if fields is None:
+                    result = data
+                else:
+                    result = dict((key, dict(
+                        (name, data[key][name]) for name in
+                        names + ["TIMESTAMP"]))
+                        for key, names in fields.items())
+            except KeyError as e:
+                pending.finish(error=e)
+                continue
+            pending.finish(result)
+
+    def __attenuate(self, commands):
+        if not commands:
+            return
+        levels = collections.OrderedDict()
+        for pending in commands:
+            antenna = pending.request["antenna"]
+            levels.setdefault(antenna, {}).update(pending.request["levels"])
+        calls = {}
+        for antenna, values in levels.items():
+            calls[antenna] = (lambda lj=self.ovro.ljAntennas[antenna],
+                              values=values: lj.setAttenuators(values))
+        # Every command gets the outcome of the write of its antenna.
+        try:
+            self.ovro.workers.fanOut(calls)
+            errors = {}
+        except sbpool.MultiDeviceError as e:
+            errors = e.errors
+        for pending in commands:
+            pending.finish(error=errors.get(pending.request["antenna"]))
+
+    def __dispatch(self, batch):
+        commands = dict((op, []) for op in COMMANDS)
+        for pending in batch:
+            commands[pending.request["op"]].append(pending)
+
+        bands = commands[BAND]
+        attens = commands[ATTEN]
+        if bands:
+            # The band sets every attenuator, so earlier ATTEN commands
+            # are overridden by it.
+            last = batch.index(bands[-1])
+            overridden = [pending for pending in attens
+                          if batch.index(pending) < last]
+            attens = [pending for pending in attens
+                      if batch.index(pending) > last]
+            self.__apply(bands + overridden, lambda: self.ovro.setToBand(
+                bands[-1].request["band"]))
+        self.__attenuate(attens)
+
+        noises = commands[NOISE]
+        if noises:
+            on = noises[-1].request["on"]
+            self.__apply(noises, self.ovro.selectNoiseSource if on
+                         else self.ovro.selectRFSource)
+        self.__monitor(commands[MONITOR])
+
+    def __run(self):
+        while True:
+            batch = self.__gather()
+            if batch is None:
+                return
+            self.batches += 1
+            try:
+                self.__dispatch(batch)
+            except Exception as e:
+                for pending in batch:
+                    if not pending.finished.is_set():
+                        pending.finish(error=e)
+
+    """
+    Method: submit(line)
+        Description:
+            Queues one request line (JSON) for the dispatcher and waits
+            for its reply. Requests with an unknown command or missing or
+            invalid parameters get an error at once, without being
+            queued.
+        Returns:
+            reply: dictionary with id, ok and result or error.
+    """
+    def submit(self, line):
+        try:
+            request = json.loads(line.decode("utf-8"))
+            if not isinstance(request, dict):
+                raise ValueError("Requests must be JSON objects.")
+        except ValueError as e:
+            pending = Pending({})
+            pending.finish(error=e)
+            return pending.reply
+        pending = Pending(request)
+        try:
+            self.__check(request)
+        except (KeyError, ValueError) as e:
+            pending.finish(error=e)
+            return pending.reply
+        self.pending.put(pending)
+        pending.finished.wait()
+        return pending.reply
+
+    """
+    Method: start()
+        Description:
+            Starts the dispatcher and serves connections in the
+            background.
+    """
+    def start(self):
+        self.dispatcher = threading.Thread(target=self.__run,
+                                           name="sbservice-dispatch")
+        self.dispatcher.daemon = True
+        self.dispatcher.start()
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       name="sbservice")
+        self.thread.daemon = True
+        self.thread.start()
+
+    """
+    Method: stop()
+        Description:
+            Stops serving and closes the socket once the commands queued
+            are dispatched. The path of a Unix socket is removed.
+    """
+    def stop(self):
+        if self.thread is not None:
+            self.server.shutdown()
+            self.thread.join()
+            self.thread = None
+        self.server.server_close()
+        if not isinstance(self.address, tuple) and \
+                os.path.exists(self.address):
+            os.remove(self.address)
+        if self.dispatcher is not None:
+            self.pending.put(None)
+            self.dispatcher.join()
+            self.dispatcher = None
+
+"""
+Class: ServiceClient extends object
+    Description:
+        Connection to a StarburstService.
+    Arguments:
+        address: (host, port) pair or Unix socket path of the service.
+        timeout: seconds to wait for replies.
+"""
+class ServiceClient(object):
+    def __init__(self, address, timeout=10.0):
+        family = socket.AF_INET if isinstance(address, tuple) \
+            else socket.AF_UNIX
+        self.socket = socket.socket(family, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        self.socket.connect(address)
+        self.file = self.socket.makefile("rb")
+        self.nextId = 0
+
+    """
+    Method: call(op, **params)
+        Description:
+            Sends one command and waits for its reply.
+        Returns:
+            result: result of the command.
+        Raises:
+            ServiceError: occurs when the service reports an error.
+    """
+    def call(self, op, **params):
+        self.nextId += 1
+        params.update({"id": self.nextId, "op": op})
+        self.socket.sendall(json.dumps(params).encode("utf-8") + b"\n")
+        reply = json.loads(self.file.readline().decode("utf-8"))
+        if not reply["ok"]:
+            raise ServiceError(reply["error"])
+        return reply["result"]
+
+    def monitor(self, max_age=None, fields=None):
+        params = {}
+        if max_age is not None:
+            params["max_age"] = max_age
+        if fields is not None:
+            params["fields"] = fields
+        return self.call(MONITOR, **params)
+
+    def setBand(self, band):
+        return self.call(BAND, band=band)
+
+    def setNoise(self, on):
+        return self.call(NOISE, on=on)
+
+    def setAttenuators(self, antenna, levels):
+        return self.call(ATTEN, antenna=antenna, levels=levels)
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
@@ -0,0 +1,227 @@
+"""
+    STARBURST Local Monitor and Control Service Test Suite
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import unittest
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import sbio
+import sbbands
+import sbovro
+import sbsim
+import sbservice
+
+"""
+TestService Test Group Description:
+    This group of tests makes sure that clients connected over loopback
+    are served monitor data and commands, and that commands arriving
+    together are coalesced into one write per device.
+
+    Test Count: 5
+"""
+class TestService(unittest.TestCase):
+
+    def setUp(self):
+        sbsim.backend.reset()
+        self.ovroObj = sbovro.OVROStarburst("LONoise", "AntennaA",
+                                            "AntennaB", "ETHERNET", "SIM")
+        self.service = sbservice.StarburstService(self.ovroObj, window=0.2)
+        self.service.start()
+
+    def tearDown(self):
+        self.service.stop()
+        self.ovroObj.endConnection()
+
+    """
+    Test - test_commands:
+        Given a client connected to the service,
+        Then monitor data, band, noise and attenuation commands are carried
+            out, and bad commands get errors without stopping the
+            service.
+    """
+    def test_commands(self):
+        client = sbservice.ServiceClient(self.service.address)
+        try:
+            data = client.monitor(max_age=0)
+            self.assertEqual(sorted(data.keys()), ["A", "B", "LONOISE"])
+            data = client.monitor(fields={"A": ["VQPOW"]})
+            self.assertEqual(sorted(data["A"].keys()), ["TIMESTAMP", "VQPOW"])
+
+            client.setBand(1)
+            attens = sbbands.BandStore().load()[1]["ATTEN"]
+            data = client.monitor(max_age=0)
+            self.assertEqual(data["A"]["HIATTEN"], attens["HI"])
+            self.assertEqual(data["LONOISE"]["LOFREQ"][1], 0)
+            client.setNoise(True)
+            self.assertTrue(sbsim.backend.noiseSourceOn())
+            client.setNoise(False)
+            self.assertFalse(sbsim.backend.noiseSourceOn())
+            client.setAttenuators("B", {"HI": 4})
+            self.assertEqual(
+                sbsim.backend.devices["AntennaB"].attenuation["HI"], 8)
+
+            self.assertRaises(sbservice.ServiceError, client.call, "RESET")
+            self.assertRaises(sbservice.ServiceError,
+                              client.setAttenuators, "C", {"HI": 4})
+            self.assertRaises(sbservice.ServiceError, client.setBand, 99)
+            self.assertEqual(sorted(client.monitor().keys()),
+                             ["A", "B", "LONOISE"])
+        finally:
+            client.close()
+
+    """
+    Test - test_coalesced:
+        Given four clients setting different attenuators of antenna A at
+            the same time,
+        Then every client gets its reply and all four levels are set with
+            one LabJack call.
+    """
+    def test_coalesced(self):
+        clients = [sbservice.ServiceClient(self.service.address)
+                   for i in range(4)]
+        levels = [{"VQ": 1}, {"VI": 2}, {"HQ": 3}, {"HI": 4}]
+        replies = []
+        threads = [threading.Thread(target=lambda c=c, l=l: replies.append(
+            c.setAttenuators("A", l))) for c, l in zip(clients, levels)]
+        batches = self.service.batches
+        with sbio.measureIO({"A": self.ovroObj.ljA}) as cost:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        for client in clients:
+            client.close()
+
+        self.assertEqual(len(replies), 4)
+        self.assertEqual(self.service.batches, batches + 1)
+        self.assertEqual(cost["A"].calls, 1)
+        self.assertEqual(sbsim.backend.devices["AntennaA"].attenuation,
+                         {"VQ": 2, "VI": 4, "HQ": 6, "HI": 8})
+
+    """
+    Test - test_badRequestsInBatch:
+        Given clients sending good commands and, in the same batch, a
+            NOISE without on and ATTEN commands without levels or with an
+            unknown attenuator,
+        Then only the bad commands get errors and the good ones are
+            carried out.
+    """
+    def test_badRequestsInBatch(self):
+        calls = [lambda c: c.call(sbservice.NOISE),
+                 lambda c: c.call(sbservice.ATTEN, antenna="A"),
+                 lambda c: c.setAttenuators("A", {"XX": 1}),
+                 lambda c: c.setAttenuators("A", {"HI": 4}),
+                 lambda c: c.monitor(fields={"A": ["VQPOW"]})]
+        clients = [sbservice.ServiceClient(self.service.address)
+                   for call in calls]
+        outcomes = {}
+
+        def run(i):
+            try:
+                outcomes[i] = calls[i](clients[i])
+            except sbservice.ServiceError as e:
+                outcomes[i] = e
+
+        threads = [threading.Thread(target=run, args=(i,))
+                   for i in range(len(calls))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for client in clients:
+            client.close()
+
+        for i in range(3):
+            self.assertTrue(isinstance(outcomes[i], sbservice.ServiceError))
+        self.assertFalse(isinstance(outcomes[3], sbservice.ServiceError))
+        self.assertEqual(sorted(outcomes[4]["A"].keys()),
+                         ["TIMESTAMP", "VQPOW"])
+        self.assertEqual(
+            sbsim.backend.devices["AntennaA"].attenuation["HI"], 8)
+
+    """
+    Test - test_attenuatorFailurePerAntenna:
+        Given ATTEN commands for antennas A and B in the same batch, and
+            antenna B losing its connection,
+        Then only the command for B gets an error and A is written.
+    """
+    def test_attenuatorFailurePerAntenna(self):
+        self.ovroObj.ljAntennas["B"].handle = None
+        clients = [sbservice.ServiceClient(self.service.address)
+                   for i in range(2)]
+        outcomes = {}
+
+        def run(key, client):
+            try:
+                outcomes[key] = client.setAttenuators(key, {"HI": 4})
+            except sbservice.ServiceError as e:
+                outcomes[key] = e
+
+        threads = [threading.Thread(target=run, args=(key, client))
+                   for key, client in zip(["A", "B"], clients)]
+        batches = self.service.batches
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for client in clients:
+            client.close()
+
+        self.assertEqual(self.service.batches, batches + 1)
+        self.assertEqual(outcomes["A"], None)
+        self.assertTrue(isinstance(outcomes["B"], sbservice.ServiceError))
+        self.assertEqual(
+            sbsim.backend.devices["AntennaA"].attenuation["HI"], 8)
+
+    """
+    Test - test_unixSocket:
+        Given a service on a Unix socket stopped, a stale socket left at
+            the path, and a service still running on it,
+        Then the path is removed by stop, a service starts again on the
+            stale path, and binding over a running service fails.
+    """
+    def test_unixSocket(self):
+        root = tempfile.mkdtemp()
+        path = os.path.join(root, "sb.sock")
+        try:
+            service = sbservice.StarburstService(self.ovroObj, path)
+            service.start()
+            client = sbservice.ServiceClient(path)
+            self.assertEqual(sorted(client.monitor().keys()),
+                             ["A", "B", "LONOISE"])
+            client.close()
+            service.stop()
+            self.assertFalse(os.path.exists(path))
+
+            stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            stale.bind(path)
+            stale.close()
+            service = sbservice.StarburstService(self.ovroObj, path)
+            service.start()
+            try:
+                self.assertRaises(socket.error, sbservice.StarburstService,
+                                  self.ovroObj, path)
+                client = sbservice.ServiceClient(path)
+                self.assertEqual(sorted(client.monitor().keys()),
+                                 ["A", "B", "LONOISE"])
+                client.close()
+            finally:
+                service.stop()
+            self.assertFalse(os.path.exists(path))
+        finally:
+            shutil.rmtree(root)
+
+
+# Main Method
+if __name__ == '__main__':
+    testGroups = [TestService]
+    for tG in testGroups:
+        print "\nTesting: " + str(tG.__name__)
+        suite = unittest.TestLoader().loadTestsFromTestCase(
+            tG)
+        unittest.TextTestRunner(verbosity=2).run(suite)
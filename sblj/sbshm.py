@@ -0,0 +1,274 @@
+"""
+    STARBURST Shared Memory Snapshot Bus
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import os
+import json
+import mmap
+import numbers
+import struct
+import tempfile
+import threading
+import time
+import numpy as np
+
+# File header: magic, then the length of the JSON layout following it.
+
+MAGIC = b"SBSHM001"
+HEADER = struct.Struct("<8sI")
+
+"""
+Class: TornReadError extends Exception
+    Description:
+        Custom error for a record that stayed in the middle of a write
+        for every attempt to read it (e.g. after the writer died while
+        publishing).
+"""
+class TornReadError(Exception):
+    def __init__(self, key):
+        self.key = key
+
+    def __str__(self):
+        return ("Record of " + str(self.key) + " is being written " +
+                "(or its writer stopped while publishing).")
+
+"""
+Method: defaultPath(name)
+    Description:
+        Path of a bus file named name, in /dev/shm when available (so
+        that the pages never touch a disk) and in the temporary directory
+        otherwise.
+"""
+def defaultPath(name="starburst"):
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") \
+        else tempfile.gettempdir()
+    return os.path.join(directory, name + ".sbshm")
+
+"""
+Method: layoutOf(data)
+    Description:
+        Layout of the records of a snapshot: a dictionary keyed by device
+        of the sorted names of its numeric parameters (TIMESTAMP
+        excluded, it is stored separately).
+"""
+def layoutOf(data):
+    return dict((key, sorted(name for name, value in values.items()
+                             if name != "TIMESTAMP" and
+                             isinstance(value, numbers.Number)))
+                for key, values in data.items())
+
+# Private helper: offsets of the records of a layout. Every record is a
+# uint64 sequence number followed by TIMESTAMP and its fields as float64.
+
+def _records(layout, start):
+    records = []
+    offset = start + (-start) % 8
+    for key in sorted(layout):
+        fields = list(layout[key])
+        records.append((key, fields, offset))
+        offset += 8 * (2 + len(fields))
+    return records, offset
+
+"""
+Class: SnapshotRecord extends object
+    Description:
+        Seqlock protected record of one device in a bus file. The writer
+        makes the sequence number odd, writes the values and makes it even
+        again. Readers copy the values between two reads of an even
+        and equal sequence number, and retry otherwise, so that they never
+        take a lock or hold up the writer. (Readers only make a system
+        call, sleeping briefly, when the writer was preempted in the
+        middle of a write, so that it gets the CPU back.)
+"""
+class SnapshotRecord(object):
+    def __init__(self, buffer, key, fields, offset):
+        self.key = key
+        self.fields = fields
+        self.sequence = np.ndarray((1,), np.uint64, buffer=buffer,
+                                   offset=offset)
+        self.values = np.ndarray((1 + len(fields),), np.float64,
+                                 buffer=buffer, offset=offset + 8)
+        self.index = dict((name, i + 1) for i, name in enumerate(fields))
+
+    def write(self, values, timestamp):
+        row = np.full(len(self.values), np.nan)
+        row[0] = timestamp
+        for name, value in values.items():
+            i = self.index.get(name)
+            if i is not None and isinstance(value, numbers.Number):
+                row[i] = value
+        self.sequence[0] += np.uint64(1)
+        self.values[:] = row
+        self.sequence[0] += np.uint64(1)
+
+    def read(self, retries=10000):
+        for i in range(retries):
+            before = int(self.sequence[0])
+            if before % 2:
+                # Give the CPU to a writer preempted while publishing.
+                if i % 64 == 63:
+                    time.sleep(0.00001)
+                continue
+            row = self.values.copy()
+            if int(self.sequence[0]) == before:
+                return before, row
+        raise TornReadError(self.key)
+
+"""
+Class: SnapshotWriter extends object
+    Description:
+        Publishes monitor snapshots to a bus file for local readers (refer
+        to SnapshotReader). The file holds a fixed layout (written once as
+        JSON at its start) and one SnapshotRecord per device. Parameters
+        that are not numbers (e.g. NAME) and devices or parameters not in
+        the layout are not published. Threads publishing through the same
+        writer take turns, since a record has a single writer. (Only one
+        writer may use a file at a time.)
+    Arguments:
+        layout: dictionary keyed by device of the lists of parameters of
+            its record (refer to layoutOf).
+        path: path of the bus file. An existing file with the same layout
+            is written in place (so that readers of a restarted writer
+            carry on), any other file is replaced.
+"""
+class SnapshotWriter(object):
+    def __init__(self, layout, path=None):
+        self.path = defaultPath() if path is None else path
+        self.lock = threading.Lock()
+        text = json.dumps(dict((key, list(fields))
+                               for key, fields in layout.items()),
+                          sort_keys=True).encode("utf-8")
+        records, size = _records(layout, HEADER.size + len(text))
+
+        head = HEADER.pack(MAGIC, len(text)) + text
+        if not self.__reusable(head, size):
+            scratch = self.path + ".tmp"
+            with open(scratch, "wb") as file:
+                file.write(head)
+                file.write(b"\0" * (size - len(head)))
+            os.rename(scratch, self.path)
+
+        self.file = open(self.path, "r+b")
+        self.buffer = mmap.mmap(self.file.fileno(), size)
+        self.records = dict((key, SnapshotRecord(self.buffer, key, fields,
+                                                 offset))
+                            for key, fields, offset in records)
+
+        # A writer stopped while publishing leaves its record odd.
+        for record in self.records.values():
+            if int(record.sequence[0]) % 2:
+                record.sequence[0] += np.uint64(1)
+
+    # Private helper methods
+
+    def __reusable(self, head, size):
+        try:
+            with open(self.path, "rb") as file:
+                return (file.read(len(head)) == head and
+                        os.fstat(file.fileno()).st_size == size)
+        except IOError:
+            return False
+
+    """
+    Method: publish(data, timestamp)
+        Description:
+            Writes a snapshot, one record per device.
+        Arguments:
+            data: dictionary of dictionaries of monitor data keyed by
+                device (as returned by getMonitorData).
+            timestamp: wall clock time used for devices without a
+                TIMESTAMP.
+    """
+    def publish(self, data, timestamp=None):
+        with self.lock:
+            for key, values in data.items():
+                record = self.records.get(str(key))
+                if record is not None:
+                    record.write(values, values.get("TIMESTAMP", timestamp))
+
+    def close(self):
+        self.buffer.close()
+        self.file.close()
+
+"""
+Class: SnapshotReader extends object
+    Description:
+        Reads the latest snapshot published to a bus file by a
+        SnapshotWriter, in this or any other process on the machine.
+    Arguments:
+        path: path of the bus file.
+        retries: attempts made to read a record being written before
+            raising TornReadError.
+    Raises:
+        IOError: occurs when the file does not exist or is not a bus
+            file.
+"""
+class SnapshotReader(object):
+    def __init__(self, path=None, retries=10000):
+        self.path = defaultPath() if path is None else path
+        self.retries = retries
+        self.file = open(self.path, "rb")
+        head = self.file.read(HEADER.size)
+        if len(head) < HEADER.size or HEADER.unpack(head)[0] != MAGIC:
+            self.file.close()
+            raise IOError("Not a snapshot bus file: " + self.path)
+        length = HEADER.unpack(head)[1]
+        self.layout = json.loads(self.file.read(length).decode("utf-8"))
+        records, size = _records(self.layout, HEADER.size + length)
+
+        self.buffer = mmap.mmap(self.file.fileno(), size,
+                                access=mmap.ACCESS_READ)
+        self.records = dict((key, SnapshotRecord(self.buffer, key, fields,
+                                                 offset))
+                            for key, fields, offset in records)
+
+    """
+    Method: sequence(key)
+        Description:
+            Sequence number of the record of a device. It grows by two
+            with every snapshot published, so readers can poll it to
+            find out whether there is anything new.
+    """
+    def sequence(self, key):
+        return int(self.records[key].sequence[0])
+
+    """
+    Method: read(key)
+        Description:
+            Consistent copy of the latest values of a device.
+        Returns:
+            values: dictionary of the parameters of the device with
+                TIMESTAMP (None before anything was published).
+        Raises:
+            KeyError: occurs when the device is not in the layout.
+            TornReadError: occurs when the record stays in the middle of
+                a write.
+    """
+    def read(self, key):
+        record = self.records[key]
+        sequence, row = record.read(self.retries)
+        if not sequence:
+            return None
+        values = dict(zip(record.fields, row[1:].tolist()))
+        values["TIMESTAMP"] = float(row[0])
+        return values
+
+    """
+    Method: readAll()
+        Description:
+            Latest values of every device (as returned by
+            getMonitorData), leaving out devices never published.
+    """
+    def readAll(self):
+        data = {}
+        for key in self.records:
+            values = self.read(key)
+            if values is not None:
+                data[key] = values
+        return data
+
+    def close(self):
+        self.buffer.close()
+        self.file.close()
@@ -0,0 +1,149 @@
+"""
+    STARBURST Shared Memory Snapshot Bus Test Suite
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import multiprocessing
+import sbovro
+import sbsim
+import sbshm
+
+# Writer process publishing snapshots whose values all equal the count.
+
+def publishCounts(path, count):
+    writer = sbshm.SnapshotWriter({"A": ["VQPOW", "VIPOW", "HQPOW",
+                                         "HIPOW"]}, path)
+    for i in range(1, count + 1):
+        writer.publish({"A": {"TIMESTAMP": float(i), "VQPOW": i,
+                              "VIPOW": i, "HQPOW": i, "HIPOW": i}})
+    writer.close()
+
+"""
+TestSnapshotBus Test Group Description:
+    This group of tests makes sure that snapshots published to shared
+    memory are read back consistently, also while another process is
+    writing them.
+
+    Test Count: 3
+"""
+class TestSnapshotBus(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, "test.sbshm")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    """
+    Test - test_concurrentWriter:
+        Given a writer process publishing 20000 snapshots,
+        Then every read made meanwhile has all values from the same
+            snapshot, and the reads never go back in time.
+    """
+    def test_concurrentWriter(self):
+        publishCounts(self.path, 0)
+        reader = sbshm.SnapshotReader(self.path)
+        self.assertEqual(reader.read("A"), None)
+
+        process = multiprocessing.Process(target=publishCounts,
+                                          args=(self.path, 20000))
+        process.start()
+        try:
+            last = 0
+            while process.is_alive():
+                values = reader.read("A")
+                if values is None:
+                    continue
+                self.assertEqual(len(set(values.values())), 1)
+                self.assertTrue(values["TIMESTAMP"] >= last)
+                last = values["TIMESTAMP"]
+        finally:
+            process.join()
+        self.assertEqual(reader.read("A")["VQPOW"], 20000)
+        self.assertEqual(reader.sequence("A"), 40000)
+        reader.close()
+
+    """
+    Test - test_concurrentPublishers:
+        Given four threads publishing through the same writer,
+        Then every record ends with an even sequence grown by two per
+            snapshot, and reads afterwards succeed.
+    """
+    def test_concurrentPublishers(self):
+        layout = {"A": ["VQPOW"], "B": ["VQPOW"]}
+        writer = sbshm.SnapshotWriter(layout, self.path)
+        reader = sbshm.SnapshotReader(self.path, retries=100)
+
+        def publish(n):
+            for i in range(2000):
+                writer.publish({"A": {"VQPOW": n}, "B": {"VQPOW": n}},
+                               float(i))
+
+        # Switch threads as often as possible to provoke races.
+        interval = sys.getcheckinterval()
+        sys.setcheckinterval(1)
+        try:
+            threads = [threading.Thread(target=publish, args=(n,))
+                       for n in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setcheckinterval(interval)
+        for key in ["A", "B"]:
+            self.assertEqual(reader.sequence(key), 2 * 4 * 2000)
+            self.assertTrue(reader.read(key)["VQPOW"] in range(4))
+        reader.close()
+        writer.close()
+
+    """
+    Test - test_monitorPublishes:
+        Given a publisher set on a simulated system,
+        Then a reader gets the numeric parameters of every device of the
+            last full sweep, with the sequence number grown by two per
+            sweep.
+    """
+    def test_monitorPublishes(self):
+        sbsim.backend.reset()
+        ovroObj = sbovro.OVROStarburst("LONoise", "AntennaA", "AntennaB",
+                                       "ETHERNET", "SIM")
+        try:
+            data = ovroObj.getMonitorData()
+            writer = sbshm.SnapshotWriter(sbshm.layoutOf(data), self.path)
+            ovroObj.setPublisher(writer)
+            reader = sbshm.SnapshotReader(self.path)
+            self.assertEqual(reader.readAll(), {})
+
+            ovroObj.getMonitorData()
+            data = ovroObj.getMonitorData()
+            self.assertEqual(reader.sequence("B"), 4)
+            published = reader.readAll()
+            self.assertEqual(sorted(published.keys()), ["A", "B", "LONOISE"])
+            self.assertEqual(published["A"]["VQPOW"], data["A"]["VQPOW"])
+            self.assertEqual(published["B"]["TIMESTAMP"],
+                             data["B"]["TIMESTAMP"])
+            self.assertFalse("NAME" in published["A"])
+            self.assertRaises(KeyError, reader.read, "C")
+            reader.close()
+            writer.close()
+        finally:
+            ovroObj.endConnection()
+
+
+# Main Method
+if __name__ == '__main__':
+    testGroups = [TestSnapshotBus]
+    for tG in testGroups:
+        print "\nTesting: " + str(tG.__name__)
+        suite = unittest.TestLoader().loadTestsFromTestCase(
+            tG)
+        unittest.TextTestRunner(verbosity=2).run(suite)
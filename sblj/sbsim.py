@@ -0,0 +1,511 @@
+"""
+    STARBURST Simulated LabJack T7 Backend
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+from labjack import ljm
+import sbio
+import bisect
+import math
+import random
+import threading
+import time
+
+# Modbus addresses of the registers that can be placed in a stream scan
+# list or resolved through namesToAddresses.
+
+ADDRESSES = {"CORE_TIMER": 61520, "FIO_STATE": 2500, "EIO_STATE": 2501,
+             "CIO_STATE": 2502, "TEMPERATURE_AIR_K": 60050,
+             "TEMPERATURE_DEVICE_K": 60052, "SERIAL_NUMBER": 60028}
+ADDRESSES.update({"AIN" + str(i): 2 * i for i in range(14)})
+ADDRESSES.update({"FIO" + str(i): 2000 + i for i in range(8)})
+ADDRESSES.update({"EIO" + str(i): 2008 + i for i in range(8)})
+ADDRESSES.update({"CIO" + str(i): 2016 + i for i in range(4)})
+
+NAMES = {address: name for name, address in ADDRESSES.items()}
+
+# Digital lines of the simulated T7 in DIO order.
+
+DIO_LINES = (["FIO" + str(i) for i in range(8)] +
+             ["EIO" + str(i) for i in range(8)] +
+             ["CIO" + str(i) for i in range(4)])
+
+"""
+Class: LatencyModel extends object
+    Description:
+        Per-call latency model for simulated LabJacks. Every LJM call costs
+        a fixed base time plus a cost for every register frame in the call,
+        with optional gaussian jitter.
+    Arguments:
+        base: fixed cost of a single call in seconds.
+        perFrame: additional cost for each register frame in seconds.
+        jitter: standard deviation of the gaussian jitter in seconds.
+        seed: seed for the jitter random generator (for repeatable runs).
+"""
+class LatencyModel(object):
+    def __init__(self, base=0.0, perFrame=0.0, jitter=0.0, seed=None):
+        self.base = base
+        self.perFrame = perFrame
+        self.jitter = jitter
+        self.random = random.Random(seed)
+
+    """
+    Method: delay(frames)
+        Description:
+            Draws the time a call touching the given number of frames
+            takes. Never negative.
+    """
+    def delay(self, frames=1):
+        delay = self.base + self.perFrame * frames
+        if self.jitter > 0:
+            delay += self.random.gauss(0, self.jitter)
+        return max(delay, 0.0)
+
+"""
+Method: ethernetLatency(seed)
+    Description:
+        Latency model for a T7 on a quiet local ethernet link. (Roughly
+        2ms per command-response round trip.)
+"""
+def ethernetLatency(seed=None):
+    return LatencyModel(0.002, 0.00002, 0.0003, seed)
+
+"""
+Class: SimulatedT7 extends object
+    Description:
+        Register file of a single simulated T7. Models the analog inputs
+        read by the Starburst modules, the DIO ports, the four latched
+        attenuator chips loaded from FIO0-FIO5 by the CIO0-CIO3 latches,
+        the LO select lines (EIO3/EIO4), the noise source line (EIO0),
+        the noise source selection lines (EIO1/EIO2) and the PWM output of
+        the DIO extended features on DIO_EF_CLOCK0. Antenna IF powers
+        follow the latched attenuations and the noise source state of the
+        whole simulated system.
+    Arguments:
+        backend: the SimulatedLJM owning the device.
+        identifier: identifier used to open the device.
+        serial: serial number of the device.
+        latency: LatencyModel overriding the backend model for this device.
+"""
+class SimulatedT7(object):
+
+    # Attenuator chip behind each latch line and the IF power input of
+    # each chip. The lowest bit (FIO0) is the 0.5dB step.
+
+    latches = {"CIO0": "VQ", "CIO1": "VI", "CIO2": "HQ", "CIO3": "HI"}
+    powerInputs = {"AIN3": "VQ", "AIN2": "VI", "AIN1": "HQ", "AIN0": "HI"}
+    attenuatorBits = ["FIO0", "FIO1", "FIO2", "FIO3", "FIO4", "FIO5"]
+    noiseSelects = {"V": "EIO2", "H": "EIO1"}
+    noiseLine = "EIO0"
+
+    # Line also driving the noise source while it outputs PWM (refer to
+    # LONoiseLJ.noisePWMLine), and the lines with DIO extended features.
+
+    noisePWMLine = "FIO0"
+    efLines = {0: "FIO0", 2: "FIO2", 3: "FIO3", 4: "FIO4", 5: "FIO5"}
+    coreClock = 80e6
+
+    # Number of transitions remembered per digital line.
+
+    historyLength = 4096
+
+    def __init__(self, backend, identifier, serial=None, latency=None):
+        self.backend = backend
+        self.identifier = str(identifier)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.boot = sbio.monotonic()
+
+        self.registers = {"TEMPERATURE_DEVICE_K": 300.0,
+                          "TEMPERATURE_AIR_K": 298.0,
+                          "AIN4": 8.0, "AIN5": 7.5, "AIN6": 6.0,
+                          "AIN7": 5.0, "AIN8": 5.0, "AIN9": -5.0,
+                          "AIN10": 0.6, "AIN11": 0.6, "AIN12": 0.6,
+                          "AIN13": 0.6,
+                          "SERIAL_NUMBER": serial,
+                          "SYSTEM_REBOOT": 0}
+        self.strings = {"DEVICE_NAME_DEFAULT": self.identifier}
+        for line in DIO_LINES:
+            self.registers[line] = 0
+        self.history = {line: ([self.boot], [0]) for line in DIO_LINES}
+
+        # DIO extended feature registers, and the PWM output windows of
+        # every line as [start, end (None while running), period, high
+        # time] in monotonic time.
+
+        for name in ["ENABLE", "DIVISOR", "ROLL_VALUE"]:
+            self.registers["DIO_EF_CLOCK0_" + name] = 0
+        for dio in SimulatedT7.efLines:
+            for name in ["ENABLE", "INDEX", "CONFIG_A"]:
+                self.registers["DIO%d_EF_%s" % (dio, name)] = 0
+        self.pwm = {}
+
+        # Latched attenuator codes in 0.5dB steps (power up at maximum).
+
+        self.attenuation = {"VQ": 63, "VI": 63, "HQ": 63, "HI": 63}
+
+        # Analog front end model. Temperatures are in Kelvin, powers are
+        # in dBm at the detector for a 290K input with no attenuation.
+
+        self.receiverTemp = 150.0
+        self.skyTemp = {"V": 20.0, "H": 20.0}
+        self.loadTemp = 290.0
+        self.noiseTemp = 300.0
+        self.gain = 0.0
+        self.ainNoise = 0.0
+        self.random = random.Random(serial)
+
+        self.stream = None
+
+    """
+    Method: levelAt(line, t)
+        Description:
+            State of a digital line at monotonic time t.
+    """
+    def levelAt(self, line, t=None):
+        level = self.pwmLevelAt(line, t)
+        if level is not None:
+            return level
+        if t is None:
+            return self.registers[line]
+        times, values = self.history[line]
+        index = bisect.bisect_right(times, t) - 1
+        return values[max(index, 0)]
+
+    """
+    Method: pwmLevelAt(line, t)
+        Description:
+            State of the PWM output of a line at monotonic time t, or None
+            when the line did not output PWM at t.
+    """
+    def pwmLevelAt(self, line, t=None):
+        windows = self.pwm.get(line)
+        if not windows:
+            return None
+        t = sbio.monotonic() if t is None else t
+        for start, end, period, high in reversed(windows):
+            if start <= t and (end is None or t < end):
+                return 1 if (t - start) % period < high else 0
+        return None
+
+    """
+    Method: noiseAt(t)
+        Description:
+            Whether the device drives the noise source at monotonic time t.
+    """
+    def noiseAt(self, t=None):
+        return bool(self.levelAt(SimulatedT7.noiseLine, t) or
+                    self.pwmLevelAt(SimulatedT7.noisePWMLine, t))
+
+    """
+    Method: powerDbm(comp, t)
+        Description:
+            IF power at the detector of a component at monotonic time t.
+    """
+    def powerDbm(self, comp, t=None):
+        pol = comp[0]
+        if self.levelAt(self.noiseSelects[pol], t):
+            temp = self.receiverTemp + self.loadTemp
+            if self.backend.noiseSourceOn(t):
+                temp += self.noiseTemp
+        else:
+            temp = self.receiverTemp + self.skyTemp[pol]
+        return (self.gain + 10 * math.log10(temp / 290.0) -
+                self.attenuation[comp] * 0.5)
+
+    """
+    Method: read(name, t)
+        Description:
+            Value of a numeric register at monotonic time t (now if t is
+            None).
+        Raises:
+            LJMError: occurs when the register does not exist.
+    """
+    def read(self, name, t=None):
+        if name in SimulatedT7.powerInputs:
+            value = (24 - self.powerDbm(SimulatedT7.powerInputs[name], t))
+            value /= 40.0
+        elif name in self.history:
+            return self.levelAt(name, t)
+        elif name == "CORE_TIMER":
+            t = sbio.monotonic() if t is None else t
+            return int((t - self.boot) * 40e6) % 2 ** 32
+        elif name.endswith("_STATE") and name[:3] in ("FIO", "EIO", "CIO"):
+            lines = [line for line in DIO_LINES if line[:3] == name[:3]]
+            return sum(self.levelAt(line, t) << i
+                       for i, line in enumerate(lines))
+        elif name in self.registers:
+            value = self.registers[name]
+        else:
+            raise ljm.LJMError(errorString="LJME_INVALID_NAME: " + name)
+        if name.startswith("AIN") and self.ainNoise > 0:
+            value += self.random.gauss(0, self.ainNoise)
+        return value
+
+    """
+    Method: write(name, value, t)
+        Description:
+            Writes a numeric register at monotonic time t. Digital lines
+            are high for any non zero value (after truncation to an
+            integer as done by the device). Raising a latch line loads
+            FIO0-FIO5 into its attenuator chip.
+        Raises:
+            LJMError: occurs when the register does not exist.
+    """
+    def write(self, name, value, t=None):
+        t = sbio.monotonic() if t is None else t
+        if name in self.history:
+            value = 1 if int(value) != 0 else 0
+            times, values = self.history[name]
+            if values[-1] != value:
+                times.append(t)
+                values.append(value)
+                if len(times) > SimulatedT7.historyLength:
+                    del times[0], values[0]
+            self.registers[name] = value
+
+            if value and name in SimulatedT7.latches:
+                self.latch(SimulatedT7.latches[name])
+            elif name in SimulatedT7.attenuatorBits:
+                for line, comp in SimulatedT7.latches.items():
+                    if self.registers[line]:
+                        self.latch(comp)
+        elif name in self.registers:
+            self.registers[name] = value
+            if name.startswith("DIO") and "_EF_" in name:
+                self.updatePWM(t)
+        else:
+            raise ljm.LJMError(errorString="LJME_INVALID_NAME: " + name)
+
+    """
+    Method: updatePWM(t)
+        Description:
+            Starts or stops the PWM output of every extended feature line
+            after a write to the DIO_EF registers at monotonic time t.
+            A line outputs PWM while its feature is enabled with index 0
+            and DIO_EF_CLOCK0 is enabled.
+    """
+    def updatePWM(self, t):
+        registers = self.registers
+        clock = registers["DIO_EF_CLOCK0_ENABLE"]
+        tick = max(registers["DIO_EF_CLOCK0_DIVISOR"], 1) / self.coreClock
+        roll = registers["DIO_EF_CLOCK0_ROLL_VALUE"] or 2 ** 32
+        for dio, line in SimulatedT7.efLines.items():
+            prefix = "DIO%d_EF_" % dio
+            running = bool(clock and registers[prefix + "ENABLE"] and
+                           registers[prefix + "INDEX"] == 0)
+            windows = self.pwm.setdefault(line, [])
+            active = bool(windows) and windows[-1][1] is None
+            if active and not running:
+                windows[-1][1] = t
+            elif running and not active:
+                windows.append([t, None, roll * tick,
+                                registers[prefix + "CONFIG_A"] * tick])
+                del windows[:-SimulatedT7.historyLength]
+
+    def latch(self, comp):
+        self.attenuation[comp] = sum(self.registers[bit] << i for i, bit
+                                     in enumerate(SimulatedT7.attenuatorBits))
+
+"""
+Class: SimulatedLJM extends object
+    Description:
+        LJM compatible backend serving a set of SimulatedT7 devices. Each
+        call sleeps for the time drawn from the latency model of its device
+        (calls on one device are serialized like on the hardware) and is
+        counted in stats. Selected by StarburstLJ objects created with
+        "SIM" as deviceType or connectionType.
+    Arguments:
+        latency: default LatencyModel for all devices (no latency if None).
+        autoCreate: whether opening an unknown identifier creates a new
+            simulated device.
+"""
+class SimulatedLJM(object):
+
+    LJMError = ljm.LJMError
+
+    def __init__(self, latency=None, autoCreate=True):
+        self.latency = latency if latency is not None else LatencyModel()
+        self.autoCreate = autoCreate
+        self.lock = threading.Lock()
+        self.reset()
+
+    """
+    Method: reset()
+        Description:
+            Removes all simulated devices and clears the call statistics.
+    """
+    def reset(self):
+        with self.lock:
+            self.devices = {}
+            self.handles = {}
+            self.nextHandle = 1
+            self.stats = {}
+
+    """
+    Method: addDevice(identifier, serial, latency)
+        Description:
+            Creates a simulated T7 that can then be opened by identifier.
+        Returns:
+            device: the new SimulatedT7.
+    """
+    def addDevice(self, identifier, serial=None, latency=None):
+        with self.lock:
+            if serial is None:
+                serial = 470000000 + len(self.devices)
+            device = SimulatedT7(self, identifier, serial, latency)
+            self.devices[device.identifier] = device
+            return device
+
+    """
+    Method: device(handle)
+        Description:
+            Looks up the simulated device behind an open handle.
+        Raises:
+            LJMError: occurs when the handle is not open.
+    """
+    def device(self, handle):
+        try:
+            return self.handles[handle]
+        except (KeyError, TypeError):
+            raise ljm.LJMError(errorString="LJME_DEVICE_NOT_OPEN")
+
+    """
+    Method: noiseSourceOn(t)
+        Description:
+            Whether any simulated device drives the noise source (with its
+            noise source line or its PWM output) at monotonic time t.
+    """
+    def noiseSourceOn(self, t=None):
+        for device in list(self.devices.values()):
+            if device.noiseAt(t):
+                return True
+        return False
+
+    def __call(self, op, handle, frames, func):
+        device = self.device(handle)
+        latency = device.latency if device.latency is not None \
+            else self.latency
+        delay = latency.delay(frames)
+        with device.lock:
+            if delay > 0:
+                time.sleep(delay)
+            result = func(device)
+        with self.lock:
+            count = self.stats.setdefault(op, [0, 0])
+            count[0] += 1
+            count[1] += frames
+        return result
+
+    # LJM library calls.
+
+    def openS(self, deviceType, connectionType, identifier):
+        identifier = str(identifier)
+        if identifier == "ANY" and self.devices:
+            identifier = sorted(self.devices.keys())[0]
+        if identifier not in self.devices:
+            if not self.autoCreate:
+                raise ljm.LJMError(errorString="LJME_DEVICE_NOT_FOUND")
+            self.addDevice(identifier)
+        with self.lock:
+            handle = self.nextHandle
+            self.nextHandle += 1
+            self.handles[handle] = self.devices[identifier]
+        return handle
+
+    def close(self, handle):
+        self.device(handle)
+        with self.lock:
+            del self.handles[handle]
+
+    def eReadName(self, handle, name):
+        return self.__call("eReadName", handle, 1,
+                           lambda device: device.read(name))
+
+    def eReadNames(self, handle, numFrames, aNames):
+        return self.__call("eReadNames", handle, numFrames,
+                           lambda device: [device.read(name) for name
+                                           in aNames[:numFrames]])
+
+    def eReadNameString(self, handle, name):
+        def read(device):
+            try:
+                return device.strings[name]
+            except KeyError:
+                raise ljm.LJMError(errorString="LJME_INVALID_NAME: " + name)
+        return self.__call("eReadNameString", handle, 1, read)
+
+    def eWriteName(self, handle, name, value):
+        self.__call("eWriteName", handle, 1,
+                    lambda device: device.write(name, value))
+
+    def eWriteNames(self, handle, numFrames, aNames, aValues):
+        def write(device):
+            for name, value in zip(aNames[:numFrames], aValues[:numFrames]):
+                device.write(name, value)
+        self.__call("eWriteNames", handle, numFrames, write)
+
+    def eWriteNameString(self, handle, name, string):
+        def write(device):
+            device.strings[name] = str(string)
+        self.__call("eWriteNameString", handle, 1, write)
+
+    def namesToAddresses(self, numFrames, aNames, aNumRegs=None):
+        try:
+            addresses = [ADDRESSES[name] for name in aNames[:numFrames]]
+        except KeyError as e:
+            raise ljm.LJMError(errorString="LJME_INVALID_NAME: " + str(e))
+        return addresses, [3] * numFrames
+
+    def eStreamStart(self, handle, scansPerRead, numAddresses, aScanList,
+                     scanRate):
+        names = [NAMES[address] for address in aScanList[:numAddresses]]
+        def start(device):
+            device.stream = {"names": names, "rate": float(scanRate),
+                             "scansPerRead": scansPerRead, "scans": 0,
+                             "start": sbio.monotonic()}
+        self.__call("eStreamStart", handle, numAddresses, start)
+        return scanRate
+
+    def eStreamRead(self, handle):
+        device = self.device(handle)
+        stream = device.stream
+        if stream is None:
+            raise ljm.LJMError(errorString="LJME_STREAM_NOT_RUNNING")
+
+        # Block (without holding the device) until the next packet of
+        # scans would have been acquired, then sample the model at the
+        # time of every scan.
+
+        first = stream["scans"]
+        last = first + stream["scansPerRead"]
+        due = stream["start"] + last / stream["rate"]
+        wait = due - sbio.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
+        data = []
+        with device.lock:
+            for scan in range(first, last):
+                t = stream["start"] + scan / stream["rate"]
+                data.extend(float(device.read(name, t))
+                            for name in stream["names"])
+            stream["scans"] = last
+        backlog = int(max(sbio.monotonic() - due, 0) * stream["rate"])
+        with self.lock:
+            count = self.stats.setdefault("eStreamRead", [0, 0])
+            count[0] += 1
+            count[1] += len(data)
+        return data, backlog, 0
+
+    def eStreamStop(self, handle):
+        def stop(device):
+            device.stream = None
+        self.__call("eStreamStop", handle, 1, stop)
+
+# Default simulated system used by StarburstLJ objects created with "SIM"
+# as their deviceType or connectionType.
+
+backend = SimulatedLJM()
+sbio.registerBackend("SIM", backend)
@@ -0,0 +1,197 @@
+"""
+    STARBURST Simulated LabJack T7 Backend Test Suite
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import unittest
+import math
+import time
+import sblj
+import sbio
+import sbsim
+
+"""
+TestSimulatedT7 Test Group Description:
+    This group of tests makes sure that StarburstLJ objects can be run
+    against the simulated backend and that the simulated register file
+    behaves like the Starburst hardware.
+
+    Test Count: 8
+"""
+class TestSimulatedT7(unittest.TestCase):
+
+    def setUp(self):
+        sbsim.backend.reset()
+        sbsim.backend.latency = sbsim.LatencyModel()
+        sbsim.backend.autoCreate = True
+
+    """
+    Test - test_selectedByDeviceOrConnectionType:
+        Given that "SIM" is passed as the deviceType or connectionType,
+        Then the StarburstLJ object uses the simulated backend.
+    """
+    def test_selectedByDeviceOrConnectionType(self):
+        lj = sblj.StarburstLJ("Generic", "ETHERNET", "SIM")
+        self.assertTrue(sbio.baseBackend(lj.ljm) is sbsim.backend)
+
+        lj = sblj.StarburstLJ("Generic", "SIM", "T7")
+        self.assertTrue(sbio.baseBackend(lj.ljm) is sbsim.backend)
+
+    """
+    Test - test_genericParams:
+        Given a simulated LabJack with the default register file,
+        Then getParams returns the nominal rail voltages and the name
+            the device was opened with.
+    """
+    def test_genericParams(self):
+        sbsim.backend.addDevice("Generic", serial=1000)
+        lj = sblj.StarburstLJ("Generic", "ETHERNET", "SIM")
+        dict = lj.getParams()
+
+        self.assertEqual(dict["POW_24V"], 24)
+        self.assertEqual(dict["POW_15V"], 15)
+        self.assertEqual(dict["POW_N5V"], -5)
+        self.assertEqual(dict["NAME"], "Generic")
+        self.assertEqual(dict["SERIAL"], 1000)
+
+    """
+    Test - test_attenuatorsLatchedByCIO:
+        Given that we set the VQ attenuator of a simulated antenna,
+        Then only the VQ chip latches the new code and the VQ power
+            rises by the change in attenuation.
+    """
+    def test_attenuatorsLatchedByCIO(self):
+        device = sbsim.backend.addDevice("Antenna")
+        lj = sblj.AntennaLJ("Antenna", "ETHERNET", "SIM")
+        before = lj.getParams(["VQPOW", "VIPOW"])
+
+        lj.setAttenuator(10.01, ["VQ"])
+        after = lj.getParams(["VQPOW", "VIPOW"])
+
+        self.assertEqual(device.attenuation,
+                         {"VQ": 21, "VI": 63, "HQ": 63, "HI": 63})
+        self.assertAlmostEqual(after["VQPOW"] - before["VQPOW"], 21)
+        self.assertAlmostEqual(after["VIPOW"], before["VIPOW"])
+
+    """
+    Test - test_LOAndNoiseLines:
+        Given that we change the LO and turn on the noise source with
+            the antenna switched to it,
+        Then the LO lines are reflected in getParams and the antenna
+            power rises by the noise source contribution.
+    """
+    def test_LOAndNoiseLines(self):
+        lo = sblj.LONoiseLJ("LONoise", "ETHERNET", "SIM")
+        ant = sblj.AntennaLJ("Antenna", "ETHERNET", "SIM")
+        device = sbsim.backend.devices["Antenna"]
+
+        lo.setLOFreq(sblj.LOFreqConstants.LO_11_5GHZ)
+        self.assertEqual(lo.getParams(["LOFREQ"])["LOFREQ"],
+                         ("LO_11_5GHZ", 2))
+
+        ant.selectNoiseSource()
+        off = ant.getParams(["HIPOW"])["HIPOW"]
+        lo.setNoiseSourceOn()
+        on = ant.getParams(["HIPOW"])["HIPOW"]
+
+        cold = device.receiverTemp + device.loadTemp
+        self.assertAlmostEqual(on - off, 10 * math.log10(
+            (cold + device.noiseTemp) / cold))
+
+    """
+    Test - test_noisePWM:
+        Given that the LO LabJack switches the noise source with a 100Hz
+            PWM at a 25% duty cycle,
+        Then a quarter of the samples streamed from an antenna switched
+            to the noise source see it on, and none once it is stopped.
+    """
+    def test_noisePWM(self):
+        lo = sblj.LONoiseLJ("LONoise", "ETHERNET", "SIM")
+        ant = sblj.AntennaLJ("Antenna", "ETHERNET", "SIM")
+        ant.selectNoiseSource()
+        off = sbsim.backend.devices["Antenna"].read("AIN0")
+
+        def samples():
+            handle = ant.handle
+            addresses, types = sbsim.backend.namesToAddresses(1, ["AIN0"])
+            sbsim.backend.eStreamStart(handle, 400, 1, addresses, 4000)
+            data = sbsim.backend.eStreamRead(handle)[0]
+            sbsim.backend.eStreamStop(handle)
+            return data
+
+        lo.startNoisePWM(100, 0.25)
+        status = lo.getNoisePWM()
+        self.assertTrue(status["RUNNING"])
+        self.assertAlmostEqual(status["FREQ"], 100)
+        on = [value for value in samples() if abs(value - off) > 1e-6]
+        self.assertTrue(abs(len(on) - 100) <= 2)
+
+        lo.stopNoisePWM()
+        self.assertFalse(lo.getNoisePWM()["RUNNING"])
+        self.assertEqual([value for value in samples()
+                          if abs(value - off) > 1e-6], [])
+
+    """
+    Test - test_batchedCallsAndStats:
+        Given that we write and read several registers in single calls,
+        Then the values round trip and the calls are counted per frame.
+    """
+    def test_batchedCallsAndStats(self):
+        handle = sbsim.backend.openS("T7", "ETHERNET", "Generic")
+        sbsim.backend.eWriteNames(handle, 3, ["FIO0", "FIO1", "EIO3"],
+                                  [1, 0, 1])
+        values = sbsim.backend.eReadNames(handle, 3,
+                                          ["FIO0", "FIO1", "EIO3"])
+
+        self.assertEqual(values, [1, 0, 1])
+        self.assertEqual(sbsim.backend.stats["eWriteNames"], [1, 3])
+        self.assertEqual(sbsim.backend.stats["eReadNames"], [1, 3])
+
+    """
+    Test - test_streaming:
+        Given that we stream two channels at 2kHz with 100 scans per read,
+        Then every read returns 200 samples after about 50ms.
+    """
+    def test_streaming(self):
+        handle = sbsim.backend.openS("T7", "ETHERNET", "Antenna")
+        addresses, types = sbsim.backend.namesToAddresses(2, ["AIN0",
+                                                              "EIO0"])
+        sbsim.backend.eStreamStart(handle, 100, 2, addresses, 2000)
+
+        start = time.time()
+        for i in range(2):
+            data, deviceBacklog, ljmBacklog = \
+                sbsim.backend.eStreamRead(handle)
+            self.assertEqual(len(data), 200)
+        sbsim.backend.eStreamStop(handle)
+
+        self.assertTrue(time.time() - start >= 0.09)
+
+    """
+    Test - test_latencyModel:
+        Given a device with 20ms of latency per call,
+        Then every call takes at least 20ms, and a device that cannot be
+            found raises UnknownDeviceError.
+    """
+    def test_latencyModel(self):
+        sbsim.backend.addDevice("Slow", latency=sbsim.LatencyModel(0.02))
+        lj = sblj.StarburstLJ("Slow", "ETHERNET", "SIM")
+
+        start = time.time()
+        lj.getParams(["LJTEMP"])
+        self.assertTrue(time.time() - start >= 0.02)
+
+        sbsim.backend.autoCreate = False
+        self.assertRaises(sblj.UnknownDeviceError, sblj.StarburstLJ,
+                          "Missing", "ETHERNET", "SIM")
+
+
+# Main Method
+if __name__ == '__main__':
+    testGroups = [TestSimulatedT7]
+    for tG in testGroups:
+        print "\nTesting: " + str(tG.__name__)
+        suite = unittest.TestLoader().loadTestsFromTestCase(
+            tG)
+        unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,78 @@
+"""
+    STARBURST Attenuator Sweeps
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import sblj
+import sbio
+import collections
+import time
+import numpy as np
+
+# IF power detector of every attenuator (as read by AntennaLJ.getParams).
+
+DETECTORS = collections.OrderedDict([("VQ", "AIN3"), ("VI", "AIN2"),
+                                     ("HQ", "AIN1"), ("HI", "AIN0")])
+
+# The 64 attenuator settings in 0.5dB steps.
+
+LEVELS = np.arange(64) * 0.5
+
+"""
+Method: sweepAttenuators(lj, levels, settle, oversample, comps)
+    Description:
+        Measures the IF power of the attenuators of an antenna against
+        their attenuation. Every step sets all attenuators in comps with
+        one eWriteNames call (they share the code, so their data lines
+        are written once), waits settle seconds, and reads their
+        detectors oversample times each with one eReadNames call. The
+        attenuators are set back to their previous levels at the end,
+        also on failure.
+    Arguments:
+        lj: AntennaLJ of the antenna.
+        levels: attenuations to step through in dB (LEVELS, all 64 codes,
+            when omitted).
+        settle: seconds waited between setting and reading.
+        oversample: readings averaged per detector and step.
+        comps: list of attenuators swept.
+    Returns:
+        sweep: dictionary of NumPy arrays with ATTEN (attenuation of every
+            step in dB, as rounded by the attenuators) and the mean power
+            in dBm of every attenuator swept, keyed by attenuator, and
+            their standard deviation keyed by attenuator + "_STD".
+    Raises:
+        NoConnectionError: occurs when there is no connection to the
+            LabJack unit.
+        KeyError: occurs when an attenuator in comps is non-existent.
+"""
+@sbio.operation
+def sweepAttenuators(lj, levels=None, settle=0.005, oversample=1,
+                     comps=["VQ", "VI", "HQ", "HI"]):
+    lj.errorCheck()
+
+    levels = LEVELS if levels is None else np.asarray(levels, dtype=float)
+    names = [DETECTORS[comp] for comp in comps] * oversample
+    programs = [sblj.AntennaLJ.compileAttenuators(
+        dict((comp, level) for comp in comps)) for level in levels]
+    restore = sblj.AntennaLJ.compileAttenuators(
+        dict((comp, lj.allAtt[comp]) for comp in comps))
+
+    volts = np.empty((len(programs), len(names)))
+    try:
+        for step, program in enumerate(programs):
+            lj.runProgram(program)
+            if settle > 0:
+                time.sleep(settle)
+            volts[step] = lj.ljm.eReadNames(lj.handle, len(names), names)
+    finally:
+        lj.runProgram(restore)
+
+    powers = (24 - 40 * volts).reshape(len(programs), oversample,
+                                       len(comps))
+    sweep = {"ATTEN": np.array([program.state["allAtt"][comps[0]]
+                                for program in programs])}
+    for i, comp in enumerate(comps):
+        sweep[comp] = powers[:, :, i].mean(axis=1)
+        sweep[comp + "_STD"] = powers[:, :, i].std(axis=1)
+    return sweep
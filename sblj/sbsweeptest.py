@@ -0,0 +1,92 @@
+"""
+    STARBURST Attenuator Sweep Test Suite
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import unittest
+import numpy as np
+import sbovro
+import sbsweep
+import sbio
+import sbsim
+
+"""
+TestAttenuatorSweep Test Group Description:
+    This group of tests makes sure that attenuator sweeps measure the
+    gain curve of every attenuator with one write and one read per step,
+    on all antennas, and restore the attenuations afterwards.
+
+    Test Count: 2
+"""
+class TestAttenuatorSweep(unittest.TestCase):
+
+    def setUp(self):
+        sbsim.backend.reset()
+        self.ovroObj = sbovro.OVROStarburst("LONoise", "AntennaA",
+                                            "AntennaB", "ETHERNET", "SIM")
+
+    def tearDown(self):
+        self.ovroObj.endConnection()
+
+    """
+    Test - test_gainCurve:
+        Given a full sweep of both antennas, starting from attenuations
+            of 10dB,
+        Then every attenuator loses 0.5dB per step over the 64 codes,
+            every step costs two LJM calls, and the attenuations are
+            back at 10dB.
+    """
+    def test_gainCurve(self):
+        for lj in self.ovroObj.ljAntennas.values():
+            lj.setAttenuators(dict((comp, 10) for comp in sbsweep.DETECTORS))
+        lj = self.ovroObj.ljA
+        with sbio.measureIO({"A": lj}) as cost:
+            sweep = sbsweep.sweepAttenuators(lj, settle=0)
+        self.assertEqual(cost["A"].calls, 2 * 64 + 1)
+
+        sweeps = self.ovroObj.sweepAttenuators(settle=0)
+        for key in ["A", "B"]:
+            self.assertTrue(np.array_equal(sweeps[key]["ATTEN"],
+                                           sbsweep.LEVELS))
+            for comp in sbsweep.DETECTORS:
+                powers = sweeps[key][comp]
+                self.assertEqual(powers.shape, (64,))
+                self.assertTrue(np.allclose(np.diff(powers), -0.5))
+                self.assertTrue(np.allclose(powers, sweep[comp]))
+            self.assertEqual(self.ovroObj.ljAntennas[key].allAtt,
+                             dict((comp, 10) for comp in sbsweep.DETECTORS))
+
+        device = sbsim.backend.devices["AntennaA"]
+        self.assertEqual(device.attenuation["VQ"], 20)
+
+    """
+    Test - test_oversample:
+        Given detector noise and 8 readings per step over a few levels,
+        Then the mean powers follow the attenuation, the spread of the
+            readings is reported, and each step is still one read.
+    """
+    def test_oversample(self):
+        device = sbsim.backend.devices["AntennaA"]
+        device.ainNoise = 0.001
+        lj = self.ovroObj.ljA
+        with sbio.measureIO({"A": lj}) as cost:
+            sweep = sbsweep.sweepAttenuators(lj, [0, 5, 10.2], 0, 8,
+                                              ["VQ", "HI"])
+        self.assertEqual(cost["A"].calls, 2 * 3 + 1)
+        self.assertEqual(list(sweep["ATTEN"]), [0, 5, 10.5])
+        self.assertEqual(sorted(sweep.keys()),
+                         ["ATTEN", "HI", "HI_STD", "VQ", "VQ_STD"])
+        self.assertTrue(np.allclose(np.diff(sweep["VQ"]), [-5, -5.5],
+                                    atol=0.2))
+        self.assertTrue((sweep["HI_STD"] > 0).all())
+
+
+# Main Method
+if __name__ == '__main__':
+    testGroups = [TestAttenuatorSweep]
+    for tG in testGroups:
+        print "\nTesting: " + str(tG.__name__)
+        suite = unittest.TestLoader().loadTestsFromTestCase(
+            tG)
+        unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,38 @@
+"""
+    STARBURST Monotonic Clock
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import time
+import ctypes
+import ctypes.util
+
+"""
+Method: monotonic()
+    Description:
+        Monotonic clock in seconds used for all interval timing in the
+        Starburst libraries and the stateframe producer. Uses
+        time.monotonic when available and falls back to CLOCK_MONOTONIC
+        through libc (Python 2 on Linux), or to time.time as a last resort.
+        Kept free of the LabJack libraries so that gen/ can import it.
+"""
+try:
+    monotonic = time.monotonic
+except AttributeError:
+    class _timespec(ctypes.Structure):
+        _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+    try:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        _clock_gettime = _libc.clock_gettime
+        _clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(_timespec)]
+    except (OSError, AttributeError, TypeError):
+        _clock_gettime = None
+
+    def monotonic():
+        if _clock_gettime is None:
+            return time.time()
+        ts = _timespec()
+        _clock_gettime(1, ctypes.byref(ts))    # CLOCK_MONOTONIC
+        return ts.tv_sec + ts.tv_nsec * 1e-9
@@ -0,0 +1,432 @@
+"""
+    STARBURST LJM Call Trace Recording and Replay
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+from labjack import ljm
+import sbio
+import struct
+import threading
+import time
+import collections
+
+# Trace file layout (little endian):
+#   magic "SBTRACE" followed by the format version byte,
+#   then a sequence of entries starting with an op byte:
+#     op 0: string table entry - <HH id, length> + UTF-8 bytes.
+#     op 1-11: LJM call (op | 0x80 when the call raised an LJMError) -
+#         <HdfII device, start, duration, names, values>, the string ids
+#         of the register names (H each), the values (d each), then
+#         <I length> + UTF-8 bytes of the text payload (strings read or
+#         written, or the error message).
+# Start times are seconds since the recording started on the monotonic
+# clock and durations are the wall-clock time spent in the call.
+
+MAGIC = b"SBTRACE\x01"
+OPS = ["openS", "close", "eReadName", "eReadNames", "eReadNameString",
+       "eWriteName", "eWriteNames", "eWriteNameString", "eStreamStart",
+       "eStreamRead", "eStreamStop"]
+OP_CODES = {op: code + 1 for code, op in enumerate(OPS)}
+ERROR_FLAG = 0x80
+
+STRING = struct.Struct("<HH")
+CALL = struct.Struct("<HdfII")
+LENGTH = struct.Struct("<I")
+
+TraceEntry = collections.namedtuple("TraceEntry", ["device", "op", "start",
+                                                   "duration", "names",
+                                                   "values", "text",
+                                                   "error"])
+
+"""
+Class: TraceMismatchError extends Exception
+    Description:
+        Custom error for a replayed call that does not match the next
+        call recorded in the trace for its device.
+"""
+class TraceMismatchError(Exception):
+    def __init__(self, device, expected, got):
+        self.device = device
+        self.expected = expected
+        self.got = got
+
+    def __str__(self):
+        return ("Device " + str(self.device) + " expected " +
+                str(self.expected) + " but got " + str(self.got))
+
+def _bytes(text):
+    if isinstance(text, bytes):
+        return text
+    return text.encode("utf-8")
+
+def _text(raw):
+    if str is bytes:
+        return raw
+    return raw.decode("utf-8")
+
+"""
+Method: encodeCall(op, args, result)
+    Description:
+        Splits an LJM call into the register names, numeric values and
+        text payload stored in the trace.
+"""
+def encodeCall(op, args, result):
+    names, values, text = [], [], ""
+    if op == "openS":
+        names = [str(arg) for arg in args[:3]]
+    elif op in ("eReadName", "eWriteName", "eReadNameString",
+                "eWriteNameString"):
+        names = [args[1]]
+        if op == "eReadName" and result is not None:
+            values = [result]
+        elif op == "eWriteName":
+            values = [args[2]]
+        elif op == "eReadNameString" and result is not None:
+            text = result
+        elif op == "eWriteNameString":
+            text = args[2]
+    elif op in ("eReadNames", "eWriteNames"):
+        names = list(args[2][:args[1]])
+        if op == "eWriteNames":
+            values = list(args[3][:args[1]])
+        elif result is not None:
+            values = list(result)
+    elif op == "eStreamStart":
+        values = [args[1], args[4], args[4] if result is None else result]
+        values += list(args[3][:args[2]])
+    elif op == "eStreamRead" and result is not None:
+        values = list(result[0]) + [result[1], result[2]]
+    return names, values, text
+
+"""
+Method: decodeResult(entry, handle)
+    Description:
+        Rebuilds the return value of a recorded LJM call. (openS returns
+        the handle the replaying backend assigned.)
+"""
+def decodeResult(entry, handle):
+    op = entry.op
+    if op == "openS":
+        return handle
+    elif op == "eReadName":
+        return entry.values[0]
+    elif op == "eReadNames":
+        return list(entry.values)
+    elif op == "eReadNameString":
+        return entry.text
+    elif op == "eStreamStart":
+        return entry.values[2]
+    elif op == "eStreamRead":
+        return (list(entry.values[:-2]), int(entry.values[-2]),
+                int(entry.values[-1]))
+    return None
+
+"""
+Class: TraceWriter extends object
+    Description:
+        Appends LJM calls to a binary trace file. Safe to share between
+        the devices (and threads) of a session.
+    Arguments:
+        path: file to write the trace to (overwritten).
+"""
+class TraceWriter(object):
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.lock = threading.Lock()
+        self.strings = {}
+        self.devices = 0
+        self.start = sbio.monotonic()
+
+    """
+    Method: newDevice()
+        Description:
+            Allocates the index that identifies a device in the trace.
+    """
+    def newDevice(self):
+        with self.lock:
+            self.devices += 1
+            return self.devices - 1
+
+    def __stringId(self, text):
+        try:
+            return self.strings[text]
+        except KeyError:
+            raw = _bytes(text)
+            stringId = len(self.strings)
+            self.strings[text] = stringId
+            self.file.write(struct.pack("<B", 0) +
+                            STRING.pack(stringId, len(raw)) + raw)
+            return stringId
+
+    """
+    Method: write(device, op, start, duration, args, result, error)
+        Description:
+            Appends a single LJM call to the trace.
+        Arguments:
+            device: index of the device from newDevice().
+            op: name of the LJM call.
+            start: monotonic time the call started.
+            duration: time the call took in seconds.
+            args: positional arguments of the call.
+            result: return value of the call (None if it raised).
+            error: the LJMError raised by the call, if any.
+    """
+    def write(self, device, op, start, duration, args, result=None,
+              error=None):
+        names, values, text = encodeCall(op, args, result)
+        if error is not None:
+            text = str(error)
+        code = OP_CODES[op] | (ERROR_FLAG if error is not None else 0)
+        raw = _bytes(text)
+
+        with self.lock:
+            ids = [self.__stringId(name) for name in names]
+            self.file.write(struct.pack("<B", code) +
+                            CALL.pack(device, start - self.start, duration,
+                                      len(ids), len(values)) +
+                            struct.pack("<" + str(len(ids)) + "H", *ids) +
+                            struct.pack("<" + str(len(values)) + "d",
+                                        *values) +
+                            LENGTH.pack(len(raw)) + raw)
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+"""
+Method: readTrace(path)
+    Description:
+        Reads a trace file written by TraceWriter.
+    Returns:
+        entries: list of TraceEntry in recorded order.
+    Raises:
+        ValueError: occurs when the file is not a Starburst trace.
+"""
+def readTrace(path):
+    with open(path, "rb") as file:
+        data = file.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(path + " is not a Starburst LJM trace.")
+
+    strings = {}
+    entries = []
+    offset = len(MAGIC)
+    while offset < len(data):
+        code = struct.unpack_from("<B", data, offset)[0]
+        offset += 1
+        if code == 0:
+            stringId, length = STRING.unpack_from(data, offset)
+            offset += STRING.size
+            strings[stringId] = _text(data[offset:offset + length])
+            offset += length
+            continue
+
+        device, start, duration, nNames, nValues = \
+            CALL.unpack_from(data, offset)
+        offset += CALL.size
+        ids = struct.unpack_from("<" + str(nNames) + "H", data, offset)
+        offset += 2 * nNames
+        values = struct.unpack_from("<" + str(nValues) + "d", data, offset)
+        offset += 8 * nValues
+        length = LENGTH.unpack_from(data, offset)[0]
+        offset += LENGTH.size
+        text = _text(data[offset:offset + length])
+        offset += length
+
+        entries.append(TraceEntry(device, OPS[(code & ~ERROR_FLAG) - 1],
+                                  start, duration,
+                                  [strings[i] for i in ids], list(values),
+                                  text, bool(code & ERROR_FLAG)))
+    return entries
+
+"""
+Class: RecordingLJM extends sbio.LJMProxy
+    Description:
+        Layer that records every LJM call of one StarburstLJ object into
+        a shared TraceWriter. Layers attached after the device is already
+        connected record a synthetic openS so that the device can be
+        matched again on replay.
+    Arguments:
+        writer: the TraceWriter of the session.
+        lj: the StarburstLJ object being recorded.
+"""
+class RecordingLJM(sbio.LJMProxy):
+    def __init__(self, writer, lj):
+        super(RecordingLJM, self).__init__()
+        self.writer = writer
+        self.device = writer.newDevice()
+        if lj.handle is not None:
+            writer.write(self.device, "openS", sbio.monotonic(), 0.0,
+                         (lj.deviceType, lj.connectionType, lj.identifier))
+
+    def invoke(self, op, func, args):
+        start = sbio.monotonic()
+        try:
+            result = func(*args)
+        except ljm.LJMError as e:
+            self.writer.write(self.device, op, start,
+                              sbio.monotonic() - start, args, error=e)
+            raise
+        self.writer.write(self.device, op, start, sbio.monotonic() - start,
+                          args, result)
+        return result
+
+# Writer installed for every StarburstLJ created while recording.
+
+recorder = None
+
+"""
+Method: startRecording(path)
+    Description:
+        Records the LJM calls of every StarburstLJ object created from now
+        on (including those inside OVROStarburst) into a trace file.
+    Returns:
+        writer: the TraceWriter of the session. Existing objects can be
+            added with attach(writer, lj).
+"""
+def startRecording(path):
+    global recorder
+    stopRecording()
+    recorder = TraceWriter(path)
+    sbio.layerFactories.append(__recordingFactory)
+    return recorder
+
+def __recordingFactory(lj):
+    return RecordingLJM(recorder, lj)
+
+"""
+Method: stopRecording()
+    Description:
+        Stops recording new StarburstLJ objects and closes the trace.
+        Objects created while recording keep their layers but must not
+        make further calls.
+"""
+def stopRecording():
+    global recorder
+    if __recordingFactory in sbio.layerFactories:
+        sbio.layerFactories.remove(__recordingFactory)
+    if recorder is not None:
+        recorder.close()
+        recorder = None
+
+"""
+Method: attach(writer, lj)
+    Description:
+        Starts recording an existing StarburstLJ object.
+    Returns:
+        layer: the RecordingLJM layer (remove with lj.removeLayer).
+"""
+def attach(writer, lj):
+    layer = RecordingLJM(writer, lj)
+    lj.addLayer(layer)
+    return layer
+
+"""
+Class: ReplayLJM extends object
+    Description:
+        LJM compatible backend serving the calls of a recorded trace back
+        to StarburstLJ objects. Devices are matched by identifier in the
+        order they were opened while recording and every call must match
+        the next recorded call of its device. Calls take their recorded
+        duration divided by speed.
+    Arguments:
+        path: trace file written by TraceWriter.
+        speed: replay speed factor (1.0 for recorded speed, None or 0 to
+            return without waiting).
+    Raises:
+        TraceMismatchError: occurs (on calls) when the caller diverges
+            from the recorded session.
+"""
+class ReplayLJM(object):
+
+    LJMError = ljm.LJMError
+
+    def __init__(self, path, speed=1.0):
+        self.speed = speed
+        self.lock = threading.Lock()
+        self.queues = collections.defaultdict(collections.deque)
+        for entry in readTrace(path):
+            self.queues[entry.device].append(entry)
+
+    def __next(self, handle, op, names):
+        with self.lock:
+            queue = self.queues.get(handle - 1)
+            if not queue:
+                raise TraceMismatchError(handle - 1, "end of trace", op)
+            entry = queue.popleft()
+        if entry.op != op or list(entry.names) != list(names):
+            raise TraceMismatchError(handle - 1, (entry.op, entry.names),
+                                     (op, list(names)))
+        if self.speed:
+            time.sleep(entry.duration / self.speed)
+        if entry.error:
+            raise ljm.LJMError(errorString=entry.text)
+        return decodeResult(entry, handle)
+
+    def __call(self, op, args):
+        names = encodeCall(op, args, None)[0]
+        return self.__next(args[0], op, names)
+
+    def openS(self, deviceType, connectionType, identifier):
+        with self.lock:
+            for device in sorted(self.queues.keys()):
+                queue = self.queues[device]
+                if (queue and queue[0].op == "openS" and
+                        queue[0].names[2] == str(identifier)):
+                    break
+            else:
+                raise ljm.LJMError(errorString="LJME_DEVICE_NOT_FOUND")
+        return self.__next(device + 1, "openS", queue[0].names)
+
+    def close(self, handle):
+        return self.__call("close", (handle,))
+
+    def eReadName(self, handle, name):
+        return self.__call("eReadName", (handle, name))
+
+    def eReadNames(self, handle, numFrames, aNames):
+        return self.__call("eReadNames", (handle, numFrames, aNames))
+
+    def eReadNameString(self, handle, name):
+        return self.__call("eReadNameString", (handle, name))
+
+    def eWriteName(self, handle, name, value):
+        return self.__call("eWriteName", (handle, name, value))
+
+    def eWriteNames(self, handle, numFrames, aNames, aValues):
+        return self.__call("eWriteNames", (handle, numFrames, aNames,
+                                           aValues))
+
+    def eWriteNameString(self, handle, name, string):
+        return self.__call("eWriteNameString", (handle, name, string))
+
+    def eStreamStart(self, handle, scansPerRead, numAddresses, aScanList,
+                     scanRate):
+        return self.__call("eStreamStart", (handle, scansPerRead,
+                                            numAddresses, aScanList,
+                                            scanRate))
+
+    def eStreamRead(self, handle):
+        return self.__call("eStreamRead", (handle,))
+
+    def eStreamStop(self, handle):
+        return self.__call("eStreamStop", (handle,))
+
+    def namesToAddresses(self, numFrames, aNames, aNumRegs=None):
+        return ljm.namesToAddresses(numFrames, aNames)
+
+"""
+Method: replay(path, speed, name)
+    Description:
+        Loads a trace and registers it as the backend selected by name
+        (as deviceType or connectionType, "REPLAY" by default).
+    Returns:
+        backend: the ReplayLJM.
+"""
+def replay(path, speed=1.0, name="REPLAY"):
+    backend = ReplayLJM(path, speed)
+    sbio.registerBackend(name, backend)
+    return backend
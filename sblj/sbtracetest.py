@@ -0,0 +1,147 @@
+"""
+    STARBURST LJM Call Trace Recording and Replay Test Suite
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+import time
+from labjack import ljm
+import sblj
+import sbsim
+import sbtrace
+
+"""
+TestTraceRecordReplay Test Group Description:
+    This group of tests makes sure that a session of LJM calls recorded
+    against the simulated backend can be served back by the replay
+    backend.
+
+    Test Count: 5
+"""
+class TestTraceRecordReplay(unittest.TestCase):
+
+    def setUp(self):
+        sbsim.backend.reset()
+        sbsim.backend.latency = sbsim.LatencyModel()
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "session.sbtrace")
+
+    def tearDown(self):
+        sbtrace.stopRecording()
+        shutil.rmtree(self.dir)
+
+    def session(self, connectionType):
+        lo = sblj.LONoiseLJ("LONoise", connectionType, "T7")
+        ant = sblj.AntennaLJ("Antenna", connectionType, "T7")
+        lo.setLOFreq(sblj.LOFreqConstants.LO_7_5GHZ)
+        ant.setAttenuator(12.5, ["HQ", "HI"])
+        dumps = [lo.getParams(), ant.getParams()]
+        for dump in dumps:
+            del dump["TIMESTAMP"]
+        return dumps
+
+    """
+    Test - test_replayReturnsRecordedValues:
+        Given a session recorded against simulated LabJacks,
+        Then running the same session against the replay backend returns
+            the same monitor data.
+    """
+    def test_replayReturnsRecordedValues(self):
+        sbtrace.startRecording(self.path)
+        recorded = self.session("SIM")
+        sbtrace.stopRecording()
+
+        sbtrace.replay(self.path, speed=None)
+        self.assertEqual(self.session("REPLAY"), recorded)
+
+    """
+    Test - test_replaySpeed:
+        Given ten reads recorded with 10ms of latency each,
+        Then replaying at recorded speed takes about 100ms and replaying
+            at ten times the speed takes about a tenth of that.
+    """
+    def test_replaySpeed(self):
+        sbsim.backend.latency = sbsim.LatencyModel(0.01)
+        sbtrace.startRecording(self.path)
+        lj = sblj.StarburstLJ("Generic", "SIM", "T7")
+        for i in range(10):
+            lj.getParams(["LJTEMP"])
+        sbtrace.stopRecording()
+
+        for speed, low, high in [(1.0, 0.1, 0.2), (10.0, 0.01, 0.05)]:
+            sbtrace.replay(self.path, speed)
+            lj = sblj.StarburstLJ("Generic", "REPLAY", "T7")
+            start = time.time()
+            for i in range(10):
+                lj.getParams(["LJTEMP"])
+            elapsed = time.time() - start
+            self.assertTrue(low <= elapsed < high)
+
+    """
+    Test - test_divergingSessionRaises:
+        Given a recorded session,
+        Then replaying a different call raises TraceMismatchError.
+    """
+    def test_divergingSessionRaises(self):
+        sbtrace.startRecording(self.path)
+        lj = sblj.StarburstLJ("Generic", "SIM", "T7")
+        lj.getParams(["LJTEMP"])
+        sbtrace.stopRecording()
+
+        sbtrace.replay(self.path, speed=None)
+        lj = sblj.StarburstLJ("Generic", "REPLAY", "T7")
+        self.assertRaises(sbtrace.TraceMismatchError, lj.getParams,
+                          ["LJAIRTEMP"])
+
+    """
+    Test - test_errorsAndAttachedDevices:
+        Given a device attached to a recording after it was connected
+            and a call that raised an LJMError,
+        Then the replayed device can be opened by its identifier and the
+            same call raises an LJMError again.
+    """
+    def test_errorsAndAttachedDevices(self):
+        lj = sblj.StarburstLJ("Generic", "SIM", "T7")
+        writer = sbtrace.TraceWriter(self.path)
+        sbtrace.attach(writer, lj)
+        self.assertRaises(ljm.LJMError, lj.ljm.eReadName, lj.handle, "BAD")
+        writer.close()
+
+        sbtrace.replay(self.path, speed=None)
+        lj = sblj.StarburstLJ("Generic", "REPLAY", "T7")
+        self.assertRaises(ljm.LJMError, lj.ljm.eReadName, lj.handle, "BAD")
+
+    """
+    Test - test_traceIsCompact:
+        Given a thousand single register reads,
+        Then the trace stores each of them in under 40 bytes and reads
+            back the register, value and duration of every call.
+    """
+    def test_traceIsCompact(self):
+        sbtrace.startRecording(self.path)
+        lj = sblj.StarburstLJ("Generic", "SIM", "T7")
+        for i in range(1000):
+            lj.getParams(["LJTEMP"])
+        sbtrace.stopRecording()
+
+        self.assertTrue(os.path.getsize(self.path) < 1000 * 40 + 200)
+        entries = sbtrace.readTrace(self.path)
+        self.assertEqual(len(entries), 1001)
+        self.assertEqual(entries[-1].op, "eReadNames")
+        self.assertEqual(entries[-1].names, ["TEMPERATURE_DEVICE_K"])
+        self.assertEqual(entries[-1].values, [300.0])
+        self.assertTrue(entries[-1].duration >= 0)
+
+
+# Main Method
+if __name__ == '__main__':
+    testGroups = [TestTraceRecordReplay]
+    for tG in testGroups:
+        print "\nTesting: " + str(tG.__name__)
+        suite = unittest.TestLoader().loadTestsFromTestCase(
+            tG)
+        unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,298 @@
+"""
+    STARBURST Y-Factor Engine
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import sbio
+import sbpool
+import collections
+import math
+import time
+import numpy as np
+
+# Noise source switching modes: the PWM of the LO/Noise LabJack (refer
+# to LONoiseLJ.startNoisePWM), or the noise source line toggled by the
+# host.
+
+HARDWARE = "HARDWARE"
+HOST = "HOST"
+
+# Stream channel of the IF power detector of every polarization/component.
+
+CHANNELS = collections.OrderedDict([("VQ", "AIN3"), ("VI", "AIN2"),
+                                    ("HQ", "AIN1"), ("HI", "AIN0")])
+
+"""
+Class: Edge extends namedtuple
+    Description:
+        Noise source switch, known to have happened within a window of
+        monotonic time.
+    Fields:
+        start: sbio.monotonic() time at which the switch may begin.
+        end: sbio.monotonic() time by which the switch is done.
+        state: noise source state after the switch (1=on, 0=off).
+"""
+Edge = collections.namedtuple("Edge", ["start", "end", "state"])
+
+"""
+Method: powerDbm(volts)
+    Description:
+        IF power in dBm of detector voltages (as AntennaLJ.getParams).
+"""
+def powerDbm(volts):
+    return 24 - 40 * volts
+
+"""
+Method: classify(times, edges, initial, guard)
+    Description:
+        Splits samples into noise source on and off states.
+    Arguments:
+        times: array of the sbio.monotonic() times of the samples.
+        edges: list of Edge in time order.
+        initial: noise source state before the first edge.
+        guard: seconds left out around every switch window (for the
+            settling of the detectors and the uncertainty of times).
+    Returns:
+        on, off: boolean arrays selecting the samples taken with the noise
+            source on and off. Samples close to a switch are in neither.
+"""
+def classify(times, edges, initial, guard):
+    times = np.asarray(times, dtype=float)
+    starts = np.array([edge.start for edge in edges], dtype=float)
+    ends = np.array([edge.end for edge in edges], dtype=float)
+    states = np.array([initial] + [edge.state for edge in edges])
+
+    index = np.searchsorted(starts, times, side="right")
+    state = states[index]
+    valid = np.ones(len(times), dtype=bool)
+    after = index > 0
+    valid[after] &= times[after] >= ends[index[after] - 1] + guard
+    before = index < len(edges)
+    valid[before] &= times[before] <= starts[index[before]] - guard
+    return valid & (state == 1), valid & (state == 0)
+
+"""
+Method: yFactor(dbm, on, off, noiseTemp)
+    Description:
+        Y-factor of a detector and the system temperature it gives with
+        the noise source off.
+    Arguments:
+        dbm: array of powers in dBm.
+        on, off: boolean arrays selecting the samples with the noise
+            source on and off.
+        noiseTemp: excess noise temperature of the noise source in K.
+    Returns:
+        result: dictionary with Y (linear on/off power ratio), TSYS (in K,
+            None when Y is not above 1), ON and OFF (mean powers in dBm)
+            and SAMPLES (number of on and off samples).
+"""
+def yFactor(dbm, on, off, noiseTemp):
+    linear = 10 ** (np.asarray(dbm, dtype=float) / 10.0)
+    count = (int(on.sum()), int(off.sum()))
+    if not count[0] or not count[1]:
+        return {"Y": None, "TSYS": None, "ON": None, "OFF": None,
+                "SAMPLES": count}
+    powerOn = linear[on].mean()
+    powerOff = linear[off].mean()
+    y = powerOn / powerOff
+    return {"Y": float(y),
+            "TSYS": float(noiseTemp / (y - 1)) if y > 1 else None,
+            "ON": float(10 * math.log10(powerOn)),
+            "OFF": float(10 * math.log10(powerOff)),
+            "SAMPLES": count}
+
+"""
+Class: YFactorEngine extends object
+    Description:
+        Measures the Y-factor and system temperature of every
+        polarization/component of a set of antennas. The antennas are
+        switched to the noise source path and stream their IF power
+        detectors at rate while the noise source is switched at freq,
+        either by the PWM of the LO/Noise LabJack (HARDWARE) or by the
+        host (HOST). The samples are then split into noise on and off
+        states using the times of the switches and of the stream start,
+        leaving out guard seconds (plus the uncertainty of those times)
+        around every switch. The antennas are switched back to the sky
+        and the noise source turned off at the end, also on failure.
+    Arguments:
+        ovro: OVROStarburst system.
+        noiseTemp: excess noise temperature of the noise source in K.
+        antennas: list of keys to antennas to measure (all antennas when
+            omitted).
+        mode: HARDWARE or HOST.
+        freq: noise source switching frequency in Hz.
+        duty: fraction of each period the noise source is on.
+        rate: stream scan rate in Hz.
+        duration: seconds of samples taken.
+        guard: seconds left out around every switch.
+"""
+class YFactorEngine(object):
+    def __init__(self, ovro, noiseTemp, antennas=None, mode=HARDWARE,
+                 freq=10.0, duty=0.5, rate=2000.0, duration=1.0,
+                 guard=0.002):
+        if mode not in (HARDWARE, HOST):
+            raise ValueError("Unknown switching mode " + str(mode) + ".")
+        self.ovro = ovro
+        self.noiseTemp = noiseTemp
+        self.antennas = (list(ovro.ljAntennas.keys()) if antennas is None
+                         else list(antennas))
+        for key in self.antennas:
+            ovro.ljAntennas[key]
+        self.mode = mode
+        self.freq = freq
+        self.duty = duty
+        self.rate = rate
+        self.duration = duration
+        self.guard = guard
+
+    # Private helper methods
+
+    def __lo(self, method, *args):
+        return self.ovro.workers.submit(
+            "LONOISE", getattr(self.ovro.ljLONoise, method), *args).result()
+
+    def __fanOut(self, method):
+        self.ovro.workers.fanOut(dict(
+            (key, getattr(self.ovro.ljAntennas[key], method))
+            for key in self.antennas))
+
+    def __startStream(self, lj):
+        names = list(CHANNELS.values())
+        addresses, types = lj.ljm.namesToAddresses(len(names), names)
+        scansPerRead = max(int(self.rate * 0.05), 1)
+        before = sbio.monotonic()
+        rate = lj.ljm.eStreamStart(lj.handle, scansPerRead, len(names),
+                                   addresses, self.rate)
+        after = sbio.monotonic()
+        return {"start": (before + after) / 2.0,
+                "uncertainty": (after - before) / 2.0,
+                "rate": float(rate), "scansPerRead": scansPerRead}
+
+    def __stopStreams(self, keys):
+        # Best effort after a failure. (Kept in its own method so that the
+        # error handled here does not replace the one re-raised by the
+        # caller under Python 2.)
+        try:
+            self.ovro.workers.fanOut(dict(
+                (key, lambda lj=self.ovro.ljAntennas[key]:
+                 lj.ljm.eStreamStop(lj.handle)) for key in keys))
+        except sbpool.MultiDeviceError:
+            pass
+
+    def __readStream(self, lj, stream):
+        count = int(self.duration * stream["rate"])
+        data = []
+        try:
+            while len(data) < count * len(CHANNELS):
+                data.extend(lj.ljm.eStreamRead(lj.handle)[0])
+        finally:
+            lj.ljm.eStreamStop(lj.handle)
+        data = np.array(data[:count * len(CHANNELS)], dtype=float)
+        stream["times"] = (stream["start"] +
+                           np.arange(count) / stream["rate"])
+        stream["volts"] = data.reshape(count, len(CHANNELS))
+        return stream
+
+    def __switchHardware(self, end):
+        lo = self.ovro.ljLONoise
+        before = sbio.monotonic()
+        self.__lo("startNoisePWM", self.freq, self.duty)
+        after = sbio.monotonic()
+        period = 1.0 / lo.noisePWM["FREQ"]
+        high = lo.noisePWM["DUTY"] * period
+        waitUntil(end)
+        stopBefore = sbio.monotonic()
+        self.__lo("stopNoisePWM")
+        stopAfter = sbio.monotonic()
+
+        edges = []
+        start = before
+        while start < stopBefore:
+            edges.append(Edge(start, start + after - before, 1))
+            if start + high < stopBefore:
+                edges.append(Edge(start + high, start + high +
+                                  after - before, 0))
+            start += period
+        edges.append(Edge(stopBefore, stopAfter, 0))
+        return edges
+
+    def __switchHost(self, end):
+        period = 1.0 / self.freq
+        edges = []
+        due = sbio.monotonic()
+        while due < end:
+            for state, offset in [(1, 0), (0, self.duty * period)]:
+                waitUntil(due + offset)
+                before = sbio.monotonic()
+                self.__lo("setNoiseSourceOn" if state
+                          else "setNoiseSourceOff")
+                edges.append(Edge(before, sbio.monotonic(), state))
+            due += period
+        return edges
+
+    """
+    Method: run()
+        Description:
+            Takes one measurement.
+        Returns:
+            results: dictionary keyed by antenna of dictionaries keyed by
+                polarization/component of the results of yFactor.
+        Raises:
+            sbpool.MultiDeviceError: occurs when at least one of the
+                antenna LabJacks fails.
+            NoConnectionError: occurs when there is no connection to the
+                LO/Noise LabJack.
+    """
+    def run(self):
+        lo = self.ovro.ljLONoise
+        workers = self.ovro.workers
+        self.__lo("setNoiseSourceOff")
+        self.__fanOut("selectNoiseSource")
+        try:
+            try:
+                streams = workers.fanOut(dict(
+                    (key, lambda lj=self.ovro.ljAntennas[key]:
+                     self.__startStream(lj)) for key in self.antennas))
+            except sbpool.MultiDeviceError as e:
+                # Streams that did start are stopped, or the next
+                # eStreamStart on those LabJacks would fail.
+                self.__stopStreams(e.results.keys())
+                raise
+            tasks = dict(
+                (key, workers.submit(key, self.__readStream,
+                                     self.ovro.ljAntennas[key], stream))
+                for key, stream in streams.items())
+
+            end = (max(stream["start"] for stream in streams.values()) +
+                   self.duration)
+            if self.mode == HARDWARE:
+                edges = self.__switchHardware(end)
+            else:
+                edges = self.__switchHost(end)
+            streams = sbpool.collect(tasks)
+        finally:
+            if self.mode == HARDWARE and lo.noisePWM["RUNNING"]:
+                self.__lo("stopNoisePWM")
+            self.__lo("setNoiseSourceOff")
+            self.__fanOut("selectRFSource")
+
+        results = {}
+        for key, stream in streams.items():
+            on, off = classify(stream["times"], edges, 0,
+                               self.guard + stream["uncertainty"])
+            results[key] = dict(
+                (comp, yFactor(powerDbm(stream["volts"][:, i]), on, off,
+                               self.noiseTemp))
+                for i, comp in enumerate(CHANNELS))
+        return results
+
+"""
+Method: waitUntil(deadline)
+    Description:
+        Sleeps until the sbio.monotonic() time deadline.
+"""
+def waitUntil(deadline):
+    wait = deadline - sbio.monotonic()
+    if wait > 0:
+        time.sleep(wait)
@@ -0,0 +1,125 @@
+"""
+    STARBURST Y-Factor Engine Test Suite
+    Author: Lokbondo Kung
+    Email: lkkung@caltech.edu
+"""
+
+import unittest
+import numpy as np
+import sbovro
+import sbsim
+import sbyfactor
+
+"""
+TestYFactor Test Group Description:
+    This group of tests makes sure that samples are split into noise on
+    and off states around the switches, and that the Y-factor engine
+    recovers the system temperature of simulated antennas with either
+    switching mode.
+
+    Test Count: 4
+"""
+class TestYFactor(unittest.TestCase):
+
+    def setUp(self):
+        sbsim.backend.reset()
+        sbsim.backend.latency = sbsim.LatencyModel(0.001)
+        self.ovroObj = sbovro.OVROStarburst("LONoise", "AntennaA",
+                                            "AntennaB", "ETHERNET", "SIM")
+
+    def tearDown(self):
+        self.ovroObj.endConnection()
+        sbsim.backend.latency = sbsim.LatencyModel()
+
+    def check(self, results):
+        device = sbsim.backend.devices["AntennaA"]
+        tsys = device.receiverTemp + device.loadTemp
+        for key in ["A", "B"]:
+            for comp in sbyfactor.CHANNELS:
+                result = results[key][comp]
+                self.assertTrue(abs(result["TSYS"] - tsys) < 0.01 * tsys)
+                self.assertTrue(min(result["SAMPLES"]) > 100)
+
+        for name in ["AntennaA", "AntennaB"]:
+            self.assertEqual(sbsim.backend.devices[name].registers["EIO1"],
+                             0)
+        self.assertFalse(sbsim.backend.noiseSourceOn())
+
+    """
+    Test - test_classify:
+        Given samples every 1ms and switches on at 10ms and off at 20ms,
+            each taking 1ms,
+        Then samples within the 2ms guard of a switch are left out and
+            the others get the state of the switch before them.
+    """
+    def test_classify(self):
+        times = np.arange(30) * 0.001
+        edges = [sbyfactor.Edge(0.010, 0.011, 1),
+                 sbyfactor.Edge(0.020, 0.021, 0)]
+        on, off = sbyfactor.classify(times, edges, 0, 0.002)
+
+        self.assertEqual(list(np.nonzero(on)[0]), [13, 14, 15, 16, 17, 18])
+        self.assertEqual(list(np.nonzero(off)[0]),
+                         list(range(0, 9)) + list(range(23, 30)))
+
+    """
+    Test - test_hardwareSwitching:
+        Given the noise source switched by the LO LabJack PWM at 20Hz,
+        Then the system temperature of every detector of both antennas
+            is found within 1%, and the antennas end on the sky with the
+            noise source off.
+    """
+    def test_hardwareSwitching(self):
+        results = self.ovroObj.measureYFactor(
+            sbsim.backend.devices["AntennaA"].noiseTemp, freq=20,
+            duration=0.5)
+        self.check(results)
+        self.assertFalse(self.ovroObj.ljLONoise.getNoisePWM()["RUNNING"])
+
+    """
+    Test - test_hostSwitching:
+        Given the noise source toggled by the host at 10Hz,
+        Then the system temperatures are found within 1% as well.
+    """
+    def test_hostSwitching(self):
+        results = self.ovroObj.measureYFactor(
+            sbsim.backend.devices["AntennaA"].noiseTemp,
+            mode=sbyfactor.HOST, freq=10, duration=0.5)
+        self.check(results)
+
+    """
+    Test - test_streamStartFails:
+        Given that antenna B fails to start its stream,
+        Then a MultiDeviceError is raised and the stream started on
+            antenna A is stopped.
+    """
+    def test_streamStartFails(self):
+        backend = sbsim.backend
+        handle = self.ovroObj.ljAntennas["B"].handle
+        start = backend.eStreamStart
+
+        def eStreamStart(*args):
+            if args[0] == handle:
+                raise sbsim.ljm.LJMError(errorString="LJME_STREAM_FAILED")
+            return start(*args)
+
+        backend.eStreamStart = eStreamStart
+        try:
+            self.assertRaises(sbovro.sbpool.MultiDeviceError,
+                              self.ovroObj.measureYFactor,
+                              backend.devices["AntennaA"].noiseTemp,
+                              duration=0.1)
+        finally:
+            del backend.eStreamStart
+        self.assertEqual(backend.devices["AntennaA"].stream, None)
+        self.assertEqual(backend.devices["AntennaA"].registers["EIO1"], 0)
+
+
+# Main Method
+if __name__ == '__main__':
+    testGroups = [TestYFactor]
+    for tG in testGroups:
+        print "\nTesting: " + str(tG.__name__)
+        suite = unittest.TestLoader().loadTestsFromTestCase(
+            tG)
+        unittest.TextTestRunner(verbosity=2).run(suite)